@@ -1,21 +1,37 @@
-from flask import Flask, request, jsonify, redirect, session
+from flask import Flask, Response, g, request, jsonify, redirect, session
 from dotenv import load_dotenv
-import pandas as pd
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore
+import atexit
+import base64
 import datetime
-import joblib
+import gc
+import json
+import math
 import os
-import requests
-from google.auth.transport.requests import Request  
-
-
-
-# Google API imports
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+import signal
+import threading
+import time
+from sources import Source, fan_out, fetch_sources
+from cache import TTLCache
+from meeting_index import MeetingIndex, index_window, meeting_features
+from rollups import (
+    TREND_GRANULARITIES, bucket_start, fetch_rolling_means, merge_team_aggregates, summarize_bucket, summarize_team
+)
+from calendar_store import (
+    ensure_synced, remove_event, store_event, sync_lag_seconds
+)
+from services import LazyProxy, LazyResource, warm_up
+from storage import DELETE, open_storage
+from write_behind import WRITE_BEHIND, CheckinWriter, WriterFull
+from model_registry import prediction_memo
+from metrics import STAGE_SECONDS, CallbackMetric, Counter, Histogram, TimedStorage, render as render_metrics
+
+
+
+# Google API imports (the Google libraries themselves are imported on first use)
+from google_clients import GoogleClientPool
+from credentials_manager import CredentialManager, CredentialsError
+from rescuetime_client import RescueTimeClient
 
 
 load_dotenv()
@@ -35,72 +51,240 @@ SCOPES = ["https://www.googleapis.com/auth/calendar"]
 # RescueTime API Key
 RESCUETIME_API_KEY = os.getenv("RESCUETIME_API_KEY")
 
-# Load the scaler and model
-scaler = joblib.load("artifacts/burnout_scaler_final.pkl")
-model = joblib.load("artifacts/burnout_model_multiclass_final.pkl")
+# Per-source deadlines for /predict (seconds); late sources fall back to defaults
+CALENDAR_DEADLINE_S = float(os.getenv("CALENDAR_DEADLINE_S", "3"))
+RESCUETIME_DEADLINE_S = float(os.getenv("RESCUETIME_DEADLINE_S", "3"))
+HISTORY_DEADLINE_S = float(os.getenv("HISTORY_DEADLINE_S", "2"))
+
+# Cache for passive signals (meeting count, screen time)
+SIGNAL_CACHE_TTL_S = float(os.getenv("SIGNAL_CACHE_TTL_S", "900"))
+SIGNAL_CACHE_MAX_ENTRIES = int(os.getenv("SIGNAL_CACHE_MAX_ENTRIES", "10000"))
+
+# Upper bound on rows accepted by /predict/batch
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "10000"))
+
+# Check-ins per /checkins page when "limit" is omitted, and the most one page may hold
+CHECKINS_PAGE_SIZE = int(os.getenv("CHECKINS_PAGE_SIZE", "100"))
+CHECKINS_MAX_PAGE_SIZE = int(os.getenv("CHECKINS_MAX_PAGE_SIZE", "1000"))
+
+# Buckets /trends returns when "from" is omitted, and the most it returns at all
+TRENDS_DEFAULT_BUCKETS = int(os.getenv("TRENDS_DEFAULT_BUCKETS", "30"))
+TRENDS_MAX_BUCKETS = int(os.getenv("TRENDS_MAX_BUCKETS", "366"))
+
+# Upper bound on grid points scored by one /predict/scenarios call
+SCENARIO_MAX_POINTS = int(os.getenv("SCENARIO_MAX_POINTS", "10000"))
+
+# Days /teams/<id>/summary returns when "from" is omitted
+TEAM_SUMMARY_DEFAULT_DAYS = int(os.getenv("TEAM_SUMMARY_DEFAULT_DAYS", "30"))
+
+# Team days with fewer check-ins than this are reported without their numbers,
+# so one person's score can't be read off a small team's day
+TEAM_SUMMARY_MIN_COUNT = int(os.getenv("TEAM_SUMMARY_MIN_COUNT", "3"))
+
+# Signal that makes this worker reload the model named by artifacts/manifest.json
+MODEL_RELOAD_SIGNAL = os.getenv("MODEL_RELOAD_SIGNAL", "SIGHUP")
+
+# Token for /admin/* routes (sent as X-Admin-Token); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Load subsystems in the background at startup instead of on the first request
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"
+
+# Set by gunicorn.conf.py: app.py is imported in the gunicorn master and must not
+# start threads there; each worker starts them in after_fork()
+PRELOAD_FOR_FORK = os.getenv("PRELOAD_FOR_FORK", "0") == "1"
+
+
+# ---------------------------
+# Lazily initialized subsystems (importing app.py stays fast)
+# ---------------------------
+def load_models():
+    # Load the scaler and model version named by artifacts/manifest.json
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry()
+    registry.current()
+    if not _in_master:
+        registry.start_polling()
+    return registry
+
+
+# True until after_fork() runs in a worker
+_in_master = PRELOAD_FOR_FORK
+
 
+def init_storage():
+    # Firestore or embedded SQLite, picked by STORAGE_BACKEND; every call is timed
+    return TimedStorage(open_storage())
+
+
+def init_google():
+    # Pull in the Google auth/discovery stacks
+    import google.oauth2.credentials  # noqa: F401
+    import googleapiclient.discovery  # noqa: F401
+    calendar_credentials.start()
+    return True
+
+
+def start_checkin_writer():
+    # Replays check-ins journaled before a restart, then flushes in the background
+    writer = CheckinWriter(store).start()
+    atexit.register(writer.close)
+    return writer
+
+
+model_resource = LazyResource("model", load_models)
+storage_resource = LazyResource("storage", init_storage)
+google_resource = LazyResource("google", init_google, required=False)
+checkin_writer_resource = LazyResource("checkin_writer", start_checkin_writer)
+RESOURCES = [model_resource, storage_resource, google_resource]
+if WRITE_BEHIND:
+    RESOURCES.append(checkin_writer_resource)
+
+models = LazyProxy(model_resource)
+store = LazyProxy(storage_resource)
+checkin_writer = LazyProxy(checkin_writer_resource)
+
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+
+
+def reload_model_on_signal(signum, frame):
+    # Load off the signal handler; requests keep using the old model until the swap
+    if model_resource.loaded:
+        models.reload_in_background()
+
+
+def install_reload_signal():
+    try:
+        signal.signal(getattr(signal, MODEL_RELOAD_SIGNAL), reload_model_on_signal)
+    except (AttributeError, ValueError) as e:
+        # Unknown signal on this platform, or app imported off the main thread
+        print(f"⚠️ Model reload on {MODEL_RELOAD_SIGNAL} disabled: {e}")
+
+
+install_reload_signal()
+
+
+def preload_for_fork():
+    """
+    Load the model in the gunicorn master (preload_app) without starting any
+    thread. Forked workers then share the booster's pages copy-on-write
+    instead of each loading a private copy.
+    """
+    try:
+        model_resource.get()
+    except Exception as e:
+        # Workers load it lazily instead
+        print(f"⚠️ Model preload failed: {e}")
+    # Keep the garbage collector from touching (and so copying) the preloaded objects
+    gc.freeze()
 
-# Initialize Firebase
-cred = credentials.Certificate("firebase_key.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
 
+def after_fork():
+    """Start in a preloaded worker what preload_for_fork() left out."""
+    global _in_master
+    _in_master = False
+    # Gunicorn resets the worker's signal handlers after fork
+    install_reload_signal()
+    if model_resource.loaded:
+        models.start_polling()
+    if WARMUP_ON_START:
+        start_warm_up()
 
 
+def start_warm_up():
+    """Start background warm-up once; later calls are no-ops."""
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = warm_up(RESOURCES)
+
+
+# Reused Google Calendar clients (one authorized session per user)
+calendar_clients = GoogleClientPool("calendar", "v3")
+
+# Pooled, retrying RescueTime client with per-day caching
+rescuetime = RescueTimeClient()
+
+# Cached Google credentials, refreshed in the background before they expire
+# (the refresher thread starts once the Google stack is loaded)
+calendar_credentials = CredentialManager(store)
+
 
 # app.py
 # ... (imports) ...
 # from google.auth.transport.requests import Request # Add this import
 from datetime import timedelta
 
-# Function to get meeting count for the last 7 days
-def get_meeting_count_last_7d(user_id):
+# Passive signals change slowly; cache them per (user, 7-day window)
+meeting_index_cache = TTLCache("meeting_index", SIGNAL_CACHE_TTL_S, SIGNAL_CACHE_MAX_ENTRIES)
+screen_time_cache = TTLCache("screen_time", SIGNAL_CACHE_TTL_S, SIGNAL_CACHE_MAX_ENTRIES)
+
+
+# Caches reported by /cache/stats and /metrics
+CACHES = (meeting_index_cache, screen_time_cache, rescuetime.day_cache, prediction_memo)
+
+
+def seven_day_window():
+    today = datetime.date.today()
+    return ((today - timedelta(days=7)).isoformat(), today.isoformat())
+
+def save_checkin(checkin_data):
+    """Persist a check-in inline, or via the write-behind journal when WRITE_BEHIND=1."""
+    if WRITE_BEHIND:
+        return checkin_writer.submit(checkin_data)
+    return store.add_checkin(checkin_data)
+
+
+# Meeting-load features from the synced calendar_events
+def load_meeting_index(user_id):
     """
-    Fetch and store number of calendar events in the last 7 days for this user.
-    Also saves each event to Firestore.
+    Interval index over this user's stored calendar events around the last 7
+    days (see meeting_index.py). Raises on failure.
     """
-    try:
-        user_ref = db.collection("users").document(user_id).get()
-        creds_data = user_ref.to_dict().get("google_calendar_credentials")
-        if not creds_data:
-            return 0  # user not connected
-
-        creds = Credentials(**creds_data)
-        if not creds.valid and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            db.collection("users").document(user_id).update({
-                "google_calendar_credentials.token": creds.token
-            })
-
-        service = build("calendar", "v3", credentials=creds)
-
-        now = datetime.datetime.utcnow().isoformat() + "Z"
-        seven_days_ago = (datetime.datetime.utcnow() - datetime.timedelta(days=7)).isoformat() + "Z"
-
-        events_result = service.events().list(
-            calendarId="primary",
-            timeMin=seven_days_ago,
-            timeMax=now,
-            singleEvents=True,
-            orderBy="startTime"
-        ).execute()
-
-        events = events_result.get("items", [])
-
-        # Store events in Firestore
-        events_collection = db.collection("users").document(user_id).collection("calendar_events")
-        for event in events:
-            event_id = event.get("id")
-            events_collection.document(event_id).set({
-                "summary": event.get("summary"),
-                "start": event.get("start"),
-                "end": event.get("end"),
-                "created": event.get("created"),
-                "updated": event.get("updated")
-            }, merge=True)
-
-        return len(events)
+    user_data = store.get_user(user_id) or {}
+    creds = calendar_credentials.get(user_id, user_data)
+    if creds is None:
+        return MeetingIndex([])  # user not connected
+
+    # Incremental sync (via nextSyncToken) keeps calendar_events current
+    ensure_synced(
+        store,
+        lambda: calendar_clients.client(user_id, creds),
+        user_id,
+        user_data.get("calendar_sync")
+    )
+
+    return stored_meeting_index(user_id)
+
+
+def stored_meeting_index(user_id):
+    """Interval index over the calendar events already in storage (no sync)."""
+    return MeetingIndex.from_events(store.event_intervals(user_id, *index_window()))
+
+
+def fetch_meeting_index(user_id):
+    """Cached load_meeting_index."""
+    return meeting_index_cache.get_or_load(
+        (user_id, seven_day_window()),
+        lambda: load_meeting_index(user_id)
+    )
 
+
+def fetch_meeting_features(user_id):
+    """Meeting count, true had_meeting_today and meeting-load features, as of now."""
+    return meeting_features(fetch_meeting_index(user_id))
+
+
+def fetch_meeting_count_last_7d(user_id):
+    return fetch_meeting_features(user_id)["meeting_count_last_7d"]
+
+
+def get_meeting_count_last_7d(user_id):
+    """Same as fetch_meeting_count_last_7d, but returns 0 on any error."""
+    try:
+        return fetch_meeting_count_last_7d(user_id)
     except Exception as e:
         print(f"⚠️ Error fetching meeting count: {e}")
         return 0
@@ -108,36 +292,24 @@ def get_meeting_count_last_7d(user_id):
 
 
 # Function to get screen time for the last 7 days
-def get_screen_time_last_7d(user_id):
-    user_ref = db.collection('users').document(user_id).get()
-    api_key = user_ref.to_dict().get('rescuetime_api_key')
+def load_screen_time_last_7d(user_id):
+    """Total productive RescueTime hours over the last 7 days. Raises on failure."""
+    user_data = store.get_user(user_id) or {}
+    api_key = user_data.get('rescuetime_api_key')
     
     if not api_key:
         return 0
     
-    end_date = datetime.date.today().isoformat()
-    start_date = (datetime.date.today() - timedelta(days=7)).isoformat()
-    
-    url = 'https://www.rescuetime.com/anapi/data'
-    params = {
-        'key': api_key,
-        'format': 'json',
-        'restrict_kind': 'productivity',
-        'restrict_begin': start_date,
-        'restrict_end': end_date
-    }
-    
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        total_time_in_seconds = sum(row[1] for row in data['rows'])
-        total_time_in_hours = total_time_in_seconds / 3600
-        return total_time_in_hours
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching RescueTime data: {e}")
-        return 0
+    # Completed days are cached per user; usually only today is fetched
+    return rescuetime.screen_time_hours(user_id, api_key, days=7)
+
+
+def fetch_screen_time_last_7d(user_id):
+    """Cached load_screen_time_last_7d."""
+    return screen_time_cache.get_or_load(
+        (user_id, seven_day_window()),
+        lambda: load_screen_time_last_7d(user_id)
+    )
 
 
 # -----------------------
@@ -150,10 +322,70 @@ def credentials_to_dict(credentials):
         "token_uri": credentials.token_uri,
         "client_id": credentials.client_id,
         "client_secret": credentials.client_secret,
-        "scopes": credentials.scopes
+        "scopes": credentials.scopes,
+        "expiry": credentials.expiry
     }
 
 
+# ---------------------------
+# Metrics (Prometheus text format at /metrics)
+# ---------------------------
+HTTP_REQUEST_SECONDS = Histogram(
+    "boz_http_request_seconds",
+    "Time to handle each request, by route.",
+    ["endpoint", "method"]
+)
+HTTP_REQUESTS = Counter(
+    "boz_http_requests_total",
+    "Requests handled, by route and status code.",
+    ["endpoint", "method", "status"]
+)
+
+
+def _cache_counters(attribute):
+    # TTL caches and the client pool already count hits/misses/evictions
+    counters = {(cache.name,): getattr(cache, attribute) for cache in CACHES}
+    counters[("calendar_clients",)] = getattr(calendar_clients, attribute)
+    return counters
+
+
+CallbackMetric("boz_cache_hits_total", "Cache hits.", "counter", ["cache"],
+               lambda: _cache_counters("hits"))
+CallbackMetric("boz_cache_misses_total", "Cache misses.", "counter", ["cache"],
+               lambda: _cache_counters("misses"))
+CallbackMetric("boz_cache_evictions_total", "Entries evicted to stay under the size bound.", "counter", ["cache"],
+               lambda: _cache_counters("evictions"))
+CallbackMetric("boz_write_behind_queue_depth", "Check-ins waiting to be flushed to storage.", "gauge", [],
+               lambda: {(): checkin_writer.stats()["queue_depth"]} if checkin_writer_resource.loaded else {})
+CallbackMetric("boz_google_token_refreshes_total", "Google OAuth token refreshes.", "counter", ["result"],
+               lambda: {("ok",): calendar_credentials.refreshes, ("error",): calendar_credentials.refresh_errors})
+
+
+def timed_stage(stage, fetch, *args):
+    with STAGE_SECONDS.time(stage):
+        return fetch(*args)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method)
+        HTTP_REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
 # ---------------------------
 # Home route
 # ---------------------------
@@ -162,6 +394,31 @@ def home():
     return jsonify({"message": "BOZ Backend Running!"})
 
 
+# ---------------------------
+# Health checks
+# ---------------------------
+STARTED_AT = datetime.datetime.now()
+
+
+@app.route("/healthz")
+def healthz():
+    # Liveness: the process is up and serving
+    return jsonify({
+        "status": "ok",
+        "uptime_seconds": (datetime.datetime.now() - STARTED_AT).total_seconds()
+    })
+
+
+@app.route("/readyz")
+def readyz():
+    # Readiness: every required subsystem is loaded; never loads anything itself
+    subsystems = {resource.name: resource.status() for resource in RESOURCES}
+    ready = all(resource.loaded for resource in RESOURCES if resource.required)
+    if not ready:
+        start_warm_up()
+    return jsonify({"ready": ready, "subsystems": subsystems}), 200 if ready else 503
+
+
 # ---------------------------
 # Check-in route (saves burnout_probability)
 # ---------------------------
@@ -192,14 +449,9 @@ def checkin():
     }
 
     try:
-        # Scale + predict
-        X_input = pd.DataFrame([features])
-        X_input_scaled = scaler.transform(X_input)
-        probs = model.predict_proba(X_input_scaled)[0]
-
-        # Weighted burnout probability
-        weights = {0: 0.0, 1: 0.5, 2: 1.0}
-        burnout_probability = sum([weights[i] * prob for i, prob in enumerate(probs)])
+        # Scale + predict (weighted burnout probability)
+        engine = models.current()
+        probs, burnout_probability = engine.score_one(features)
 
         # Save check-in with burnout prob
         checkin_data = {
@@ -208,48 +460,325 @@ def checkin():
             "sleep": int(sleep),
             "work_hours_today": float(work_hours) if work_hours is not None else 0.0,
             "burnout_probability": float(burnout_probability),
+            "model_version": engine.version,
             "user_id": user_id,
             "timestamp": datetime.datetime.now()
         }
 
-        db.collection("checkins").add(checkin_data)
+        # Saves the check-in and updates the rolling aggregates in one transaction
+        # (inline, or batched by the write-behind worker)
+        with STAGE_SECONDS.time("save"):
+            save_checkin(checkin_data)
 
         return jsonify({"success": True, "message": "Check-in saved!", "data": checkin_data})
 
+    except WriterFull as e:
+        # Check-ins back up while storage is down; ask the client to retry later
+        print("⚠️ Write-behind queue full in /checkin:", e)
+        return jsonify({"success": False, "message": "Check-in queue is full, try again shortly"}), 503
+
     except Exception as e:
         print("🔥 Error in /checkin:", e)
         return jsonify({"success": False, "message": str(e)}), 500
 
 
 # ---------------------------
-# Get all check-ins
+# Get check-ins (cursor-paginated, or streamed as NDJSON)
 # ---------------------------
+# Shared by the Flask route below and the ASGI route in asgi.py
+def encode_cursor(entry):
+    """Opaque cursor for the page after `entry`: its timestamp and id."""
+    raw = json.dumps([entry["timestamp"], entry["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(timestamp, checkin_id) from encode_cursor; ValueError if it's malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, checkin_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(timestamp), str(checkin_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _checkin_bound(value, end):
+    # A date means the whole day: "from" starts at its midnight, "to" includes it
+    if len(value) == 10:
+        day = datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time())
+        return day + timedelta(days=1) if end else day
+    return datetime.datetime.fromisoformat(value)
+
+
+def checkins_request(args):
+    """
+    (user_id, query, output) from the /checkins query string, where `query` is
+    the keyword arguments for checkin_page / checkin_lines / checkin_array and
+    output is "page", "array" or "ndjson"; ValueError (400) if invalid.
+    """
+    user_id = args.get("user_id")
+    if not user_id:
+        raise ValueError("Missing user_id")
+
+    output = args.get("format", "json")
+    if output not in ("json", "ndjson"):
+        raise ValueError("format must be json or ndjson")
+    ndjson = output == "ndjson"
+    if not ndjson:
+        # Without limit or cursor, answer with the bare array clients relied on before pagination
+        output = "array" if args.get("limit") is None and not args.get("cursor") else "page"
+
+    limit = args.get("limit")
+    if limit is None:
+        # Streams and the array send the whole history unless asked for less
+        limit = None if output != "page" else CHECKINS_PAGE_SIZE
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        # Pages are held in memory, streams aren't
+        if limit < 1 or (not ndjson and limit > CHECKINS_MAX_PAGE_SIZE):
+            raise ValueError(f"limit must be between 1 and {CHECKINS_MAX_PAGE_SIZE}")
+
+    try:
+        start = _checkin_bound(args["from"], end=False) if args.get("from") else None
+        end = _checkin_bound(args["to"], end=True) if args.get("to") else None
+    except ValueError:
+        raise ValueError("from/to must be ISO dates (YYYY-MM-DD) or datetimes")
+    if start is not None and end is not None and start >= end:
+        raise ValueError("from is after to")
+
+    after = decode_cursor(args["cursor"]) if args.get("cursor") else None
+
+    fields = None
+    if args.get("fields"):
+        # "id" isn't a stored field; every entry carries it anyway
+        fields = [field.strip() for field in args["fields"].split(",") if field.strip() not in ("", "id")]
+        invalid = [field for field in fields if not field.isidentifier()]
+        if invalid:
+            raise ValueError(f"Invalid field name: {invalid[0]}")
+
+    query = {"limit": limit, "after": after, "start": start, "end": end, "fields": fields}
+    return user_id, query, output
+
+
+def checkin_entry(checkin_id, data):
+    data["id"] = checkin_id
+    if "timestamp" in data and isinstance(data["timestamp"], datetime.datetime):
+        data["timestamp"] = data["timestamp"].isoformat()
+    return data
+
+
+def checkin_page(user_id, limit, after=None, start=None, end=None, fields=None):
+    """(entries, next_cursor): one page of check-ins, newest first; next_cursor is None on the last page."""
+    entries = []
+    # One extra row tells whether another page follows
+    for checkin_id, data in store.page_checkins(user_id, limit + 1, after, start, end, fields):
+        if len(entries) == limit:
+            return entries, encode_cursor(entries[-1])
+        entries.append(checkin_entry(checkin_id, data))
+    return entries, None
+
+
+def ndjson_line(payload):
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str) + "\n"
+
+
+def checkin_lines(user_id, limit=None, after=None, start=None, end=None, fields=None):
+    """
+    NDJSON lines, one check-in each, written as the store reads them, so the
+    result set is never held in memory. When `limit` cuts the stream short,
+    a last {"next_cursor": ...} line says where to continue.
+    """
+    try:
+        last = None
+        sent = 0
+        for checkin_id, data in store.page_checkins(user_id, limit and limit + 1, after, start, end, fields):
+            if sent == limit:
+                yield ndjson_line({"next_cursor": encode_cursor(last)})
+                return
+            last = checkin_entry(checkin_id, data)
+            sent += 1
+            yield ndjson_line(last)
+    except Exception as e:
+        # The 200 is already sent; end the stream with the error instead
+        print("🔥 Error in /checkins:", e)
+        yield ndjson_line({"success": False, "message": str(e)})
+
+
+def checkin_array(user_id, limit=None, after=None, start=None, end=None, fields=None):
+    """
+    The history as one bare JSON array, written as the store reads it like
+    checkin_lines. An error ends the body without its closing bracket, so
+    it can't be mistaken for a complete history.
+    """
+    yield "["
+    try:
+        for i, (checkin_id, data) in enumerate(store.page_checkins(user_id, limit, after, start, end, fields)):
+            yield ("," if i else "") + ndjson_line(checkin_entry(checkin_id, data))
+    except Exception as e:
+        print("🔥 Error in /checkins:", e)
+        return
+    yield "]"
+
+
+def checkins_response(user_id, entries, next_cursor):
+    return {"success": True, "user_id": user_id, "checkins": entries, "next_cursor": next_cursor}
+
+
 @app.route("/checkins", methods=["GET"])
 def get_checkins():
+    try:
+        user_id, query, output = checkins_request(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    if output == "ndjson":
+        return Response(checkin_lines(user_id, **query), mimetype="application/x-ndjson")
+    if output == "array":
+        return Response(checkin_array(user_id, **query), mimetype="application/json")
+
+    try:
+        return jsonify(checkins_response(user_id, *checkin_page(user_id, **query)))
+    except Exception as e:
+        print("🔥 Error in /checkins:", e)
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+# ---------------------------
+# Burnout trends (daily/weekly rollups kept up to date on every check-in)
+# ---------------------------
+@app.route("/trends", methods=["GET"])
+def get_trends():
     user_id = request.args.get("user_id")
+    granularity = request.args.get("granularity", "day")
     if not user_id:
         return jsonify({"success": False, "message": "Missing user_id"}), 400
+    if granularity not in TREND_GRANULARITIES:
+        return jsonify({"success": False, "message": f"granularity must be one of: {', '.join(TREND_GRANULARITIES)}"}), 400
 
-    entries = []
+    step = timedelta(days=7 if granularity == "week" else 1)
     try:
-        query = db.collection("checkins").where("user_id", "==", user_id).order_by(
-            "timestamp", direction=firestore.Query.DESCENDING
-        )
-        docs = query.stream()
-        for doc in docs:
-            data = doc.to_dict()
-            data["id"] = doc.id
-            if "timestamp" in data and isinstance(data["timestamp"], datetime.datetime):
-                data["timestamp"] = data["timestamp"].isoformat()
-            entries.append(data)
-        return jsonify(entries)
+        to_arg, from_arg = request.args.get("to"), request.args.get("from")
+        end = datetime.date.fromisoformat(to_arg) if to_arg else datetime.date.today()
+        end = bucket_start(end, granularity)
+        if from_arg:
+            start = bucket_start(datetime.date.fromisoformat(from_arg), granularity)
+        else:
+            start = end - step * (TRENDS_DEFAULT_BUCKETS - 1)
+    except ValueError:
+        return jsonify({"success": False, "message": "from/to must be dates (YYYY-MM-DD)"}), 400
+
+    if start > end:
+        return jsonify({"success": False, "message": "from is after to"}), 400
+    if (end - start) // step + 1 > TRENDS_MAX_BUCKETS:
+        return jsonify({"success": False, "message": f"Too many buckets (max {TRENDS_MAX_BUCKETS})"}), 400
+
+    try:
+        stored = store.trend_buckets(user_id, granularity, start.isoformat(), end.isoformat())
+        buckets = []
+        day = start
+        while day <= end:
+            buckets.append(summarize_bucket(day.isoformat(), stored.get(day.isoformat()) or {}))
+            day += step
+
+        return jsonify({
+            "success": True,
+            "user_id": user_id,
+            "granularity": granularity,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "buckets": buckets
+        })
     except Exception as e:
-        print("🔥 Error in /checkins:", e)
+        print("🔥 Error in /trends:", e)
         return jsonify({"success": False, "message": str(e)}), 500
 
 
 
-# Your utility functions (get_meeting_count_last_7d, get_screen_time_last_7d) should be defined outside of this route.
+# Your utility functions (get_meeting_count_last_7d, fetch_screen_time_last_7d) should be defined outside of this route.
+
+# Shared by the Flask route below and the ASGI route in asgi.py
+def predict_features(data, values):
+    """The model's feature row from the /predict body and the fetched source values."""
+    mood = data.get("mood")
+    stress = data.get("stress")
+    sleep = data.get("sleep")
+    work_hours = data.get("work_hours_today")
+
+    meetings = values["calendar"] or {"meeting_count_last_7d": 0, "had_meeting_today": 0}
+    screen_time_last_7d = values["rescuetime"]
+    rolling = values["history"]
+
+    if rolling:
+        mean_mood_last_7d = rolling["mean_mood_last_7d"]
+        mean_stress_last_7d = rolling["mean_stress_last_7d"]
+        mean_sleep_last_7d = rolling["mean_sleep_last_7d"]
+        mean_work_hours_last_7d = rolling["mean_work_hours_last_7d"]
+    else:
+        # Use current day's data if no past check-ins exist
+        mean_mood_last_7d = mood
+        mean_stress_last_7d = stress
+        mean_sleep_last_7d = sleep
+        mean_work_hours_last_7d = work_hours
+
+    # Construct the complete features dictionary for the model
+    return {
+        "mood": mood,
+        "stress": stress,
+        "sleep": sleep,
+        "work_hours": work_hours,
+        "had_meeting_today": meetings["had_meeting_today"],
+        "meeting_count_last_7d": meetings["meeting_count_last_7d"],
+        "screen_time_last_7d": screen_time_last_7d,
+        "mean_mood_last_7d": mean_mood_last_7d,
+        "mean_stress_last_7d": mean_stress_last_7d,
+        "mean_sleep_last_7d": mean_sleep_last_7d,
+        "mean_work_hours_last_7d": mean_work_hours_last_7d,
+    }
+
+
+def prediction_checkin(user_id, features, burnout_probability, model_version, meeting_load=None):
+    checkin_data = {
+        "user_id": user_id,
+        "burnout_probability": float(burnout_probability),
+        "model_version": model_version,
+        "timestamp": datetime.datetime.now(),
+        **{k: features.get(k, 0) for k in features.keys()}
+    }
+    if meeting_load:
+        # Not model inputs yet; kept for training the next model
+        checkin_data["meeting_load"] = meeting_load
+    return checkin_data
+
+
+def prediction_response(user_id, probs, burnout_probability, model_version, sources, meeting_load=None):
+    return {
+        "success": True,
+        "user_id": user_id,
+        "predicted_class_probs": {str(i): float(p) for i, p in enumerate(probs)},
+        "burnout_probability": float(burnout_probability),
+        "model_version": model_version,
+        "meeting_load": meeting_load,
+        "sources": sources,
+        "degraded_sources": [name for name, status in sources.items() if status != "ok"]
+    }
+
+
+def prediction_sources(user_id):
+    return {
+        "calendar": Source(
+            lambda: timed_stage("calendar", fetch_meeting_features, user_id), None, CALENDAR_DEADLINE_S
+        ),
+        "rescuetime": Source(
+            lambda: timed_stage("rescuetime", fetch_screen_time_last_7d, user_id), 0, RESCUETIME_DEADLINE_S
+        ),
+        "history": Source(
+            lambda: timed_stage("history", fetch_rolling_means, store, user_id), None, HISTORY_DEADLINE_S
+        ),
+    }
+
 
 @app.route("/predict", methods=["POST"])
 def predict_burnout():
@@ -266,69 +795,252 @@ def predict_burnout():
         if not user_id or not all([mood, stress, sleep, work_hours]):
             return jsonify({"success": False, "message": "Missing user_id or required check-in data"}), 400
 
-        # Fetch passive data using the new functions
-        meeting_count_last_7d = get_meeting_count_last_7d(user_id)
-        screen_time_last_7d = get_screen_time_last_7d(user_id)
+        # Fetch passive data and the rolling 7-check-in averages in parallel.
+        # A source that errors or misses its deadline falls back to its default
+        # and is reported in "sources".
+        values, sources = fetch_sources(prediction_sources(user_id))
+        features = predict_features(data, values)
+
+        # Scale + predict (weighted burnout probability)
+        engine = models.current()
+        probs, burnout_probability = engine.score_one(features)
+
+        # Save prediction
+        with STAGE_SECONDS.time("save"):
+            save_checkin(prediction_checkin(user_id, features, burnout_probability, engine.version, values["calendar"]))
 
-        # Fetch historical data from Firestore for 7-day averages
-        checkins_ref = db.collection("checkins").where("user_id", "==", user_id).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(7)
-        docs = checkins_ref.stream()
-        past_checkins = [doc.to_dict() for doc in docs]
+        return jsonify(prediction_response(
+            user_id, probs, burnout_probability, engine.version, sources, values["calendar"]
+        ))
+
+    except WriterFull as e:
+        # Check-ins back up while storage is down; ask the client to retry later
+        print("⚠️ Write-behind queue full in /predict:", e)
+        return jsonify({"success": False, "message": "Check-in queue is full, try again shortly"}), 503
+
+    except Exception as e:
+        print("🔥 Error in /predict:", e)
+        return jsonify({"success": False, "message": str(e)}), 500
 
-        if past_checkins:
-            mean_mood_last_7d = sum(c.get("mood", 0) for c in past_checkins) / len(past_checkins)
-            mean_stress_last_7d = sum(c.get("stress", 0) for c in past_checkins) / len(past_checkins)
-            mean_sleep_last_7d = sum(c.get("sleep", 0) for c in past_checkins) / len(past_checkins)
-            mean_work_hours_last_7d = sum(c.get("work_hours_today", 0) for c in past_checkins) / len(past_checkins)
+
+# ---------------------------
+# What-if scenarios (one user, a grid of hypothetical inputs, nothing is saved)
+# ---------------------------
+# Features a scenario grid may vary -> the rolling mean that falls back to it
+# when the user has no history yet (as in predict_features)
+SCENARIO_FIELDS = {
+    "mood": "mean_mood_last_7d",
+    "stress": "mean_stress_last_7d",
+    "sleep": "mean_sleep_last_7d",
+    "work_hours": "mean_work_hours_last_7d",
+    "had_meeting_today": None,
+    "meeting_count_last_7d": None,
+    "screen_time_last_7d": None,
+}
+
+
+def scenario_axes(grid):
+    """
+    {feature: [values]} from a request grid whose entries are value lists or
+    {"start", "stop", "step"} ranges (stop included). Raises ValueError.
+    """
+    if not isinstance(grid, dict) or not grid:
+        raise ValueError("Missing grid")
+
+    axes = {}
+    points = 1
+    for field, spec in grid.items():
+        if field not in SCENARIO_FIELDS:
+            raise ValueError(f"Can't vary {field} (allowed: {', '.join(SCENARIO_FIELDS)})")
+        if isinstance(spec, dict):
+            try:
+                start, stop, step = (float(spec[key]) for key in ("start", "stop", "step"))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"{field}: a range needs numeric start, stop and step")
+            if not all(math.isfinite(value) for value in (start, stop, step)):
+                raise ValueError(f"{field}: values must be finite")
+            if not step > 0 or stop < start:
+                raise ValueError(f"{field}: step must be positive and stop >= start")
+            count = int((stop - start) / step + 1e-9) + 1
+            if points * count > SCENARIO_MAX_POINTS:
+                raise ValueError(f"Grid too large (max {SCENARIO_MAX_POINTS} points)")
+            values = [round(start + i * step, 9) for i in range(count)]
+        elif isinstance(spec, list) and spec:
+            try:
+                values = [float(value) for value in spec]
+            except (TypeError, ValueError):
+                raise ValueError(f"{field}: values must be numbers")
         else:
-            # Use current day's data if no past check-ins exist
-            mean_mood_last_7d = mood
-            mean_stress_last_7d = stress
-            mean_sleep_last_7d = sleep
-            mean_work_hours_last_7d = work_hours
-
-        # Construct the complete features dictionary for the model
-        features = {
-            "mood": mood,
-            "stress": stress,
-            "sleep": sleep,
-            "work_hours": work_hours,
-            "had_meeting_today": 1 if meeting_count_last_7d > 0 else 0,
-            "meeting_count_last_7d": meeting_count_last_7d,
-            "screen_time_last_7d": screen_time_last_7d,
-            "mean_mood_last_7d": mean_mood_last_7d,
-            "mean_stress_last_7d": mean_stress_last_7d,
-            "mean_sleep_last_7d": mean_sleep_last_7d,
-            "mean_work_hours_last_7d": mean_work_hours_last_7d,
-        }
+            raise ValueError(f"{field}: expected a list of values or a start/stop/step range")
 
-        # Prepare input and scale
-        X_input = pd.DataFrame([{col: features.get(col, 0) for col in features.keys()}])
-        X_input_scaled = scaler.transform(X_input)
-        probs = model.predict_proba(X_input_scaled)[0]
+        if not all(math.isfinite(value) for value in values):
+            raise ValueError(f"{field}: values must be finite")
+        points *= len(values)
+        if points > SCENARIO_MAX_POINTS:
+            raise ValueError(f"Grid too large (max {SCENARIO_MAX_POINTS} points)")
+        axes[field] = values
+    return axes
 
-        weights = {0: 0.0, 1: 0.5, 2: 1.0}
-        burnout_probability = sum([weights[i] * prob for i, prob in enumerate(probs)])
 
-        # Save prediction
-        checkin_data = {
-            "user_id": user_id,
-            "burnout_probability": float(burnout_probability),
-            "timestamp": datetime.datetime.now(),
-            **{k: features.get(k, 0) for k in features.keys()}
-        }
-        db.collection("checkins").add(checkin_data)
+def score_scenarios(engine, features, axes, has_history):
+    """
+    Burnout probability for every grid point around `features`, in row-major
+    order over `axes`. The whole grid is one matrix and one predict_proba call.
+    """
+    import numpy as np
+
+    columns = engine.feature_columns
+    mesh = np.meshgrid(*[np.asarray(values) for values in axes.values()], indexing="ij")
+    X = np.tile(engine.row(features), (mesh[0].size, 1))
+    for field, values in zip(axes, mesh):
+        values = values.ravel()
+        X[:, columns.index(field)] = values
+        if SCENARIO_FIELDS[field] and not has_history:
+            X[:, columns.index(SCENARIO_FIELDS[field])] = values
+    with STAGE_SECONDS.time("scenarios"):
+        _, burnout_probs = engine.score(X)
+    return burnout_probs
+
+
+def scenario_request(data):
+    """
+    (user_id, axes, inputs) from a /predict/scenarios body, where inputs is the
+    body with its self-reported values as floats; raises ValueError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    user_id = data.get("user_id")
+    if not user_id:
+        raise ValueError("Missing user_id")
+    axes = scenario_axes(data.get("grid"))
+
+    # Self-reported inputs come from the body unless the grid varies them
+    base = {"mood": "mood", "stress": "stress", "sleep": "sleep", "work_hours": "work_hours_today"}
+    missing = [key for field, key in base.items() if field not in axes and data.get(key) is None]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    # Checked here so a bad value is a 400 naming the field, not a failure inside the engine
+    inputs = dict(data)
+    for key in base.values():
+        if inputs.get(key) is None:
+            continue
+        try:
+            inputs[key] = float(inputs[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be a number")
+        if not math.isfinite(inputs[key]):
+            raise ValueError(f"{key} must be finite")
+    return user_id, axes, inputs
+
+
+def scenarios_response(user_id, axes, burnout_probs, model_version, sources):
+    return {
+        "success": True,
+        "user_id": user_id,
+        "model_version": model_version,
+        "axes": axes,
+        "shape": [len(values) for values in axes.values()],
+        "burnout_probability": burnout_probs.tolist(),
+        "sources": sources,
+        "degraded_sources": [name for name, status in sources.items() if status != "ok"]
+    }
 
-        return jsonify({
-            "success": True,
-            "user_id": user_id,
-            "predicted_class_probs": {str(i): float(p) for i, p in enumerate(probs)},
-            "burnout_probability": float(burnout_probability)
-        })
+
+@app.route("/predict/scenarios", methods=["POST"])
+def predict_scenarios():
+    data = request.json or {}
+    try:
+        user_id, axes, inputs = scenario_request(data)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        # Passive signals and rolling means are fetched once for the whole grid
+        values, sources = fetch_sources(prediction_sources(user_id))
+        features = predict_features(inputs, values)
+
+        engine = models.current()
+        burnout_probs = score_scenarios(engine, features, axes, values["history"] is not None)
+        return jsonify(scenarios_response(user_id, axes, burnout_probs, engine.version, sources))
 
     except Exception as e:
-        print("🔥 Error in /predict:", e)
+        print("🔥 Error in /predict/scenarios:", e)
         return jsonify({"success": False, "message": str(e)}), 500
+
+
+# ---------------------------
+# Batch scoring (many users per call, nothing is saved)
+# ---------------------------
+def fill_meeting_features(user_ids, features):
+    """
+    Set meeting_count_last_7d / had_meeting_today, where a row leaves them out,
+    from its user's meeting index: the cached one if there is one, else one
+    built from stored events. A batch never syncs calendars; the stored reads
+    run in parallel on the shared source pool.
+    """
+    wanted = {
+        user_id for user_id, row in zip(user_ids, features)
+        if isinstance(user_id, str) and user_id and isinstance(row, dict)
+    }
+    indexes = {}
+    for user_id in wanted:
+        found, index = meeting_index_cache.get((user_id, seven_day_window()))
+        if found:
+            indexes[user_id] = index
+    indexes.update(fan_out(stored_meeting_index, wanted - set(indexes)))
+
+    looked_up = {user_id: meeting_features(index) for user_id, index in indexes.items() if index is not None}
+    for user_id, row in zip(user_ids, features):
+        if isinstance(user_id, str) and user_id in looked_up:
+            for key in ("meeting_count_last_7d", "had_meeting_today"):
+                row.setdefault(key, looked_up[user_id][key])
+
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    data = request.json or {}
+    rows = data.get("rows")
+
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"success": False, "message": "Missing rows"}), 400
+    if len(rows) > BATCH_MAX_ROWS:
+        return jsonify({"success": False, "message": f"Too many rows (max {BATCH_MAX_ROWS})"}), 413
+
+    user_ids = [row.get("user_id") if isinstance(row, dict) else None for row in rows]
+    features = [row.get("features") if isinstance(row, dict) else None for row in rows]
+    if data.get("fill_meeting_features"):
+        fill_meeting_features(user_ids, features)
+
+    try:
+        # One matrix, one scaling pass, one booster call for the rows not already memoized
+        from inference import build_feature_matrix
+
+        engine = models.current()
+        X, index, errors = build_feature_matrix(features, engine.feature_columns)
+        probs, burnout_probs = engine.score_memoized(X)
+    except Exception as e:
+        print("🔥 Error in /predict/batch:", e)
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    results = [None] * len(rows)
+    for i, row_probs, burnout_probability in zip(index.tolist(), probs.tolist(), burnout_probs.tolist()):
+        results[i] = {
+            "user_id": user_ids[i],
+            "success": True,
+            "predicted_class_probs": {str(k): p for k, p in enumerate(row_probs)},
+            "burnout_probability": burnout_probability
+        }
+    for i, message in errors.items():
+        results[i] = {"user_id": user_ids[i], "success": False, "message": message}
+
+    return jsonify({
+        "success": True,
+        "scored": len(index),
+        "failed": len(errors),
+        "model_version": engine.version,
+        "results": results
+    })
 # ---------------------------
 # Google Calendar Integration
 # ---------------------------
@@ -342,6 +1054,8 @@ def auth_google():
 
     session["user_id"] = user_id
 
+    from google_auth_oauthlib.flow import Flow
+
     # --- Generate state ---
     state = secrets.token_urlsafe(16)
     session["google_auth_state"] = state
@@ -366,6 +1080,8 @@ def auth_google():
 
 @app.route("/auth/google/callback")
 def auth_google_callback():
+    from google_auth_oauthlib.flow import Flow
+
     flow = Flow.from_client_config(
         {
             "web": {
@@ -387,12 +1103,13 @@ def auth_google_callback():
     if not user_id:
         return jsonify({"error": "User ID missing in session"}), 400
 
-    # --- Save credentials in Firestore ---
-    user_ref = db.collection("users").document(user_id)
-    user_ref.set(
-        {"google_calendar_credentials": credentials_to_dict(credentials)},
-        merge=True,  # don't overwrite existing fields like email, name, etc.
-    )
+    # --- Save credentials (other fields like email, name, etc. are kept) ---
+    calendar_credentials.replace(user_id, {
+        "google_calendar_credentials": credentials_to_dict(credentials),
+        "calendar_sync": DELETE,  # new account -> full resync
+    })
+    meeting_index_cache.invalidate_user(user_id)
+    calendar_clients.invalidate_user(user_id)
 
     return redirect("http://localhost:3000/calendar")
 
@@ -400,6 +1117,8 @@ def auth_google_callback():
 
 @app.route("/callback/google")
 def callback_google():
+    from google_auth_oauthlib.flow import Flow
+
     try:
         print("Session keys:", session.keys())
         user_id = session.get('user_id')
@@ -427,8 +1146,12 @@ def callback_google():
         credentials = flow.credentials
         print("Got credentials:", credentials.token)
 
-        user_ref = db.collection('users').document(user_id)
-        user_ref.set({'google_calendar_credentials': credentials_to_dict(credentials)}, merge=True)
+        calendar_credentials.replace(user_id, {
+            'google_calendar_credentials': credentials_to_dict(credentials),
+            'calendar_sync': DELETE,  # new account -> full resync
+        })
+        meeting_index_cache.invalidate_user(user_id)
+        calendar_clients.invalidate_user(user_id)
         print("Saved credentials successfully")
 
         return redirect("http://localhost:3000/calendar")
@@ -440,47 +1163,36 @@ def callback_google():
 
 
 
+def upcoming_calendar_events(user_id, user_data, creds):
+    # Serve from the synced store instead of re-listing from Google
+    ensure_synced(
+        store,
+        lambda: calendar_clients.client(user_id, creds),
+        user_id,
+        user_data.get('calendar_sync')
+    )
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return store.upcoming_events(user_id, now, limit=200)
+
+
 @app.route("/calendar/events")
 def get_calendar_events():
     user_id = request.args.get('user_id')
     if not user_id:
         return jsonify({"error": "Missing user_id parameter"}), 400
 
-    user_ref = db.collection('users').document(user_id).get()
-    creds_data = user_ref.to_dict().get('google_calendar_credentials')
-    
-    if not creds_data:
-        return jsonify({"error": "User not authenticated with Google"}), 401
-    
-    creds = Credentials(**creds_data)
-    
-    if not creds.valid:
-        if creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                db.collection('users').document(user_id).update({
-                    'google_calendar_credentials.token': creds.token
-                })
-            except Exception as e:
-                return jsonify({"error": f"Failed to refresh token: {e}"}), 500
-        else:
-            return jsonify({"error": "Credentials are invalid and cannot be refreshed."}), 401
-    
+    user_data = store.get_user(user_id)
     try:
-        service = build("calendar", "v3", credentials=creds)
+        creds = calendar_credentials.get(user_id, user_data)
+    except CredentialsError as e:
+        return jsonify({"error": str(e)}), e.status
 
-        now = datetime.datetime.utcnow().isoformat() + 'Z'
-        
-        events_result = service.events().list(
-            calendarId="primary",
-            timeMin=now,              
-            maxResults=200,           
-            singleEvents=True,
-            orderBy="startTime"
-        ).execute()
-        
-        events = events_result.get("items", [])
-        return jsonify(events)
+    if creds is None:
+        return jsonify({"error": "User not authenticated with Google"}), 401
+
+    try:
+        return jsonify(upcoming_calendar_events(user_id, user_data, creds))
         
     except Exception as e:
         print(f"Error fetching calendar events: {e}")
@@ -492,6 +1204,19 @@ def get_calendar_events():
 
 # event adding
 
+def calendar_event_body(event_data):
+    # The 'body' for the API call requires 'summary', 'start', and 'end'
+    return {
+        'summary': event_data.get('summary'),
+        'start': event_data.get('start'),
+        'end': event_data.get('end'),
+        # Optional fields can be added here
+        'description': event_data.get('description'),
+        'attendees': event_data.get('attendees', []),
+        'reminders': event_data.get('reminders', {'useDefault': True}),
+    }
+
+
 @app.route("/calendar/event/add", methods=["POST"])
 def add_calendar_event():
     data = request.json
@@ -501,47 +1226,26 @@ def add_calendar_event():
     if not user_id or not event_data:
         return jsonify({"error": "Missing user_id or event data"}), 400
 
-    user_ref = db.collection('users').document(user_id).get()
-    creds_data = user_ref.to_dict().get('google_calendar_credentials')
+    # Cached credentials, refreshed ahead of expiry by the credential manager
+    try:
+        creds = calendar_credentials.get(user_id)
+    except CredentialsError as e:
+        return jsonify({"error": str(e)}), e.status
 
-    if not creds_data:
+    if creds is None:
         return jsonify({"error": "User not authenticated with Google"}), 401
-    
-    # Recreate credentials object from Firestore data
-    creds = Credentials(**creds_data)
-    
-    # Check if the access token is expired and refresh it if needed
-    if not creds.valid:
-        if creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                db.collection('users').document(user_id).update({
-                    'google_calendar_credentials.token': creds.token
-                })
-            except Exception as e:
-                return jsonify({"error": f"Failed to refresh token: {e}"}), 500
-        else:
-            return jsonify({"error": "Credentials are invalid and cannot be refreshed."}), 401
 
     try:
-        service = build("calendar", "v3", credentials=creds)
-        
-        # The 'body' for the API call requires 'summary', 'start', and 'end'
-        event_body = {
-            'summary': event_data.get('summary'),
-            'start': event_data.get('start'),
-            'end': event_data.get('end'),
-            # Optional fields can be added here
-            'description': event_data.get('description'),
-            'attendees': event_data.get('attendees', []),
-            'reminders': event_data.get('reminders', {'useDefault': True}),
-        }
+        event_body = calendar_event_body(event_data)
 
         # Use the events().insert() method to add the event
-        created_event = service.events().insert(
-            calendarId='primary',
-            body=event_body
-        ).execute()
+        with calendar_clients.client(user_id, creds) as service:
+            created_event = service.events().insert(
+                calendarId='primary',
+                body=event_body
+            ).execute()
+        store_event(store, user_id, created_event)
+        meeting_index_cache.invalidate_user(user_id)
         
         return jsonify({
             "success": True, 
@@ -564,29 +1268,19 @@ def delete_calendar_event():
     if not user_id or not event_id:
         return jsonify({"error": "Missing user_id or event_id"}), 400
 
-    user_ref = db.collection('users').document(user_id).get()
-    creds_data = user_ref.to_dict().get('google_calendar_credentials')
+    try:
+        creds = calendar_credentials.get(user_id)
+    except CredentialsError as e:
+        return jsonify({"error": str(e)}), e.status
 
-    if not creds_data:
+    if creds is None:
         return jsonify({"error": "User not authenticated with Google"}), 401
 
-    creds = Credentials(**creds_data)
-
-    if not creds.valid:
-        if creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                db.collection('users').document(user_id).update({
-                    'google_calendar_credentials.token': creds.token
-                })
-            except Exception as e:
-                return jsonify({"error": f"Failed to refresh token: {e}"}), 500
-        else:
-            return jsonify({"error": "Credentials are invalid and cannot be refreshed."}), 401
-
     try:
-        service = build("calendar", "v3", credentials=creds)
-        service.events().delete(calendarId="primary", eventId=event_id).execute()
+        with calendar_clients.client(user_id, creds) as service:
+            service.events().delete(calendarId="primary", eventId=event_id).execute()
+        remove_event(store, user_id, event_id)
+        meeting_index_cache.invalidate_user(user_id)
         return jsonify({"success": True, "message": "Event deleted successfully!"})
     except Exception as e:
         print(f"Error deleting calendar event: {e}")
@@ -596,23 +1290,170 @@ def delete_calendar_event():
 
 
 
+@app.route("/calendar/sync/status")
+def calendar_sync_status():
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Missing user_id parameter"}), 400
+
+    user_data = store.get_user(user_id) or {}
+    sync_state = user_data.get('calendar_sync') or {}
+    return jsonify({
+        "user_id": user_id,
+        "last_synced_at": sync_state["last_synced_at"].isoformat() if sync_state.get("last_synced_at") else None,
+        "last_full_sync_at": sync_state["last_full_sync_at"].isoformat() if sync_state.get("last_full_sync_at") else None,
+        "last_changes": sync_state.get("last_changes"),
+        "sync_lag_seconds": sync_lag_seconds(user_id, sync_state)
+    })
+
+
 @app.route("/test_calendar/<user_id>")
 def test_calendar(user_id):
     count = get_meeting_count_last_7d(user_id)
     return jsonify({"meetings_last_7_days": count})
 
     
+# ---------------------------
+# Cache stats (hit/miss counters for scraping)
+# ---------------------------
+@app.route("/cache/stats")
+def cache_stats():
+    stats = {cache.name: cache.stats() for cache in CACHES}
+    stats["calendar_clients"] = calendar_clients.stats()
+    stats["calendar_credentials"] = calendar_credentials.stats()
+    if checkin_writer_resource.loaded:
+        stats["checkin_writer"] = checkin_writer.stats()
+    return jsonify(stats)
+
+
+# ---------------------------
+# Admin: model registry
+# ---------------------------
+def admin_authorized():
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and secrets.compare_digest(token, ADMIN_TOKEN)
+
+
+@app.route("/admin/model")
+def admin_model_status():
+    if not admin_authorized():
+        return jsonify({"success": False, "message": "Forbidden"}), 403
+
+    status = models.status()
+    try:
+        manifest = models.manifest()
+        status["manifest_current"] = manifest.get("current")
+        status["available_versions"] = sorted(manifest.get("versions") or {})
+    except Exception as e:
+        status["manifest_error"] = str(e)
+    return jsonify(status)
+
+
+@app.route("/admin/model/reload", methods=["POST"])
+def admin_model_reload():
+    if not admin_authorized():
+        return jsonify({"success": False, "message": "Forbidden"}), 403
+
+    # Reloads this worker only; to roll out to every worker, edit manifest.json
+    # (with MODEL_MANIFEST_POLL_S set) or send MODEL_RELOAD_SIGNAL to each of them
+    version = (request.get_json(silent=True) or {}).get("version")
+    try:
+        engine = models.reload(version)
+    except Exception as e:
+        print("🔥 Error in /admin/model/reload:", e)
+        return jsonify({"success": False, "message": str(e), "model_version": models.version}), 500
+    return jsonify({"success": True, "model_version": engine.version, **models.status()})
+
+
+# ---------------------------
+# Teams (daily aggregates kept up to date on every check-in)
+# ---------------------------
+@app.route("/admin/teams/<team_id>/members/<user_id>", methods=["PUT", "DELETE"])
+def admin_team_member(team_id, user_id):
+    if not admin_authorized():
+        return jsonify({"success": False, "message": "Forbidden"}), 403
+
+    # Only check-ins written after joining count towards the team; run
+    # repair_rollups.py --teams to recompute from current memberships
+    try:
+        teams = store.set_team_member(user_id, team_id, member=request.method == "PUT")
+        return jsonify({"success": True, "user_id": user_id, "teams": teams})
+    except Exception as e:
+        print("🔥 Error in /admin/teams:", e)
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+def team_day_summary(aggregate):
+    summary = summarize_team(aggregate)
+    if summary["count"] < TEAM_SUMMARY_MIN_COUNT:
+        return {"count": summary["count"], "suppressed": bool(summary["count"])}
+    return summary
+
+
+@app.route("/teams/<team_id>/summary", methods=["GET"])
+def team_summary(team_id):
+    try:
+        to_arg, from_arg = request.args.get("to"), request.args.get("from")
+        end = datetime.date.fromisoformat(to_arg) if to_arg else datetime.date.today()
+        if from_arg:
+            start = datetime.date.fromisoformat(from_arg)
+        else:
+            start = end - timedelta(days=TEAM_SUMMARY_DEFAULT_DAYS - 1)
+    except ValueError:
+        return jsonify({"success": False, "message": "from/to must be dates (YYYY-MM-DD)"}), 400
+
+    if start > end:
+        return jsonify({"success": False, "message": "from is after to"}), 400
+    if (end - start).days + 1 > TRENDS_MAX_BUCKETS:
+        return jsonify({"success": False, "message": f"Too many days (max {TRENDS_MAX_BUCKETS})"}), 400
+
+    try:
+        # One read per stored day; individual check-ins are never touched
+        stored = store.team_days(team_id, start.isoformat(), end.isoformat())
+        days, total = [], None
+        day = start
+        while day <= end:
+            aggregate = stored.get(day.isoformat())
+            days.append({"day": day.isoformat(), **team_day_summary(aggregate or {"count": 0})})
+            total = merge_team_aggregates(total, aggregate)
+            day += timedelta(days=1)
+
+        return jsonify({
+            "success": True,
+            "team_id": team_id,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "total": team_day_summary(total or {"count": 0}),
+            "days": days
+        })
+    except Exception as e:
+        print("🔥 Error in /teams/summary:", e)
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 # ---------------------------
 # RescueTime Integration
 # ---------------------------
+def rescuetime_data_params():
+    return {
+        "key": RESCUETIME_API_KEY,
+        "perspective": "interval",
+        "resolution_time": "hour",
+        "format": "json"
+    }
+
+
 @app.route("/rescuetime/data")
 def get_rescuetime_data():
-    url = f"https://www.rescuetime.com/anapi/data?key={RESCUETIME_API_KEY}&perspective=interval&resolution_time=hour&format=json"
-    response = requests.get(url)
+    response = rescuetime.get(rescuetime_data_params())
     data = response.json()
     return jsonify(data)
 
 
+if WARMUP_ON_START and not PRELOAD_FOR_FORK:
+    start_warm_up()
+
+
 # ---------------------------
 # Run the app
 # ---------------------------
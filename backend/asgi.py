@@ -0,0 +1,402 @@
+"""
+ASGI serving mode. The I/O-bound routes run as coroutines; everything else
+is served by the Flask app through asgiref's WsgiToAsgi.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+
+RescueTime and the Calendar insert/delete calls go through async httpx
+clients. Storage and the Google SDK (credential refresh, calendar sync) have
+no async API here, so those calls run on a bounded thread pool. Model scoring
+runs on its own small pool so CPU work never blocks the event loop.
+Responses match the Flask routes: same bodies, status codes and JSON encoding.
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import json
+import os
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import app as backend
+from calendar_store import remove_event, store_event
+from credentials_manager import CredentialsError
+from google_clients import AsyncCalendarClient
+from metrics import STAGE_SECONDS
+from rescuetime_client import AsyncRescueTimeClient
+from rollups import fetch_rolling_means
+from sources import Source, fetch_sources_async
+from write_behind import WriterFull
+
+# Threads for blocking storage / Google SDK calls made from async routes
+ASGI_BLOCKING_WORKERS = int(os.getenv("ASGI_BLOCKING_WORKERS", "64"))
+
+# Threads for model scoring (CPU-bound; keep small)
+ASGI_SCORING_WORKERS = int(os.getenv("ASGI_SCORING_WORKERS", "2"))
+
+_blocking_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=ASGI_BLOCKING_WORKERS,
+    thread_name_prefix="asgi-blocking"
+)
+_scoring_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=ASGI_SCORING_WORKERS,
+    thread_name_prefix="asgi-scoring"
+)
+
+# Created on startup, inside the server's event loop
+clients = {}
+
+
+def run_blocking(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(_blocking_pool, functools.partial(fn, *args))
+
+
+def _json_default(value):
+    # What Flask's JSON provider does for the non-JSON types our payloads can contain
+    from werkzeug.http import http_date
+
+    if hasattr(value, "timetuple"):
+        return http_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def jsonify(payload, status=200):
+    """Same bytes as flask.jsonify outside debug mode: sorted keys, compact, trailing newline."""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=_json_default) + "\n"
+    return Response(body, status_code=status, media_type="application/json")
+
+
+def instrumented(rule):
+    """Record the route in the same HTTP metrics as the Flask request hooks."""
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            started = time.perf_counter()
+            response = await handler(request)
+            backend.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, rule, request.method)
+            backend.HTTP_REQUESTS.inc(rule, request.method, str(response.status_code))
+            return response
+        return wrapper
+    return decorate
+
+
+async def timed_stage(stage, awaitable):
+    with STAGE_SECONDS.time(stage):
+        return await awaitable
+
+
+async def fetch_screen_time_last_7d(user_id):
+    """Async fetch_screen_time_last_7d: same cache, RescueTime over httpx."""
+    key = (user_id, backend.seven_day_window())
+    found, value = backend.screen_time_cache.get(key)
+    if found:
+        return value
+
+    user_data = await run_blocking(backend.store.get_user, user_id) or {}
+    api_key = user_data.get("rescuetime_api_key")
+    value = await clients["rescuetime"].screen_time_hours(user_id, api_key, days=7) if api_key else 0
+    backend.screen_time_cache.set(key, value)
+    return value
+
+
+def prediction_sources(user_id):
+    """app.prediction_sources with coroutine fetches."""
+    return {
+        "calendar": Source(
+            lambda: timed_stage("calendar", run_blocking(backend.fetch_meeting_features, user_id)),
+            None, backend.CALENDAR_DEADLINE_S
+        ),
+        "rescuetime": Source(
+            lambda: timed_stage("rescuetime", fetch_screen_time_last_7d(user_id)),
+            0, backend.RESCUETIME_DEADLINE_S
+        ),
+        "history": Source(
+            lambda: timed_stage("history", run_blocking(fetch_rolling_means, backend.store, user_id)),
+            None, backend.HISTORY_DEADLINE_S
+        ),
+    }
+
+
+def score_and_version(features):
+    engine = backend.models.current()
+    probs, burnout_probability = engine.score_one(features)
+    return probs, burnout_probability, engine.version
+
+
+async def request_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+# ---------------------------
+# Async routes
+# ---------------------------
+@instrumented("/predict")
+async def predict_burnout(request):
+    try:
+        data = await request.json()
+        user_id = data.get("user_id")
+
+        mood = data.get("mood")
+        stress = data.get("stress")
+        sleep = data.get("sleep")
+        work_hours = data.get("work_hours_today")
+
+        if not user_id or not all([mood, stress, sleep, work_hours]):
+            return jsonify({"success": False, "message": "Missing user_id or required check-in data"}, 400)
+
+        values, sources = await fetch_sources_async(prediction_sources(user_id))
+        features = backend.predict_features(data, values)
+
+        loop = asyncio.get_running_loop()
+        probs, burnout_probability, model_version = await loop.run_in_executor(
+            _scoring_pool, score_and_version, features
+        )
+
+        checkin_data = backend.prediction_checkin(
+            user_id, features, burnout_probability, model_version, values["calendar"]
+        )
+        await timed_stage("save", run_blocking(backend.save_checkin, checkin_data))
+
+        return jsonify(backend.prediction_response(
+            user_id, probs, burnout_probability, model_version, sources, values["calendar"]
+        ))
+
+    except WriterFull as e:
+        print("⚠️ Write-behind queue full in /predict:", e)
+        return jsonify({"success": False, "message": "Check-in queue is full, try again shortly"}, 503)
+
+    except Exception as e:
+        print("🔥 Error in /predict:", e)
+        return jsonify({"success": False, "message": str(e)}, 500)
+
+
+def score_scenarios_and_version(features, axes, has_history):
+    engine = backend.models.current()
+    return backend.score_scenarios(engine, features, axes, has_history), engine.version
+
+
+@instrumented("/predict/scenarios")
+async def predict_scenarios(request):
+    data = await request_json(request) or {}
+    try:
+        user_id, axes, inputs = backend.scenario_request(data)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}, 400)
+
+    try:
+        values, sources = await fetch_sources_async(prediction_sources(user_id))
+        features = backend.predict_features(inputs, values)
+
+        loop = asyncio.get_running_loop()
+        burnout_probs, model_version = await loop.run_in_executor(
+            _scoring_pool, score_scenarios_and_version, features, axes, values["history"] is not None
+        )
+        return jsonify(backend.scenarios_response(user_id, axes, burnout_probs, model_version, sources))
+
+    except Exception as e:
+        print("🔥 Error in /predict/scenarios:", e)
+        return jsonify({"success": False, "message": str(e)}, 500)
+
+
+async def checkin_lines(user_id, limit=None, after=None, start=None, end=None, fields=None):
+    """
+    app.checkin_lines, read in pages of CHECKINS_MAX_PAGE_SIZE: each page is
+    one blocking call (SQLite connections can't move between threads), and
+    only one page is held at a time.
+    """
+    try:
+        while True:
+            size = backend.CHECKINS_MAX_PAGE_SIZE if limit is None else min(limit, backend.CHECKINS_MAX_PAGE_SIZE)
+            entries, next_cursor = await run_blocking(backend.checkin_page, user_id, size, after, start, end, fields)
+            for entry in entries:
+                yield backend.ndjson_line(entry)
+            if next_cursor is None:
+                return
+            if limit is not None:
+                limit -= len(entries)
+                if limit == 0:
+                    yield backend.ndjson_line({"next_cursor": next_cursor})
+                    return
+            after = backend.decode_cursor(next_cursor)
+    except Exception as e:
+        print("🔥 Error in /checkins:", e)
+        yield backend.ndjson_line({"success": False, "message": str(e)})
+
+
+async def checkin_array(user_id, limit=None, after=None, start=None, end=None, fields=None):
+    """app.checkin_array, read in pages like checkin_lines."""
+    yield "["
+    first = True
+    try:
+        while True:
+            entries, next_cursor = await run_blocking(
+                backend.checkin_page, user_id, backend.CHECKINS_MAX_PAGE_SIZE, after, start, end, fields
+            )
+            for entry in entries:
+                yield ("" if first else ",") + backend.ndjson_line(entry)
+                first = False
+            if next_cursor is None:
+                break
+            after = backend.decode_cursor(next_cursor)
+    except Exception as e:
+        print("🔥 Error in /checkins:", e)
+        return
+    yield "]"
+
+
+@instrumented("/checkins")
+async def get_checkins(request):
+    try:
+        user_id, query, output = backend.checkins_request(request.query_params)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}, 400)
+
+    if output == "ndjson":
+        return StreamingResponse(checkin_lines(user_id, **query), media_type="application/x-ndjson")
+    if output == "array":
+        return StreamingResponse(checkin_array(user_id, **query), media_type="application/json")
+
+    try:
+        return jsonify(backend.checkins_response(
+            user_id, *await run_blocking(functools.partial(backend.checkin_page, user_id, **query))
+        ))
+    except Exception as e:
+        print("🔥 Error in /checkins:", e)
+        return jsonify({"success": False, "message": str(e)}, 500)
+
+
+@instrumented("/calendar/events")
+async def get_calendar_events(request):
+    user_id = request.query_params.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Missing user_id parameter"}, 400)
+
+    user_data = await run_blocking(backend.store.get_user, user_id)
+    try:
+        creds = await run_blocking(backend.calendar_credentials.get, user_id, user_data)
+    except CredentialsError as e:
+        return jsonify({"error": str(e)}, e.status)
+
+    if creds is None:
+        return jsonify({"error": "User not authenticated with Google"}, 401)
+
+    try:
+        return jsonify(await run_blocking(backend.upcoming_calendar_events, user_id, user_data, creds))
+    except Exception as e:
+        print(f"Error fetching calendar events: {e}")
+        return jsonify({"error": f"Error fetching calendar events: {e}"}, 500)
+
+
+async def _user_credentials(user_id):
+    """(creds, None) or (None, error response), like the Flask routes."""
+    try:
+        creds = await run_blocking(backend.calendar_credentials.get, user_id)
+    except CredentialsError as e:
+        return None, jsonify({"error": str(e)}, e.status)
+    if creds is None:
+        return None, jsonify({"error": "User not authenticated with Google"}, 401)
+    return creds, None
+
+
+@instrumented("/calendar/event/add")
+async def add_calendar_event(request):
+    data = await request_json(request) or {}
+    user_id = data.get("user_id")
+    event_data = data.get("event")
+
+    if not user_id or not event_data:
+        return jsonify({"error": "Missing user_id or event data"}, 400)
+
+    creds, error = await _user_credentials(user_id)
+    if error is not None:
+        return error
+
+    try:
+        created_event = await clients["calendar"].insert_event(creds, backend.calendar_event_body(event_data))
+        await run_blocking(store_event, backend.store, user_id, created_event)
+        backend.meeting_index_cache.invalidate_user(user_id)
+
+        return jsonify({
+            "success": True,
+            "message": "Event created successfully!",
+            "event_id": created_event.get('id'),
+            "event_link": created_event.get('htmlLink')
+        })
+
+    except Exception as e:
+        print(f"Error creating calendar event: {e}")
+        return jsonify({"error": f"Error creating calendar event: {e}"}, 500)
+
+
+@instrumented("/calendar/event/delete")
+async def delete_calendar_event(request):
+    data = await request_json(request) or {}
+    user_id = data.get("user_id")
+    event_id = data.get("event_id")
+
+    if not user_id or not event_id:
+        return jsonify({"error": "Missing user_id or event_id"}, 400)
+
+    creds, error = await _user_credentials(user_id)
+    if error is not None:
+        return error
+
+    try:
+        await clients["calendar"].delete_event(creds, event_id)
+        await run_blocking(remove_event, backend.store, user_id, event_id)
+        backend.meeting_index_cache.invalidate_user(user_id)
+        return jsonify({"success": True, "message": "Event deleted successfully!"})
+    except Exception as e:
+        print(f"Error deleting calendar event: {e}")
+        return jsonify({"error": f"Error deleting calendar event: {e}"}, 500)
+
+
+@instrumented("/rescuetime/data")
+async def get_rescuetime_data(request):
+    response = await clients["rescuetime"].get(backend.rescuetime_data_params())
+    return jsonify(response.json())
+
+
+ROUTES = [
+    Route("/predict", predict_burnout, methods=["POST"]),
+    Route("/predict/scenarios", predict_scenarios, methods=["POST"]),
+    Route("/checkins", get_checkins, methods=["GET"]),
+    Route("/calendar/events", get_calendar_events, methods=["GET"]),
+    Route("/calendar/event/add", add_calendar_event, methods=["POST"]),
+    Route("/calendar/event/delete", delete_calendar_event, methods=["POST"]),
+    Route("/rescuetime/data", get_rescuetime_data, methods=["GET"]),
+]
+ASYNC_PATHS = {route.path for route in ROUTES}
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_):
+    clients["rescuetime"] = AsyncRescueTimeClient(backend.rescuetime.day_cache)
+    clients["calendar"] = AsyncCalendarClient()
+    yield
+    for client in clients.values():
+        await client.aclose()
+
+
+# CORS as flask_cors sets it up in app.py (any origin, method and header)
+async_app = CORSMiddleware(
+    Starlette(routes=ROUTES, lifespan=lifespan),
+    allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
+)
+wsgi_app = WsgiToAsgi(backend.app)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan" or (scope["type"] == "http" and scope["path"] in ASYNC_PATHS):
+        await async_app(scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
@@ -0,0 +1,127 @@
+"""
+Concurrent-connection capacity: Flask's threaded server vs the ASGI app.
+
+Both modes are run against the same stand-ins (see load_test.py). For each
+mode, a route is driven with an increasing number of concurrent keep-alive
+connections, each sending requests back to back. Capacity is the highest
+level that still has no errors and a p99 under --slo-ms.
+
+Run from backend/:
+    python bench/bench_asgi.py --levels 16,64,256,512 --duration 10
+    python bench/bench_asgi.py --route calendar_events --slo-ms 500
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import RESULTS_DIR, ROUTES, git_commit, percentile, start_processes, user_id, wait_ready
+
+
+async def drive(base_url, route, connections, duration, users, seed):
+    """`connections` closed-loop clients on one route for `duration` seconds."""
+    import httpx
+
+    method, path, make_kwargs = ROUTES[route]
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(index):
+            nonlocal errors
+            rng = random.Random(seed * 1000 + index)
+            while time.perf_counter() < deadline:
+                kwargs = make_kwargs(rng, user_id(rng.randrange(users)))
+                t = time.perf_counter()
+                try:
+                    ok = (await client.request(method, path, **kwargs)).status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - t)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(connections)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "connections": connections,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p99_ms": ms(percentile(latencies, 99))
+    }
+
+
+def capacity(rows, slo_ms):
+    ok = [row["connections"] for row in rows if not row["errors"] and row["p99_ms"] is not None
+          and row["p99_ms"] <= slo_ms]
+    return max(ok) if ok else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--route", default="predict", choices=sorted(ROUTES))
+    parser.add_argument("--levels", default="16,64,256,512", help="concurrent connections, comma-separated")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--slo-ms", type=float, default=1000, help="p99 a level must stay under to count")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--events-per-user", type=int, default=20)
+    parser.add_argument("--storage-ms", type=float, default=10)
+    parser.add_argument("--rescuetime-ms", type=float, default=80)
+    parser.add_argument("--calendar-ms", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results file (default bench/results/asgi_<commit>_<time>.json)")
+    args = parser.parse_args()
+
+    import requests
+
+    levels = [int(level) for level in args.levels.split(",")]
+    report = {"commit": git_commit(), "route": args.route, "slo_ms": args.slo_ms, "modes": {}}
+
+    for mode in ("wsgi", "asgi"):
+        with tempfile.TemporaryDirectory() as workdir:
+            standins, app_process, base_url = start_processes(args, workdir, mode)
+            try:
+                wait_ready(requests.Session(), base_url, timeout=120)
+                asyncio.run(drive(base_url, args.route, min(levels), 2, args.users, args.seed))  # warm-up
+                rows = []
+                for level in levels:
+                    row = asyncio.run(drive(base_url, args.route, level, args.duration, args.users, args.seed))
+                    rows.append(row)
+                    print(f"{mode} c={level:<5} {row['rps']:>8.1f} req/s  p50 {row['p50_ms']} ms  "
+                          f"p99 {row['p99_ms']} ms  errors {row['errors']}/{row['requests']}", flush=True)
+            finally:
+                for process in (app_process, standins):
+                    process.terminate()
+                    process.wait(timeout=10)
+        report["modes"][mode] = {"capacity": capacity(rows, args.slo_ms), "levels": rows}
+
+    print()
+    for mode, result in report["modes"].items():
+        print(f"{mode}: {result['capacity']} concurrent connections within p99 <= {args.slo_ms:.0f} ms, no errors")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"asgi_{report['commit'] or 'nogit'}_{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
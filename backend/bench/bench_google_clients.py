@@ -0,0 +1,64 @@
+"""
+Micro-benchmark: per-request googleapiclient build() vs GoogleClientPool
+checkout for the calendar endpoints.
+
+Only client construction is timed (no network). The pool also keeps each
+user's authorized HTTP session open, which saves a TCP/TLS handshake per
+request on top of the numbers printed here.
+
+Run from backend/:
+    python bench/bench_google_clients.py --iterations 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from google_clients import GoogleClientPool
+
+
+def timed(fn, iterations):
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return np.array(samples) * 1e3  # milliseconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--users", type=int, default=20, help="distinct users cycling through the pool")
+    args = parser.parse_args()
+
+    creds = [Credentials(token=f"token-{u}") for u in range(args.users)]
+    pool = GoogleClientPool("calendar", "v3")
+
+    def per_request(i):
+        service = build("calendar", "v3", credentials=creds[i % args.users])
+        service.events()  # what every calendar route touches first
+
+    def pooled(i):
+        with pool.client(f"user-{i % args.users}", creds[i % args.users]) as service:
+            service.events()
+
+    build_ms = timed(per_request, args.iterations)
+    pool_ms = timed(pooled, args.iterations)
+
+    print(f"{'client':<12}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for name, samples in (("build()", build_ms), ("pool", pool_ms)):
+        print(f"{name:<12}{np.percentile(samples, 50):>10.3f}{np.percentile(samples, 99):>10.3f}")
+    saved = np.percentile(build_ms, 50) - np.percentile(pool_ms, 50)
+    print(f"saved per request (p50): {saved:.3f} ms")
+    print(f"pool: {pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark: legacy single-row path (DataFrame -> scaler.transform ->
+model.predict_proba) vs InferenceEngine.score_one.
+
+Also checks that both paths return the same probabilities.
+
+Run from backend/:
+    python bench/bench_inference.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from inference import CLASS_WEIGHTS, FEATURE_COLUMNS, InferenceEngine
+
+SCALER_PATH = "artifacts/burnout_scaler_final.pkl"
+MODEL_PATH = "artifacts/burnout_model_multiclass_final.pkl"
+TOLERANCE = 1e-6
+
+
+def random_rows(n, seed=42):
+    # Same ranges as gen.py
+    rng = np.random.default_rng(seed)
+    return [{
+        "mood": int(rng.integers(1, 11)),
+        "stress": int(rng.integers(1, 11)),
+        "sleep": int(rng.integers(1, 11)),
+        "work_hours": int(rng.integers(0, 13)),
+        "had_meeting_today": int(rng.integers(0, 2)),
+        "meeting_count_last_7d": int(rng.integers(0, 15)),
+        "screen_time_last_7d": float(rng.integers(0, 4000)),
+        "mean_mood_last_7d": float(rng.uniform(1, 10)),
+        "mean_stress_last_7d": float(rng.uniform(1, 10)),
+        "mean_sleep_last_7d": float(rng.uniform(1, 10)),
+        "mean_work_hours_last_7d": float(rng.uniform(0, 12)),
+    } for _ in range(n)]
+
+
+def legacy_score_one(scaler, model, features):
+    X_input = pd.DataFrame([{col: features.get(col, 0) for col in FEATURE_COLUMNS}])
+    probs = model.predict_proba(scaler.transform(X_input))[0]
+    return probs, float(probs @ CLASS_WEIGHTS)
+
+
+def timed(fn, rows):
+    samples = []
+    for features in rows:
+        start = time.perf_counter()
+        fn(features)
+        samples.append(time.perf_counter() - start)
+    return np.array(samples) * 1e6  # microseconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    scaler = joblib.load(SCALER_PATH)
+    model = joblib.load(MODEL_PATH)
+    engine = InferenceEngine(scaler, model)
+    rows = random_rows(args.iterations)
+
+    # Parity: single rows and one big matrix
+    legacy = np.array([legacy_score_one(scaler, model, f)[0] for f in rows])
+    fast = np.array([engine.score_one(f)[0] for f in rows])
+    batch, _ = engine.score(np.array([engine.row(f) for f in rows]))
+    max_diff = max(np.abs(legacy - fast).max(), np.abs(legacy - batch).max())
+    print(f"max |legacy - engine| = {max_diff:.3e} (tolerance {TOLERANCE:.0e})")
+    if max_diff > TOLERANCE:
+        sys.exit("❌ Engine probabilities do not match the legacy path")
+
+    # Warm up both paths before timing
+    for f in rows[:50]:
+        legacy_score_one(scaler, model, f)
+        engine.score_one(f)
+
+    legacy_us = timed(lambda f: legacy_score_one(scaler, model, f), rows)
+    engine_us = timed(engine.score_one, rows)
+
+    print(f"{'path':<10}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, samples in (("legacy", legacy_us), ("engine", engine_us)):
+        print(f"{name:<10}{np.percentile(samples, 50):>12.1f}{np.percentile(samples, 99):>12.1f}")
+    print(f"p50 speedup: {np.percentile(legacy_us, 50) / np.percentile(engine_us, 50):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
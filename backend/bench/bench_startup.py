@@ -0,0 +1,70 @@
+"""
+Import-time budget check for app.py.
+
+Imports the app in fresh interpreters (with background warm-up disabled, so
+only the import itself is timed) and fails if the median exceeds the budget.
+
+Run from backend/:
+    python bench/bench_startup.py --runs 5 --budget 0.75
+    python bench/bench_startup.py --top 15     # also list the slowest imports
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import budget in seconds (overridable with IMPORT_BUDGET_S)
+IMPORT_BUDGET_S = float(os.getenv("IMPORT_BUDGET_S", "0.75"))
+
+PROBE = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+
+
+def import_seconds(env):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top):
+    # -X importtime writes "import time: self | cumulative | package" lines to stderr
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_S, help="seconds")
+    parser.add_argument("--top", type=int, default=0, help="show the N slowest imports (cumulative)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, WARMUP_ON_START="0")
+    samples = [import_seconds(env) for _ in range(args.runs)]
+    median = statistics.median(samples)
+    print(f"import app: median {median * 1000:.0f} ms, max {max(samples) * 1000:.0f} ms "
+          f"over {args.runs} runs (budget {args.budget * 1000:.0f} ms)")
+
+    if args.top:
+        for cumulative_us, module in slowest_imports(env, args.top):
+            print(f"{cumulative_us / 1000:>10.1f} ms  {module}")
+
+    if median > args.budget:
+        sys.exit("❌ Import-time budget exceeded")
+    print("✅ Within budget")
+
+
+if __name__ == "__main__":
+    main()
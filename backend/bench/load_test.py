@@ -0,0 +1,359 @@
+"""
+Load test for the backend routes against local stand-ins.
+
+Starts the stand-ins (bench/standins.py) and the app in separate processes.
+The app runs on the embedded SQLite storage, with an injected per-call
+latency standing in for Firestore. RescueTime and Google Calendar are
+pointed at the stand-ins through RESCUETIME_API_URL and GOOGLE_API_ENDPOINT.
+
+Each route is then driven at fixed concurrency levels for a fixed duration.
+p50/p95/p99 latency and requests per second are written to a JSON file,
+so runs on different commits can be compared.
+
+Run from backend/:
+    python bench/load_test.py --concurrency 1,8,32 --duration 10
+    python bench/load_test.py --routes predict,checkin --storage-ms 15 --calendar-ms 150
+    python bench/load_test.py --mode asgi     # serve through asgi.py (uvicorn)
+    python bench/load_test.py --compare bench/results/load_<baseline>.json
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(BACKEND_DIR, "bench")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+sys.path.insert(0, BACKEND_DIR)
+
+
+def user_id(n):
+    return f"bench-user-{n}"
+
+
+def checkin_body(rng, uid):
+    return {
+        "user_id": uid,
+        "mood": rng.randint(1, 10),
+        "stress": rng.randint(1, 10),
+        "sleep": rng.randint(1, 10),
+        "work_hours_today": rng.randint(1, 12)
+    }
+
+
+def scenarios_body(rng, uid):
+    # 10 x 13 x 10 = 1300 grid points around a random check-in
+    return {
+        **checkin_body(rng, uid),
+        "grid": {
+            "sleep": {"start": 4, "stop": 8.5, "step": 0.5},
+            "work_hours": {"start": 4, "stop": 16, "step": 1},
+            "stress": list(range(1, 11))
+        }
+    }
+
+
+def event_body(rng, uid):
+    start = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=rng.randint(1, 72))
+    return {
+        "user_id": uid,
+        "event": {
+            "summary": "Load test",
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": (start + datetime.timedelta(minutes=30)).isoformat()}
+        }
+    }
+
+
+# route name -> (method, path, request kwargs for (rng, user_id))
+ROUTES = {
+    "checkin": ("POST", "/checkin", lambda rng, uid: {"json": checkin_body(rng, uid)}),
+    "predict": ("POST", "/predict", lambda rng, uid: {"json": checkin_body(rng, uid)}),
+    "scenarios": ("POST", "/predict/scenarios", lambda rng, uid: {"json": scenarios_body(rng, uid)}),
+    "checkins": ("GET", "/checkins", lambda rng, uid: {"params": {"user_id": uid}}),
+    "calendar_events": ("GET", "/calendar/events", lambda rng, uid: {"params": {"user_id": uid}}),
+    "calendar_add": ("POST", "/calendar/event/add", lambda rng, uid: {"json": event_body(rng, uid)}),
+    "calendar_delete": ("POST", "/calendar/event/delete",
+                        lambda rng, uid: {"json": {"user_id": uid, "event_id": f"bench-{rng.getrandbits(32)}"}}),
+    "calendar_sync_status": ("GET", "/calendar/sync/status", lambda rng, uid: {"params": {"user_id": uid}}),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+# ---------------------------
+# App process
+# ---------------------------
+def serve_app(port, users, storage_latency_ms, standins_url, mode="wsgi"):
+    """Run the app with latency-injected SQLite storage and seeded users (blocks)."""
+    from werkzeug.serving import make_server
+
+    import app as backend
+    from metrics import TimedStorage
+    from standins import LatencyStorage
+    from storage import open_storage
+
+    sqlite_store = open_storage("sqlite")
+    expiry = datetime.datetime.utcnow() + datetime.timedelta(days=365)
+    for n in range(users):
+        sqlite_store.update_user(user_id(n), {
+            "rescuetime_api_key": f"bench-key-{n}",
+            "google_calendar_credentials": {
+                "token": f"bench-token-{n}",
+                "refresh_token": "bench-refresh",
+                "token_uri": f"{standins_url}/token",
+                "client_id": "bench",
+                "client_secret": "bench",
+                "scopes": ["https://www.googleapis.com/auth/calendar"],
+                "expiry": expiry
+            }
+        })
+
+    backend.storage_resource._loader = lambda: TimedStorage(LatencyStorage(sqlite_store, storage_latency_ms / 1000))
+    backend.start_warm_up()
+
+    print(f"app ({mode}) listening on http://127.0.0.1:{port}", flush=True)
+    if mode == "asgi":
+        import uvicorn
+
+        import asgi
+        uvicorn.run(asgi.application, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+        return
+
+    server = make_server("127.0.0.1", port, backend.app, threaded=True)
+    server.serve_forever()
+
+
+def start_processes(args, workdir, mode="wsgi"):
+    standins_port, app_port = free_port(), free_port()
+    standins_url = f"http://127.0.0.1:{standins_port}"
+
+    standins = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "standins.py"),
+        "--port", str(standins_port),
+        "--rescuetime-ms", str(args.rescuetime_ms),
+        "--calendar-ms", str(args.calendar_ms),
+        "--events-per-user", str(args.events_per_user)
+    ], cwd=BACKEND_DIR)
+
+    env = dict(
+        os.environ,
+        STORAGE_BACKEND="sqlite",
+        SQLITE_PATH=os.path.join(workdir, "bench.sqlite3"),
+        RESCUETIME_API_URL=f"{standins_url}/rescuetime/anapi/data",
+        GOOGLE_API_ENDPOINT=f"{standins_url}/calendar/v3/",
+        FLASK_SECRET_KEY="bench",
+        WARMUP_ON_START="0"
+    )
+    app_process = subprocess.Popen([
+        sys.executable, os.path.abspath(__file__), "--serve-app",
+        "--port", str(app_port),
+        "--users", str(args.users),
+        "--storage-ms", str(args.storage_ms),
+        "--standins-url", standins_url,
+        "--mode", mode
+    ], cwd=BACKEND_DIR, env=env)
+    return standins, app_process, f"http://127.0.0.1:{app_port}"
+
+
+def wait_ready(session, base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if session.get(f"{base_url}/readyz", timeout=2).status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"app not ready after {timeout}s")
+
+
+# ---------------------------
+# Load driver
+# ---------------------------
+def run_level(base_url, route, concurrency, duration, users, seed):
+    """Drive one route with `concurrency` closed-loop workers for `duration` seconds."""
+    import requests
+
+    method, path, make_kwargs = ROUTES[route]
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        mine, failed = [], 0
+        start_barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            kwargs = make_kwargs(rng, user_id(rng.randrange(users)))
+            t = time.perf_counter()
+            try:
+                ok = session.request(method, base_url + path, timeout=30, **kwargs).status_code < 400
+            except requests.RequestException:
+                ok = False
+            mine.append(time.perf_counter() - t)
+            failed += not ok
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    deadline[0] = started + duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "route": route,
+        "method": method,
+        "path": path,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["route"], r["concurrency"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}:")
+    for row in results:
+        before = baseline.get((row["route"], row["concurrency"]))
+        if not before:
+            continue
+        change = lambda key: (row[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+        print(f"  {row['route']:<22} c={row['concurrency']:<4} "
+              f"p99 {before['p99_ms']:>9.1f} -> {row['p99_ms']:>9.1f} ms ({change('p99_ms'):+.1f}%)  "
+              f"rps {before['rps']:>8.1f} -> {row['rps']:>8.1f} ({change('rps'):+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated, from: " + ", ".join(ROUTES))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated levels")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per route and level")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of unrecorded load per route")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--events-per-user", type=int, default=20)
+    parser.add_argument("--storage-ms", type=float, default=10, help="injected latency per storage call")
+    parser.add_argument("--rescuetime-ms", type=float, default=80)
+    parser.add_argument("--calendar-ms", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mode", choices=("wsgi", "asgi"), default="wsgi",
+                        help="serve with Flask's threaded server or the ASGI app (asgi.py)")
+    parser.add_argument("--output", help="results file (default bench/results/load_<commit>_<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    # Internal: run the app process
+    parser.add_argument("--serve-app", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--standins-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_app:
+        serve_app(args.port, args.users, args.storage_ms, args.standins_url, args.mode)
+        return
+
+    import requests
+
+    routes = [route.strip() for route in args.routes.split(",") if route.strip()]
+    unknown = [route for route in routes if route not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        standins, app_process, base_url = start_processes(args, workdir, args.mode)
+        try:
+            wait_ready(requests.Session(), base_url, timeout=120)
+            for route in routes:
+                if args.warmup:
+                    run_level(base_url, route, max(levels), args.warmup, args.users, args.seed)
+                for level in levels:
+                    row = run_level(base_url, route, level, args.duration, args.users, args.seed)
+                    results.append(row)
+                    print(f"{route:<22} c={level:<4} {row['rps']:>8.1f} req/s  "
+                          f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  p99 {row['p99_ms']} ms  "
+                          f"errors {row['errors']}/{row['requests']}", flush=True)
+        finally:
+            for process in (app_process, standins):
+                process.terminate()
+                process.wait(timeout=10)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "config": {
+            "mode": args.mode,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "users": args.users,
+            "events_per_user": args.events_per_user,
+            "storage_ms": args.storage_ms,
+            "rescuetime_ms": args.rescuetime_ms,
+            "calendar_ms": args.calendar_ms,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"load_{commit or 'nogit'}_{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
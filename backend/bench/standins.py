@@ -0,0 +1,183 @@
+"""
+Local stand-ins for the services the backend talks to, for load tests.
+
+- RescueTime: GET /rescuetime/anapi/data (daily interval rows)
+- Google Calendar: events list (full and syncToken), insert and delete
+  under /calendar/v3/calendars/primary/events, keyed by the bearer token
+- Firestore: LatencyStorage wraps a Storage backend (usually SQLite)
+
+Every stand-in sleeps for its configured latency before answering.
+
+Run on its own (load_test.py starts it for you):
+    python bench/standins.py --port 8765 --rescuetime-ms 80 --calendar-ms 120
+"""
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+EVENTS_PATH = "/calendar/v3/calendars/primary/events"
+RESCUETIME_PATH = "/rescuetime/anapi/data"
+
+
+class LatencyStorage:
+    """Forwards to a Storage backend, sleeping `latency_s` before every call."""
+
+    def __init__(self, inner, latency_s):
+        self._inner = inner
+        self._latency_s = latency_s
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if not callable(attr) or not self._latency_s:
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(self._latency_s)
+            return attr(*args, **kwargs)
+        return call
+
+
+class CalendarState:
+    """Per-token event lists, seeded with `events_per_user` events in the last week."""
+
+    def __init__(self, events_per_user):
+        self.events_per_user = events_per_user
+        self._calendars = {}
+        self._lock = threading.Lock()
+
+    def _seed(self):
+        now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        events = {}
+        for i in range(self.events_per_user):
+            start = now - datetime.timedelta(hours=random.randint(1, 24 * 7))
+            event = _event(f"seed{i}", f"Meeting {i}", start, start + datetime.timedelta(minutes=30))
+            events[event["id"]] = event
+        return events
+
+    def events(self, token):
+        with self._lock:
+            if token not in self._calendars:
+                self._calendars[token] = self._seed()
+            return list(self._calendars[token].values())
+
+    def insert(self, token, body):
+        event = dict(body, id=uuid.uuid4().hex, status="confirmed", updated=_now_iso())
+        event["htmlLink"] = f"http://calendar.invalid/event?eid={event['id']}"
+        with self._lock:
+            self._calendars.setdefault(token, {})[event["id"]] = event
+        return event
+
+    def delete(self, token, event_id):
+        with self._lock:
+            self._calendars.get(token, {}).pop(event_id, None)
+
+
+def _now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _event(event_id, summary, start, end):
+    return {
+        "id": event_id,
+        "status": "confirmed",
+        "summary": summary,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": end.isoformat()},
+        "created": start.isoformat(),
+        "updated": start.isoformat(),
+        "htmlLink": f"http://calendar.invalid/event?eid={event_id}"
+    }
+
+
+def make_handler(calendar, rescuetime_latency_s, calendar_latency_s):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload=None):
+            body = json.dumps(payload).encode() if payload is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _token(self):
+            return self.headers.get("Authorization", "").replace("Bearer ", "")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == RESCUETIME_PATH:
+                time.sleep(rescuetime_latency_s)
+                return self._send(200, {"rows": _rescuetime_rows(query)})
+            if url.path == EVENTS_PATH:
+                time.sleep(calendar_latency_s)
+                # Incremental syncs see no changes; full syncs get every event
+                items = [] if "syncToken" in query else calendar.events(self._token())
+                return self._send(200, {"items": items, "nextSyncToken": uuid.uuid4().hex})
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if urlparse(self.path).path != EVENTS_PATH:
+                return self._send(404, {"error": "not found"})
+            time.sleep(calendar_latency_s)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            self._send(200, calendar.insert(self._token(), body))
+
+        def do_DELETE(self):
+            path = urlparse(self.path).path
+            if not path.startswith(EVENTS_PATH + "/"):
+                return self._send(404, {"error": "not found"})
+            time.sleep(calendar_latency_s)
+            calendar.delete(self._token(), path.rsplit("/", 1)[-1])
+            self._send(204)
+
+    return Handler
+
+
+def _rescuetime_rows(query):
+    # Interval rows: [date, seconds, people, productivity level]
+    begin = datetime.date.fromisoformat(query.get("restrict_begin", datetime.date.today().isoformat()))
+    end = datetime.date.fromisoformat(query.get("restrict_end", begin.isoformat()))
+    rows = []
+    day = begin
+    while day <= end:
+        rows.append([f"{day.isoformat()}T00:00:00", random.randint(3600, 8 * 3600), 1, 2])
+        day += datetime.timedelta(days=1)
+    return rows
+
+
+def serve(port=0, rescuetime_ms=0, calendar_ms=0, events_per_user=20):
+    """Start the RescueTime and Calendar stand-ins in a background thread; returns the server."""
+    handler = make_handler(CalendarState(events_per_user), rescuetime_ms / 1000, calendar_ms / 1000)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="standins", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rescuetime-ms", type=float, default=0)
+    parser.add_argument("--calendar-ms", type=float, default=0)
+    parser.add_argument("--events-per-user", type=int, default=20)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.rescuetime_ms, args.calendar_ms, args.events_per_user)
+    print(f"stand-ins listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
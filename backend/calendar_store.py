@@ -0,0 +1,210 @@
+import concurrent.futures
+import datetime
+import os
+import threading
+
+from outbound_scheduler import BACKGROUND, priority as outbound_priority
+
+# How old a user's calendar_events copy may get before a background sync is started
+CALENDAR_SYNC_MAX_AGE_S = float(os.getenv("CALENDAR_SYNC_MAX_AGE_S", "300"))
+
+# A full sync lists events from this many days back (incremental syncs are unbounded)
+CALENDAR_FULL_SYNC_LOOKBACK_DAYS = int(os.getenv("CALENDAR_FULL_SYNC_LOOKBACK_DAYS", "30"))
+
+# ... and this many days ahead, so recurring events without an end don't expand
+# forever. Incremental syncs keep the window of the full sync they continue, so
+# a full sync is redone once half of it has passed
+CALENDAR_FULL_SYNC_HORIZON_DAYS = int(os.getenv("CALENDAR_FULL_SYNC_HORIZON_DAYS", "30"))
+
+# Background syncs run here so requests never wait on Google or storage
+CALENDAR_SYNC_WORKERS = int(os.getenv("CALENDAR_SYNC_WORKERS", "2"))
+_sync_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=CALENDAR_SYNC_WORKERS,
+    thread_name_prefix="calendar-sync"
+)
+
+# user_ids with a background sync queued or running
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+# user_id -> last successful sync (UTC), for sync lag reporting
+last_synced = {}
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def parse_event_time(value):
+    """Google {"dateTime": ...} / {"date": ...} -> aware UTC datetime (all-day events start at 00:00 UTC)."""
+    if not value:
+        return None
+    if value.get("dateTime"):
+        parsed = datetime.datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+        return parsed.astimezone(datetime.timezone.utc)
+    if value.get("date"):
+        return datetime.datetime.fromisoformat(value["date"]).replace(tzinfo=datetime.timezone.utc)
+    return None
+
+
+def event_fields(event):
+    """The subset of a Google Calendar event we keep in calendar_events."""
+    return {
+        "summary": event.get("summary"),
+        "description": event.get("description"),
+        "location": event.get("location"),
+        "htmlLink": event.get("htmlLink"),
+        "status": event.get("status"),
+        "start": event.get("start"),
+        "end": event.get("end"),
+        "created": event.get("created"),
+        "updated": event.get("updated"),
+        # Sortable copies of start/end for range queries
+        "start_ts": parse_event_time(event.get("start")),
+        "end_ts": parse_event_time(event.get("end"))
+    }
+
+
+def _needs_write(event, stored):
+    if event.get("status") == "cancelled":
+        return event["id"] in stored
+    current = stored.get(event["id"])
+    # Documents written before start_ts existed are rewritten once
+    return current is None or current.get("updated") != event.get("updated") or "start_ts" not in current
+
+
+def persist_events(store, user_id, events):
+    """
+    Apply events to the user's stored calendar events with batched writes.
+    Cancelled events are deleted; events whose `updated` timestamp matches the
+    stored copy are skipped. Returns the number of events written or deleted.
+    """
+    events = [event for event in events if event.get("id")]
+    if not events:
+        return 0
+
+    stored = store.event_versions(user_id, [event["id"] for event in events])
+    changed = [event for event in events if _needs_write(event, stored)]
+
+    store.write_events(
+        user_id,
+        upserts={event["id"]: event_fields(event) for event in changed if event.get("status") != "cancelled"},
+        deletes=[event["id"] for event in changed if event.get("status") == "cancelled"]
+    )
+    return len(changed)
+
+
+def _list_all(service, **params):
+    """Page through events().list; returns (events, nextSyncToken)."""
+    events, page_token = [], None
+    while True:
+        result = service.events().list(
+            calendarId="primary",
+            singleEvents=True,
+            maxResults=2500,
+            pageToken=page_token,
+            **params
+        ).execute()
+        events.extend(result.get("items", []))
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            return events, result.get("nextSyncToken")
+
+
+def sync_calendar(store, service, user_id, sync_state=None):
+    """
+    Bring calendar_events up to date with Google Calendar.
+    Uses the stored nextSyncToken to fetch only changed/deleted events; falls
+    back to a full resync when there is no token, Google invalidated it (410)
+    or half of the last full sync's forward window has passed.
+    Returns the new sync state saved on the user document.
+    """
+    from googleapiclient.errors import HttpError
+
+    sync_state = sync_state or {}
+    token = sync_state.get("sync_token")
+    started = _utcnow()
+
+    last_full = sync_state.get("last_full_sync_at")
+    if token and (last_full is None or started - last_full > datetime.timedelta(days=CALENDAR_FULL_SYNC_HORIZON_DAYS / 2)):
+        # The window the token was issued for is running out
+        token = None
+
+    events, next_token, full = None, None, False
+    if token:
+        try:
+            events, next_token = _list_all(service, syncToken=token, showDeleted=True)
+        except HttpError as e:
+            if e.resp.status != 410:
+                raise
+            print(f"⚠️ Calendar sync token expired for {user_id}, doing a full resync")
+
+    if events is None:
+        full = True
+        time_min = (started - datetime.timedelta(days=CALENDAR_FULL_SYNC_LOOKBACK_DAYS)).isoformat()
+        time_max = (started + datetime.timedelta(days=CALENDAR_FULL_SYNC_HORIZON_DAYS)).isoformat()
+        events, next_token = _list_all(service, timeMin=time_min, timeMax=time_max)
+
+    changes = persist_events(store, user_id, events)
+    if full:
+        # Drop stored events Google no longer returns
+        changes += store.delete_events_except(user_id, {event.get("id") for event in events})
+
+    finished = _utcnow()
+    state = {
+        "sync_token": next_token,
+        "last_synced_at": finished,
+        "last_full_sync_at": finished if full else sync_state.get("last_full_sync_at"),
+        "last_changes": changes,
+    }
+    store.update_user(user_id, {"calendar_sync": state})
+    last_synced[user_id] = finished
+    return state
+
+
+def _sync_in_background(store, client_factory, user_id, sync_state):
+    try:
+        # Refreshes nobody is waiting on yield Calendar quota to interactive calls
+        with outbound_priority(BACKGROUND), client_factory() as service:
+            sync_calendar(store, service, user_id, sync_state)
+    except Exception as e:
+        print(f"⚠️ Error syncing calendar for {user_id}: {e}")
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(user_id)
+
+
+def ensure_synced(store, client_factory, user_id, sync_state):
+    """
+    Make calendar_events fit to serve from.
+    `client_factory()` returns a context manager yielding a Calendar service.
+    Never-synced users are synced inline; a stale copy is served as-is while a
+    background sync (at most one per user) refreshes it.
+    """
+    last = (sync_state or {}).get("last_synced_at")
+    if not (sync_state or {}).get("sync_token") or last is None:
+        with client_factory() as service:
+            return sync_calendar(store, service, user_id, sync_state)
+
+    if (_utcnow() - last).total_seconds() > CALENDAR_SYNC_MAX_AGE_S:
+        with _in_flight_lock:
+            if user_id in _in_flight:
+                return sync_state
+            _in_flight.add(user_id)
+        _sync_pool.submit(_sync_in_background, store, client_factory, user_id, sync_state)
+    return sync_state
+
+
+def sync_lag_seconds(user_id, sync_state=None):
+    """Seconds since the user's last successful sync, or None if never synced."""
+    last = last_synced.get(user_id) or (sync_state or {}).get("last_synced_at")
+    return (_utcnow() - last).total_seconds() if last else None
+
+
+def store_event(store, user_id, event):
+    """Write one event straight into the store (after we create it through the API)."""
+    store.write_events(user_id, upserts={event["id"]: event_fields(event)}, deletes=[])
+
+
+def remove_event(store, user_id, event_id):
+    store.write_events(user_id, upserts={}, deletes=[event_id])
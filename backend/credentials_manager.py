@@ -0,0 +1,238 @@
+import datetime
+import os
+import threading
+import time
+
+# Tokens expiring within this many seconds are refreshed in the background
+TOKEN_REFRESH_MARGIN_S = float(os.getenv("TOKEN_REFRESH_MARGIN_S", "300"))
+
+# How often the background refresher scans cached credentials
+TOKEN_REFRESH_INTERVAL_S = float(os.getenv("TOKEN_REFRESH_INTERVAL_S", "60"))
+
+# Credentials not used for this long are dropped (and no longer kept fresh)
+CREDENTIALS_IDLE_S = float(os.getenv("CREDENTIALS_IDLE_S", "3600"))
+
+# After a failed refresh, wait this long before trying that user again; doubles per failure, capped
+TOKEN_REFRESH_BACKOFF_S = float(os.getenv("TOKEN_REFRESH_BACKOFF_S", "30"))
+TOKEN_REFRESH_BACKOFF_MAX_S = float(os.getenv("TOKEN_REFRESH_BACKOFF_MAX_S", "3600"))
+
+CREDENTIALS_FIELD = "google_calendar_credentials"
+
+
+class CredentialsError(Exception):
+    """Credentials exist but can't be used; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def _naive_utc(value):
+    # google-auth compares expiry against a naive UTC clock; Firestore hands back aware datetimes
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def credentials_from_dict(creds_data):
+    from google.oauth2.credentials import Credentials
+
+    creds_data = dict(creds_data)
+    expiry = _naive_utc(creds_data.pop("expiry", None))
+    return Credentials(**creds_data, expiry=expiry)
+
+
+def _copy(creds):
+    from google.oauth2.credentials import Credentials
+
+    return Credentials(
+        token=creds.token,
+        refresh_token=creds.refresh_token,
+        token_uri=creds.token_uri,
+        client_id=creds.client_id,
+        client_secret=creds.client_secret,
+        scopes=creds.scopes,
+        expiry=creds.expiry
+    )
+
+
+class CredentialManager:
+    """
+    Google OAuth credentials for every user, decoded once and kept in memory.
+    Refreshes are single-flight per user (concurrent callers wait for the one
+    in-flight refresh and share its token), and a background thread refreshes
+    tokens shortly before they expire so requests don't pay for the round trip.
+    A user whose refresh fails isn't retried until an exponential backoff has
+    passed, so a revoked token doesn't hammer Google's token endpoint.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._creds = {}        # user_id -> Credentials
+        self._last_used = {}    # user_id -> monotonic time
+        self._user_locks = {}   # user_id -> Lock held while refreshing
+        self._failures = {}     # user_id -> (consecutive refresh failures, monotonic time of next attempt)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def start(self):
+        """Start the background refresher (idempotent)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+                self._thread.start()
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def _backing_off(self, user_id, now=None):
+        failure = self._failures.get(user_id)
+        return failure is not None and (now or time.monotonic()) < failure[1]
+
+    def _forget(self, user_id):
+        # Caller holds self._lock. A lock held by a refresh in flight is left to it
+        self._creds.pop(user_id, None)
+        self._last_used.pop(user_id, None)
+        self._failures.pop(user_id, None)
+        lock = self._user_locks.get(user_id)
+        if lock is not None and not lock.locked():
+            del self._user_locks[user_id]
+
+    def _needs_refresh(self, creds):
+        if creds.expiry is None:
+            return True  # unknown expiry: refresh once to learn it
+        remaining = (creds.expiry - datetime.datetime.utcnow()).total_seconds()
+        return remaining < TOKEN_REFRESH_MARGIN_S
+
+    def _load(self, user_id, user_data):
+        if user_data is None:
+            user_data = self._store.get_user(user_id)
+        creds_data = (user_data or {}).get(CREDENTIALS_FIELD)
+        if not creds_data:
+            return None
+        creds = credentials_from_dict(creds_data)
+        with self._lock:
+            self._creds[user_id] = creds
+        return creds
+
+    def get(self, user_id, user_data=None):
+        """
+        Usable credentials for `user_id`, or None if the user never connected Google.
+        `user_data` (the user document, if the caller already has it) avoids a read on a miss.
+        Raises CredentialsError if the token is expired and can't be refreshed.
+        """
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            creds = self._creds.get(user_id)
+            self._last_used[user_id] = time.monotonic()
+        if creds is None:
+            creds = self._load(user_id, user_data)
+            if creds is None:
+                return None
+
+        if creds.valid:
+            if self._needs_refresh(creds) and not self._backing_off(user_id):
+                self._wake.set()  # let the refresher pick it up now
+            return creds
+
+        if not (creds.expired and creds.refresh_token):
+            raise CredentialsError("Credentials are invalid and cannot be refreshed.", 401)
+        try:
+            return self.refresh(user_id)
+        except CredentialsError:
+            raise
+        except Exception as e:
+            raise CredentialsError(f"Failed to refresh token: {e}", 500)
+
+    def refresh(self, user_id):
+        """Refresh the user's token; concurrent calls share a single refresh."""
+        with self._user_lock(user_id):
+            with self._lock:
+                current = self._creds.get(user_id)
+            if current is None:
+                return None
+            # Another caller refreshed while we were waiting
+            if current.valid and not self._needs_refresh(current):
+                return current
+            now = time.monotonic()
+            if self._backing_off(user_id, now):
+                retry_in = self._failures[user_id][1] - now
+                raise CredentialsError(f"Token refresh failed recently; retrying in {retry_in:.0f}s", 503)
+
+            from google.auth.transport.requests import Request
+
+            fresh = _copy(current)
+            try:
+                fresh.refresh(Request())
+            except Exception:
+                self.refresh_errors += 1
+                with self._lock:
+                    failures = self._failures.get(user_id, (0, 0))[0] + 1
+                    backoff = min(TOKEN_REFRESH_BACKOFF_MAX_S, TOKEN_REFRESH_BACKOFF_S * 2 ** (failures - 1))
+                    self._failures[user_id] = (failures, time.monotonic() + backoff)
+                raise
+
+            with self._lock:
+                # invalidate() ran meanwhile (reconnect, eviction): this token is stale, don't persist it
+                if self._creds.get(user_id) is not current:
+                    return self._creds.get(user_id)
+                self._creds[user_id] = fresh
+                self._failures.pop(user_id, None)
+            self._store.update_user(user_id, {
+                f"{CREDENTIALS_FIELD}.token": fresh.token,
+                f"{CREDENTIALS_FIELD}.expiry": fresh.expiry
+            })
+            self.refreshes += 1
+            return fresh
+
+    def invalidate(self, user_id):
+        """Forget cached credentials (e.g. after the user reconnects)."""
+        with self._lock:
+            self._forget(user_id)
+
+    def replace(self, user_id, fields):
+        """
+        Write reconnected credentials (and any other user fields in `fields`)
+        and drop the cached copy. Waits for a refresh in flight, so it can't
+        write the old token over the new credentials.
+        """
+        with self._user_lock(user_id):
+            self._store.update_user(user_id, fields)
+            with self._lock:
+                self._creds.pop(user_id, None)
+                self._last_used.pop(user_id, None)
+                self._failures.pop(user_id, None)
+
+    def _run(self):
+        while True:
+            self._wake.wait(TOKEN_REFRESH_INTERVAL_S)
+            self._wake.clear()
+
+            now = time.monotonic()
+            with self._lock:
+                for user_id in [u for u, t in self._last_used.items() if now - t > CREDENTIALS_IDLE_S]:
+                    self._forget(user_id)
+                due = [
+                    u for u, c in self._creds.items()
+                    if c.refresh_token and self._needs_refresh(c) and not self._backing_off(u, now)
+                ]
+
+            for user_id in due:
+                try:
+                    self.refresh(user_id)
+                except Exception as e:
+                    print(f"⚠️ Background token refresh failed for {user_id}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._creds),
+                "backing_off": sum(1 for u in self._failures if self._backing_off(u)),
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors
+            }
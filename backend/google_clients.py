@@ -0,0 +1,282 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import OUTBOUND_ERRORS, outbound
+from outbound_scheduler import OutboundScheduler, retry_after_seconds
+
+# At most this many per-user clients are kept; least recently used go first
+GOOGLE_CLIENT_POOL_SIZE = int(os.getenv("GOOGLE_CLIENT_POOL_SIZE", "256"))
+
+# Clients unused for this long are closed
+GOOGLE_CLIENT_IDLE_S = float(os.getenv("GOOGLE_CLIENT_IDLE_S", "600"))
+
+# Socket timeout for Google API calls (seconds)
+GOOGLE_HTTP_TIMEOUT_S = float(os.getenv("GOOGLE_HTTP_TIMEOUT_S", "10"))
+
+# Base URL for API calls instead of the discovery document's (e.g. a local stand-in for load tests)
+GOOGLE_API_ENDPOINT = os.getenv("GOOGLE_API_ENDPOINT")
+
+# Calendar REST base URL used by the async client when GOOGLE_API_ENDPOINT is unset
+CALENDAR_API_BASE = "https://www.googleapis.com/calendar/v3/"
+
+# Connections kept open by the async Calendar client
+GOOGLE_ASYNC_POOL_SIZE = int(os.getenv("GOOGLE_ASYNC_POOL_SIZE", "100"))
+
+# Calendar API admission: calls in flight, sustained calls/s and burst (size to the project's quota)
+GOOGLE_CALENDAR_CONCURRENCY = int(os.getenv("GOOGLE_CALENDAR_CONCURRENCY", "16"))
+GOOGLE_CALENDAR_RATE_PER_S = float(os.getenv("GOOGLE_CALENDAR_RATE_PER_S", "10"))
+GOOGLE_CALENDAR_BURST = float(os.getenv("GOOGLE_CALENDAR_BURST", "20"))
+
+# Times a rate-limited Google call is queued again (after the pause) before its error is returned
+GOOGLE_RATE_LIMIT_RETRIES = int(os.getenv("GOOGLE_RATE_LIMIT_RETRIES", "2"))
+
+# Shared by every Calendar call in the process, sync and async
+calendar_scheduler = OutboundScheduler(
+    "google_calendar", GOOGLE_CALENDAR_CONCURRENCY, GOOGLE_CALENDAR_RATE_PER_S, GOOGLE_CALENDAR_BURST
+)
+SCHEDULERS = {"google_calendar": calendar_scheduler}
+
+# Discovery documents, read and parsed once per process
+_discovery_docs = {}
+_discovery_lock = threading.Lock()
+
+
+def discovery_document(api, version):
+    """The API's discovery document, cached in memory (None if no bundled copy exists)."""
+    from googleapiclient.discovery_cache import get_static_doc
+
+    with _discovery_lock:
+        if (api, version) not in _discovery_docs:
+            _discovery_docs[(api, version)] = get_static_doc(api, version)
+        return _discovery_docs[(api, version)]
+
+
+def _rate_limited(status, content):
+    # Calendar signals quota exhaustion as 429, or as 403 with a (user)RateLimitExceeded reason
+    content = content or b""
+    return status == 429 or (status == 403 and (b"rateLimitExceeded" in content or b"RateLimitExceeded" in content))
+
+
+def _instrument(http, api):
+    """
+    Route every HTTP call the service makes through the API's scheduler and
+    time it (labelled by method) in boz_outbound_seconds. Identical GETs in
+    flight for the same user are sent once.
+    """
+    send = http.request
+    scheduler = SCHEDULERS.get(api)
+
+    def send_scheduled(uri, method, args, kwargs):
+        operation = method.lower()
+        for _ in range(GOOGLE_RATE_LIMIT_RETRIES + 1):
+            with scheduler.slot():
+                with outbound(api, operation):
+                    response, content = send(uri, method, *args, **kwargs)
+            if response.status >= 400:
+                OUTBOUND_ERRORS.inc(api, operation)
+            if not _rate_limited(response.status, content):
+                scheduler.succeeded()
+                break
+            scheduler.throttled(retry_after_seconds(response.get("retry-after")))
+        return response, content
+
+    def request(uri, method="GET", *args, **kwargs):
+        if scheduler is None:
+            with outbound(api, method.lower()):
+                response, content = send(uri, method, *args, **kwargs)
+            if response.status >= 400:
+                OUTBOUND_ERRORS.inc(api, method.lower())
+            return response, content
+        if method != "GET":
+            return send_scheduled(uri, method, args, kwargs)
+        # The access token tells users apart (the Authorization header is added inside send)
+        token = getattr(getattr(http, "credentials", None), "token", None)
+        return scheduler.coalesce((uri, token), lambda: send_scheduled(uri, method, args, kwargs))
+
+    http.request = request
+    return http
+
+
+class _Entry:
+    def __init__(self, service, token):
+        self.service = service
+        self.token = token
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class GoogleClientPool:
+    """
+    Per-user googleapiclient services that are reused across requests.
+    Each service keeps its own authorized httplib2 session alive. A client is used
+    by one request at a time; a concurrent request for the same user gets a
+    throwaway client built from the cached discovery document.
+    """
+
+    def __init__(self, api, version, max_size=GOOGLE_CLIENT_POOL_SIZE, idle_seconds=GOOGLE_CLIENT_IDLE_S):
+        self.api = api
+        self.version = version
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._entries = OrderedDict()  # user_id -> _Entry
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _build(self, creds):
+        import google_auth_httplib2
+        import httplib2
+        from googleapiclient.discovery import build, build_from_document
+
+        http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=GOOGLE_HTTP_TIMEOUT_S))
+        _instrument(http, f"google_{self.api}")
+        client_options = {"api_endpoint": GOOGLE_API_ENDPOINT} if GOOGLE_API_ENDPOINT else None
+        document = discovery_document(self.api, self.version)
+        if document is None:
+            return build(self.api, self.version, http=http, client_options=client_options)
+        return build_from_document(document, http=http, client_options=client_options)
+
+    def _close(self, entry):
+        try:
+            entry.service.close()
+        except Exception:
+            pass
+
+    def _evict_locked(self, now):
+        # Idle sweep at most every 30s; size bound on every checkout
+        if now - self._last_sweep > 30:
+            self._last_sweep = now
+            for user_id, entry in list(self._entries.items()):
+                if now - entry.last_used > self.idle_seconds and not entry.lock.locked():
+                    del self._entries[user_id]
+                    self._close(entry)
+                    self.evictions += 1
+        while len(self._entries) > self.max_size:
+            _, entry = self._entries.popitem(last=False)
+            self._close(entry)
+            self.evictions += 1
+
+    @contextmanager
+    def client(self, user_id, creds):
+        """Check out the user's service for the duration of the `with` block."""
+        now = time.monotonic()
+        entry = None
+        with self._lock:
+            self._evict_locked(now)
+            cached = self._entries.get(user_id)
+            if cached is not None and cached.token == creds.token and cached.lock.acquire(blocking=False):
+                self._entries.move_to_end(user_id)
+                cached.last_used = now
+                entry = cached
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is not None:
+            try:
+                yield entry.service
+            finally:
+                entry.lock.release()
+            return
+
+        service = self._build(creds)
+        fresh = _Entry(service, creds.token)
+        fresh.lock.acquire()
+        with self._lock:
+            cached = self._entries.get(user_id)
+            # Keep the new client unless another request is still using the cached one
+            if cached is None or not cached.lock.locked():
+                if cached is not None:
+                    self._close(cached)
+                self._entries[user_id] = fresh
+                self._entries.move_to_end(user_id)
+                pooled = True
+            else:
+                pooled = False
+        try:
+            yield service
+        finally:
+            fresh.lock.release()
+            if not pooled:
+                self._close(fresh)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+        if entry is not None and not entry.lock.locked():
+            self._close(entry)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_size,
+                "idle_seconds": self.idle_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+class CalendarAPIError(Exception):
+    """A Calendar API call made by AsyncCalendarClient returned an error status."""
+
+    def __init__(self, response):
+        try:
+            reason = response.json()["error"]["message"]
+        except Exception:
+            reason = response.reason_phrase
+        super().__init__(f'<HttpError {response.status_code} when requesting {response.url} returned "{reason}">')
+        self.status = response.status_code
+
+
+class AsyncCalendarClient:
+    """
+    The Calendar calls the ASGI routes make (insert, delete), sent directly
+    over one shared httpx.AsyncClient with the user's bearer token. No
+    discovery document and no client object per user.
+    """
+
+    def __init__(self, base_url=None):
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            base_url=base_url or GOOGLE_API_ENDPOINT or CALENDAR_API_BASE,
+            timeout=GOOGLE_HTTP_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=GOOGLE_ASYNC_POOL_SIZE, max_keepalive_connections=GOOGLE_ASYNC_POOL_SIZE)
+        )
+
+    async def _request(self, creds, method, path, **kwargs):
+        operation = method.lower()
+        for _ in range(GOOGLE_RATE_LIMIT_RETRIES + 1):
+            async with calendar_scheduler.aslot():
+                with outbound("google_calendar", operation):
+                    response = await self.client.request(
+                        method, path, headers={"Authorization": f"Bearer {creds.token}"}, **kwargs
+                    )
+            if not _rate_limited(response.status_code, response.content):
+                calendar_scheduler.succeeded()
+                break
+            OUTBOUND_ERRORS.inc("google_calendar", operation)
+            calendar_scheduler.throttled(retry_after_seconds(response.headers.get("Retry-After")))
+        if response.status_code >= 400:
+            OUTBOUND_ERRORS.inc("google_calendar", operation)
+            raise CalendarAPIError(response)
+        return response
+
+    async def insert_event(self, creds, body):
+        response = await self._request(creds, "POST", "calendars/primary/events", json=body)
+        return response.json()
+
+    async def delete_event(self, creds, event_id):
+        from urllib.parse import quote
+
+        await self._request(creds, "DELETE", f"calendars/primary/events/{quote(event_id, safe='')}")
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,35 @@
+"""
+Pre-fork serving: the model is loaded once in the master and shared by the
+workers copy-on-write.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+A model reload (MODEL_RELOAD_SIGNAL to a worker, or the admin endpoint)
+loads a private copy in that worker; restart gunicorn to share a new version
+again. Don't send the reload signal to the master: SIGHUP there restarts
+the workers from the model preloaded at start.
+"""
+import multiprocessing
+import os
+
+# Read by app.py at import: no threads in the master
+os.environ["PRELOAD_FOR_FORK"] = "1"
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count())))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = True
+
+
+def when_ready(server):
+    # Master, after the app is imported and before any worker is forked
+    import app
+
+    app.preload_for_fork()
+
+
+def post_worker_init(worker):
+    # Worker, after gunicorn has set up its signal handlers
+    import app
+
+    app.after_fork()
@@ -0,0 +1,154 @@
+import os
+
+import numpy as np
+
+from metrics import STAGE_SECONDS
+
+# Round features to this many decimals before scoring, so near-identical rows
+# share a memo entry (unset = exact values)
+PREDICTION_MEMO_DECIMALS = os.getenv("PREDICTION_MEMO_DECIMALS")
+
+# Feature order the scaler and model were trained on (names match gen.py)
+FEATURE_COLUMNS = [
+    "mood",
+    "stress",
+    "sleep",
+    "work_hours",
+    "had_meeting_today",
+    "meeting_count_last_7d",
+    "screen_time_last_7d",
+    "mean_mood_last_7d",
+    "mean_stress_last_7d",
+    "mean_sleep_last_7d",
+    "mean_work_hours_last_7d",
+]
+
+# Self-reported features every row must carry; the rest default to 0 like /checkin
+REQUIRED_FEATURES = ["mood", "stress", "sleep", "work_hours"]
+
+# Weights for burnout_level 0=Low, 1=Medium, 2=High
+CLASS_WEIGHTS = np.array([0.0, 0.5, 1.0])
+
+
+def build_feature_matrix(rows, columns=FEATURE_COLUMNS):
+    """
+    Turn a list of feature dicts into one (N, 11) float matrix.
+    Returns the matrix of valid rows, their original indexes and a dict of
+    per-row error messages for the rows that were rejected.
+    """
+    X = np.zeros((len(rows), len(columns)))
+    valid = np.ones(len(rows), dtype=bool)
+    errors = {}
+
+    for i, features in enumerate(rows):
+        try:
+            if not isinstance(features, dict):
+                raise ValueError("features must be an object")
+            missing = [col for col in REQUIRED_FEATURES if features.get(col) is None]
+            if missing:
+                raise ValueError(f"Missing features: {', '.join(missing)}")
+            X[i] = [float(features.get(col) or 0) for col in columns]
+            if not np.isfinite(X[i]).all():
+                raise ValueError("Features must be finite numbers")
+        except (TypeError, ValueError) as e:
+            valid[i] = False
+            errors[i] = str(e)
+
+    return X[valid], np.flatnonzero(valid), errors
+
+
+def _iteration_range(model):
+    # Same rule XGBClassifier.predict_proba uses: stop at best_iteration if early stopping ran
+    try:
+        return (0, model.best_iteration + 1)
+    except AttributeError:
+        return (0, 0)
+
+
+class InferenceEngine:
+    """
+    The pickled StandardScaler and XGBClassifier folded into plain arrays and
+    the raw booster, so a row is scored without building a DataFrame or going
+    through the sklearn wrapper.
+
+    `memo` is an optional cache of (version, feature tuple) -> class
+    probabilities shared by the engines a registry builds.
+    """
+
+    def __init__(self, scaler, model, version=None, memo=None):
+        self.version = version
+        self.memo = memo
+        names = getattr(scaler, "feature_names_in_", None)
+        self.feature_columns = list(names) if names is not None else list(FEATURE_COLUMNS)
+
+        n_features = len(self.feature_columns)
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(n_features)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(n_features)
+
+        self.booster = model.get_booster()
+        self.missing = model.missing
+        self.iteration_range = _iteration_range(model)
+
+    def row(self, features):
+        """Feature dict -> 1-D array in training column order."""
+        return np.array([float(features.get(col) or 0) for col in self.feature_columns])
+
+    def predict_proba(self, X):
+        """Class probabilities for a (N, 11) matrix or a single row."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 0:
+            return np.empty((0, len(CLASS_WEIGHTS)))
+
+        # Same arithmetic as StandardScaler.transform, then straight into the booster
+        with STAGE_SECONDS.time("scale"):
+            X_scaled = (X - self.mean) / self.scale
+        with STAGE_SECONDS.time("predict_proba"):
+            probs = self.booster.inplace_predict(
+                X_scaled,
+                iteration_range=self.iteration_range,
+                missing=self.missing
+            )
+        return np.asarray(probs).reshape(len(X), -1)
+
+    def score(self, X):
+        """Returns (class probabilities, weighted burnout probabilities)."""
+        probs = self.predict_proba(X)
+        return probs, probs @ CLASS_WEIGHTS
+
+    def score_memoized(self, X):
+        """
+        score() through the prediction memo: only rows this model version has
+        not scored before reach the scaler and booster, once per distinct row.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if PREDICTION_MEMO_DECIMALS:
+            # The rounded row is what gets scored, so a hit returns exactly what a miss would
+            X = np.round(X, int(PREDICTION_MEMO_DECIMALS))
+        if self.memo is None:
+            return self.score(X)
+
+        probs = np.empty((len(X), len(CLASS_WEIGHTS)))
+        pending = {}  # key -> rows waiting for it
+        for i, values in enumerate(X.tolist()):
+            key = (self.version, tuple(values))
+            found, row_probs = self.memo.get(key)
+            if found:
+                probs[i] = row_probs
+            else:
+                pending.setdefault(key, []).append(i)
+
+        if pending:
+            first_rows = [rows[0] for rows in pending.values()]
+            for (key, rows), row_probs in zip(pending.items(), self.predict_proba(X[first_rows])):
+                self.memo.set(key, row_probs.copy())
+                probs[rows] = row_probs
+        return probs, probs @ CLASS_WEIGHTS
+
+    def score_one(self, features):
+        """Single-row fast path: returns (class probabilities, burnout probability)."""
+        probs, burnout_probs = self.score_memoized(self.row(features))
+        return probs[0], float(burnout_probs[0])
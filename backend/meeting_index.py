@@ -0,0 +1,151 @@
+import bisect
+import datetime
+import itertools
+import os
+
+# Meetings at most this far apart (minutes) count as one back-to-back chain
+BACK_TO_BACK_GAP_MIN = float(os.getenv("BACK_TO_BACK_GAP_MIN", "10"))
+
+# Longer entries (all-day events, trips, out-of-office) are counted but aren't busy time
+MEETING_MAX_HOURS = float(os.getenv("MEETING_MAX_HOURS", "12"))
+
+# Local working hours searched for the longest meeting-free block, "start-end"
+MEETING_WORKDAY_HOURS = os.getenv("MEETING_WORKDAY_HOURS", "9-17")
+
+
+class _RangeMax:
+    """Sparse table: max over any slice in O(1) after an O(n log n) build."""
+
+    def __init__(self, values):
+        self._levels = [list(values)]
+        width = 1
+        while 2 * width <= len(values):
+            prev = self._levels[-1]
+            self._levels.append([max(prev[i], prev[i + width]) for i in range(len(prev) - width)])
+            width *= 2
+
+    def query(self, i, j):
+        """max(values[i:j]) for j > i."""
+        level = (j - i).bit_length() - 1
+        row = self._levels[level]
+        return max(row[i], row[j - (1 << level)])
+
+
+def _merge(intervals, gap):
+    """
+    Sorted (start, end) pairs -> disjoint blocks (starts, ends, member counts),
+    joining intervals that overlap or are at most `gap` seconds apart.
+    """
+    starts, ends, sizes = [], [], []
+    for start, end in intervals:
+        if ends and start - ends[-1] <= gap:
+            ends[-1] = max(ends[-1], end)
+            sizes[-1] += 1
+        else:
+            starts.append(start)
+            ends.append(end)
+            sizes.append(1)
+    return starts, ends, sizes
+
+
+def _overlapping(starts, ends, lo, hi):
+    """Index range [i, j) of the disjoint sorted blocks that overlap [lo, hi)."""
+    return bisect.bisect_right(ends, lo), bisect.bisect_left(starts, hi)
+
+
+class MeetingIndex:
+    """
+    One user's calendar events as sorted interval arrays, built once in
+    O(n log n). Every windowed query below is a couple of binary searches
+    plus O(1) prefix-sum or sparse-table lookups. Times are epoch seconds.
+    """
+
+    def __init__(self, intervals, chain_gap_s=BACK_TO_BACK_GAP_MIN * 60, max_meeting_s=MEETING_MAX_HOURS * 3600):
+        intervals = sorted((start, end) for start, end in intervals if end >= start)
+        self.starts = [start for start, _ in intervals]
+        meetings = [(start, end) for start, end in intervals if 0 < end - start <= max_meeting_s]
+
+        # Busy time: the union of meetings as disjoint blocks, with prefix sums
+        # of their lengths and a sparse table over the gaps between them
+        self.block_starts, self.block_ends, _ = _merge(meetings, 0)
+        self._busy_prefix = [0.0, *itertools.accumulate(
+            end - start for start, end in zip(self.block_starts, self.block_ends)
+        )]
+        self._gaps = _RangeMax([
+            self.block_starts[k + 1] - self.block_ends[k] for k in range(len(self.block_starts) - 1)
+        ])
+
+        # Back-to-back chains: meetings linked by short gaps; a chain needs two or more
+        self.chain_starts, self.chain_ends, self.chain_sizes = _merge(meetings, chain_gap_s)
+        self._chain_prefix = [0, *itertools.accumulate(int(size > 1) for size in self.chain_sizes)]
+        self._chain_max = _RangeMax(self.chain_sizes)
+
+    @classmethod
+    def from_events(cls, intervals):
+        """From (start_ts, end_ts) datetime pairs as returned by Storage.event_intervals."""
+        return cls((start.timestamp(), end.timestamp()) for start, end in intervals if start and end)
+
+    def count_starting(self, lo, hi):
+        """Events starting in [lo, hi)."""
+        return bisect.bisect_left(self.starts, hi) - bisect.bisect_left(self.starts, lo)
+
+    def busy_seconds(self, lo, hi):
+        """Time in [lo, hi) covered by at least one meeting (overlaps counted once)."""
+        i, j = _overlapping(self.block_starts, self.block_ends, lo, hi)
+        if i >= j:
+            return 0.0
+        total = self._busy_prefix[j] - self._busy_prefix[i]
+        return total - max(0.0, lo - self.block_starts[i]) - max(0.0, self.block_ends[j - 1] - hi)
+
+    def longest_free_seconds(self, lo, hi):
+        """Longest stretch of [lo, hi) without a meeting."""
+        i, j = _overlapping(self.block_starts, self.block_ends, lo, hi)
+        if i >= j:
+            return hi - lo
+        longest = max(self.block_starts[i] - lo, hi - self.block_ends[j - 1], 0.0)
+        if j - i > 1:
+            longest = max(longest, self._gaps.query(i, j - 1))
+        return longest
+
+    def chains(self, lo, hi):
+        """(back-to-back chains, meetings in the longest chain) touching [lo, hi)."""
+        i, j = _overlapping(self.chain_starts, self.chain_ends, lo, hi)
+        if i >= j:
+            return 0, 0
+        longest = self._chain_max.query(i, j)
+        return self._chain_prefix[j] - self._chain_prefix[i], longest if longest > 1 else 0
+
+
+def index_window(today=None):
+    """Aware (start, end) of the events an index needs: 8 local days back to the end of today."""
+    today = today or datetime.date.today()
+    start = datetime.datetime.combine(today - datetime.timedelta(days=8), datetime.time()).astimezone()
+    end = datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time()).astimezone()
+    return start.astimezone(datetime.timezone.utc), end.astimezone(datetime.timezone.utc)
+
+
+def meeting_features(index, now=None):
+    """
+    Meeting-load features at `now`: the last 7 days up to now, and today
+    (server local time) for had_meeting_today and the longest free block.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    local_now = now.astimezone()
+    day_start = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    first_hour, last_hour = (float(hour) for hour in MEETING_WORKDAY_HOURS.split("-"))
+
+    week = ((now - datetime.timedelta(days=7)).timestamp(), now.timestamp())
+    day = (day_start.timestamp(), (day_start + datetime.timedelta(days=1)).timestamp())
+    workday = (day[0] + first_hour * 3600, day[0] + last_hour * 3600)
+
+    chains, longest_chain = index.chains(*week)
+    meeting_hours_today = index.busy_seconds(*day) / 3600
+    return {
+        "meeting_count_last_7d": index.count_starting(*week),
+        "had_meeting_today": 1 if meeting_hours_today > 0 else 0,
+        "meeting_hours_today": meeting_hours_today,
+        "meeting_hours_last_7d": index.busy_seconds(*week) / 3600,
+        "back_to_back_chains_last_7d": chains,
+        "longest_chain_last_7d": longest_chain,
+        "longest_free_block_today_h": index.longest_free_seconds(*workday) / 3600,
+    }
@@ -0,0 +1,181 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+
+from cache import TTLCache
+
+# Directory holding manifest.json and the model/scaler files it lists
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", "artifacts")
+
+# Check manifest.json this often and reload when "current" changes (0 = only on signal/admin call)
+MODEL_MANIFEST_POLL_S = float(os.getenv("MODEL_MANIFEST_POLL_S", "0"))
+
+# Feature rows whose predictions are remembered (0 disables the memo)
+PREDICTION_MEMO_SIZE = int(os.getenv("PREDICTION_MEMO_SIZE", "8192"))
+
+MANIFEST_FILE = "manifest.json"
+
+# (model version, feature tuple) -> class probabilities, shared by every engine
+# built here. Most inputs are small integers, so many users send identical
+# rows; those skip scaling and the booster.
+prediction_memo = TTLCache("prediction", None, max(PREDICTION_MEMO_SIZE, 1))
+
+
+class ModelError(Exception):
+    """The manifest or a model version can't be loaded."""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts described by artifacts/manifest.json:
+
+        {"current": "v2", "versions": {"v2": {"model": "v2/model.pkl",
+         "scaler": "v2/scaler.pkl", "feature_order": [...], "sha256": {...}}}}
+
+    current() returns the active InferenceEngine. reload() builds the new
+    engine completely before swapping it in, so requests in flight finish on
+    the engine they started with and none are dropped. A failed reload keeps
+    the old engine.
+    """
+
+    def __init__(self, artifacts_dir=ARTIFACTS_DIR):
+        self.artifacts_dir = artifacts_dir
+        self._engine = None
+        self._reload_lock = threading.Lock()
+        self._manifest_mtime = None
+        self._poller = None
+        self.loaded_at = None
+        self.previous_version = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.artifacts_dir, MANIFEST_FILE)
+
+    def manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise ModelError(f"Can't read {self.manifest_path}: {e}")
+
+    def _artifact(self, entry, kind):
+        path = os.path.join(self.artifacts_dir, entry[kind])
+        expected = (entry.get("sha256") or {}).get(kind)
+        if expected and _sha256(path) != expected:
+            raise ModelError(f"{path} does not match its sha256 in the manifest")
+        return path
+
+    def build(self, version=None):
+        """Load a version (default: the manifest's current one) into a new InferenceEngine."""
+        import joblib
+        from inference import InferenceEngine
+
+        manifest = self.manifest()
+        version = version or manifest.get("current")
+        entry = (manifest.get("versions") or {}).get(version)
+        if entry is None:
+            raise ModelError(f"Unknown model version: {version}")
+
+        # Workers share these only when loaded before fork (gunicorn.conf.py)
+        scaler = joblib.load(self._artifact(entry, "scaler"))
+        model = joblib.load(self._artifact(entry, "model"))
+        memo = prediction_memo if PREDICTION_MEMO_SIZE > 0 else None
+        engine = InferenceEngine(scaler, model, version=version, memo=memo)
+
+        feature_order = entry.get("feature_order")
+        if feature_order and list(feature_order) != engine.feature_columns:
+            raise ModelError(f"Feature order of {version} does not match its scaler")
+        return engine
+
+    def current(self):
+        """The active engine (loads the current version on first use)."""
+        engine = self._engine
+        if engine is None:
+            with self._reload_lock:
+                engine = self._engine or self._load_locked(None)
+        return engine
+
+    @property
+    def version(self):
+        engine = self._engine
+        return engine.version if engine is not None else None
+
+    def _load_locked(self, version):
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+            engine = self.build(version)
+        except Exception as e:
+            self.reload_errors += 1
+            self.last_error = str(e)
+            raise
+        if self._engine is not None:
+            self.previous_version = self._engine.version
+            self.reloads += 1
+        self._engine = engine  # single reference swap
+        if self.previous_version == engine.version:
+            # Same version name, possibly new artifacts: its memoized predictions are stale
+            prediction_memo.clear()
+        self._manifest_mtime = mtime
+        self.loaded_at = datetime.datetime.now()
+        self.last_error = None
+        print(f"✅ Model {engine.version} loaded")
+        return engine
+
+    def reload(self, version=None):
+        """Swap in `version` (default: the manifest's current one); returns the new engine."""
+        with self._reload_lock:
+            return self._load_locked(version)
+
+    def reload_in_background(self, version=None):
+        def run():
+            try:
+                self.reload(version)
+            except Exception as e:
+                print(f"⚠️ Model reload failed, keeping {self.version}: {e}")
+
+        thread = threading.Thread(target=run, name="model-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def _poll(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                if os.path.getmtime(self.manifest_path) == self._manifest_mtime:
+                    continue
+                if self.manifest().get("current") != self.version:
+                    self.reload()
+                else:
+                    self._manifest_mtime = os.path.getmtime(self.manifest_path)
+            except Exception as e:
+                print(f"⚠️ Model manifest check failed: {e}")
+
+    def start_polling(self, interval=MODEL_MANIFEST_POLL_S):
+        """Reload whenever the manifest's current version changes (every worker picks it up)."""
+        if interval > 0 and self._poller is None:
+            self._poller = threading.Thread(target=self._poll, args=(interval,), name="model-poll", daemon=True)
+            self._poller.start()
+
+    def status(self):
+        return {
+            "version": self.version,
+            "previous_version": self.previous_version,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error
+        }
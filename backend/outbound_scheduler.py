@@ -0,0 +1,325 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import email.utils
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from metrics import CallbackMetric, Counter, Histogram
+
+# Longest an interactive / background call waits for admission before giving up (seconds)
+OUTBOUND_MAX_QUEUE_S = float(os.getenv("OUTBOUND_MAX_QUEUE_S", "10"))
+OUTBOUND_BACKGROUND_MAX_QUEUE_S = float(os.getenv("OUTBOUND_BACKGROUND_MAX_QUEUE_S", "60"))
+
+# Pause after a 429 without Retry-After; doubles per consecutive 429, capped (also caps Retry-After)
+OUTBOUND_BACKOFF_S = float(os.getenv("OUTBOUND_BACKOFF_S", "1"))
+OUTBOUND_BACKOFF_MAX_S = float(os.getenv("OUTBOUND_BACKOFF_MAX_S", "60"))
+
+# Admission priorities; lower is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+MAX_QUEUE_S = {INTERACTIVE: OUTBOUND_MAX_QUEUE_S, BACKGROUND: OUTBOUND_BACKGROUND_MAX_QUEUE_S}
+
+_priority = contextvars.ContextVar("outbound_priority", default=INTERACTIVE)
+
+QUEUE_SECONDS = Histogram(
+    "boz_outbound_queue_seconds",
+    "Time outbound calls waited for a concurrency slot and a rate-limit token.",
+    ["service", "priority"]
+)
+THROTTLED = Counter(
+    "boz_outbound_throttled_total",
+    "Rate-limit responses that paused a provider.",
+    ["service"]
+)
+COALESCED = Counter(
+    "boz_outbound_coalesced_total",
+    "Calls answered by an identical call already in flight.",
+    ["service"]
+)
+QUEUE_TIMEOUTS = Counter(
+    "boz_outbound_queue_timeouts_total",
+    "Calls that gave up waiting for admission.",
+    ["service", "priority"]
+)
+
+_schedulers = []
+
+
+class QueueTimeout(Exception):
+    """No admission in time: the provider is saturated or backing off after a 429."""
+
+
+@contextmanager
+def priority(level):
+    """Outbound calls made inside the block (this thread or task) queue at `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def retry_after_seconds(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Waiter:
+    __slots__ = ("priority", "wake", "granted", "cancelled")
+
+    def __init__(self, priority, wake):
+        self.priority = priority
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class OutboundScheduler:
+    """
+    Admission control for one external provider, shared by every thread and
+    event loop in the process:
+
+    - at most `concurrency` calls in flight,
+    - a token bucket of `rate` calls/s with bursts up to `burst` (rate 0 = no limit),
+    - waiting calls are admitted by priority (INTERACTIVE first), FIFO within one,
+    - throttled() stops admissions for Retry-After or an exponential backoff,
+    - coalesce() runs identical concurrent calls once and shares the result.
+
+    A daemon thread hands out admissions, so waiting threads and coroutines
+    sleep instead of polling.
+    """
+
+    def __init__(self, service, concurrency, rate, burst=None):
+        self.service = service
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._throttle_streak = 0
+        self._queue = []  # heap of (priority, seq, waiter)
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._dispatcher = None
+        self._calls = {}  # coalescing key -> concurrent.futures.Future
+        self._async_calls = {}  # (event loop, coalescing key) -> asyncio.Future
+        self._calls_lock = threading.Lock()
+        _schedulers.append(self)
+
+    # --- admission ---
+
+    def _enqueue(self, waiter):
+        with self._cond:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch, name=f"outbound-{self.service}", daemon=True
+                )
+                self._dispatcher.start()
+            heapq.heappush(self._queue, (waiter.priority, next(self._seq), waiter))
+            self._cond.notify()
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                while self._queue and self._queue[0][2].cancelled:
+                    heapq.heappop(self._queue)
+                if not self._queue or self._in_flight >= self.concurrency:
+                    self._cond.wait()
+                    continue
+
+                now = time.monotonic()
+                if now < self._paused_until:
+                    self._cond.wait(self._paused_until - now)
+                    continue
+                if self.rate > 0:
+                    self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+                    self._refilled_at = now
+                    if self._tokens < 1:
+                        self._cond.wait((1 - self._tokens) / self.rate)
+                        continue
+                    self._tokens -= 1
+
+                _, _, waiter = heapq.heappop(self._queue)
+                try:
+                    waiter.wake()
+                except RuntimeError:
+                    # The waiter's event loop is gone; hand the slot to the next one
+                    continue
+                self._in_flight += 1
+                waiter.granted = True
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def _give_up(self, waiter):
+        """Withdraw a waiter that timed out; False if it was admitted in the meantime."""
+        with self._cond:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            return True
+
+    def _timed_out(self, level, started):
+        QUEUE_SECONDS.observe(time.perf_counter() - started, self.service, PRIORITY_NAMES[level])
+        QUEUE_TIMEOUTS.inc(self.service, PRIORITY_NAMES[level])
+        return QueueTimeout(f"{self.service}: not admitted within {MAX_QUEUE_S[level]:g}s")
+
+    @contextmanager
+    def slot(self):
+        """Wait for admission at the current priority and hold it for the `with` block."""
+        level = _priority.get()
+        event = threading.Event()
+        waiter = _Waiter(level, event.set)
+        started = time.perf_counter()
+        self._enqueue(waiter)
+        if not event.wait(MAX_QUEUE_S[level]) and self._give_up(waiter):
+            raise self._timed_out(level, started)
+        QUEUE_SECONDS.observe(time.perf_counter() - started, self.service, PRIORITY_NAMES[level])
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """slot() for coroutines: waiting doesn't block the event loop."""
+        level = _priority.get()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = _Waiter(level, lambda: loop.call_soon_threadsafe(_resolve, future))
+        started = time.perf_counter()
+        self._enqueue(waiter)
+        try:
+            await asyncio.wait_for(future, MAX_QUEUE_S[level])
+        except asyncio.TimeoutError:
+            if self._give_up(waiter):
+                raise self._timed_out(level, started)
+        except asyncio.CancelledError:
+            if not self._give_up(waiter):
+                self._release()
+            raise
+        QUEUE_SECONDS.observe(time.perf_counter() - started, self.service, PRIORITY_NAMES[level])
+        try:
+            yield
+        finally:
+            self._release()
+
+    # --- provider feedback ---
+
+    def throttled(self, retry_after=None):
+        """The provider answered 429 (or its rate-limit equivalent): pause admissions."""
+        THROTTLED.inc(self.service)
+        with self._cond:
+            self._throttle_streak += 1
+            backoff = OUTBOUND_BACKOFF_S * 2 ** (self._throttle_streak - 1)
+            delay = min(OUTBOUND_BACKOFF_MAX_S, retry_after if retry_after is not None else backoff)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            # No burst right after the pause: tokens refill from when it ends
+            self._tokens = 0.0
+            self._refilled_at = self._paused_until
+            self._cond.notify()
+
+    def succeeded(self):
+        """A call got through; the next 429 starts the backoff from scratch."""
+        if self._throttle_streak:
+            with self._cond:
+                self._throttle_streak = 0
+
+    # --- coalescing ---
+
+    def coalesce(self, key, fn):
+        """fn() once for every concurrent caller with the same `key`; all get its result or exception."""
+        with self._calls_lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = concurrent.futures.Future()
+        if not leader:
+            COALESCED.inc(self.service)
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._calls_lock:
+                del self._calls[key]
+
+    async def coalesce_async(self, key, coroutine_fn):
+        """coalesce() for coroutines, per event loop."""
+        loop = asyncio.get_running_loop()
+        with self._calls_lock:
+            future = self._async_calls.get((loop, key))
+            leader = future is None
+            if leader:
+                future = self._async_calls[(loop, key)] = loop.create_future()
+        if not leader:
+            COALESCED.inc(self.service)
+            return await asyncio.shield(future)
+
+        try:
+            result = await coroutine_fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # followers re-raise it; don't warn when there are none
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._calls_lock:
+                del self._async_calls[(loop, key)]
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": sum(1 for _, _, waiter in self._queue if not waiter.cancelled),
+                "in_flight": self._in_flight,
+                "concurrency": self.concurrency,
+                "rate_per_s": self.rate,
+                "paused_s": max(0.0, self._paused_until - time.monotonic()),
+            }
+
+
+def _gauge(field):
+    return {(scheduler.service,): scheduler.stats()[field] for scheduler in _schedulers}
+
+
+CallbackMetric("boz_outbound_queue_depth", "Outbound calls waiting for admission.", "gauge", ["service"],
+               lambda: _gauge("queued"))
+CallbackMetric("boz_outbound_in_flight", "Outbound calls admitted and not finished.", "gauge", ["service"],
+               lambda: _gauge("in_flight"))
+CallbackMetric("boz_outbound_paused_seconds", "Remaining rate-limit pause per provider.", "gauge", ["service"],
+               lambda: _gauge("paused_s"))
@@ -0,0 +1,47 @@
+"""
+Rebuild the rolling 7-check-in aggregates (users/{id}.rolling_checkins)
+and the daily/weekly trend rollups from check-in history, on the configured
+STORAGE_BACKEND. Run it after rescore.py so trends pick up the new scores.
+--teams also recomputes every team's daily aggregates from its current
+members' histories (after rescoring or membership changes).
+
+    python repair_rollups.py              # every user
+    python repair_rollups.py --user UID   # one user
+    python repair_rollups.py --teams      # every user, then every team
+"""
+import argparse
+
+from rollups import rebuild_rolling, rebuild_team_aggregates, rebuild_trends
+from storage import open_storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild rolling check-in aggregates and trend rollups")
+    parser.add_argument("--user", help="only repair this user_id")
+    parser.add_argument("--teams", action="store_true", help="also rebuild team aggregates")
+    args = parser.parse_args()
+    if args.teams and args.user:
+        parser.error("--teams rebuilds from every user; it can't be combined with --user")
+
+    store = open_storage()
+
+    user_ids = [args.user] if args.user else store.iter_user_ids()
+
+    repaired = 0
+    for user_id in user_ids:
+        try:
+            rolling = rebuild_rolling(store, user_id)
+            buckets = rebuild_trends(store, user_id)
+            repaired += 1
+            print(f"✅ {user_id}: {rolling['count']} check-ins in window, {buckets} trend buckets")
+        except Exception as e:
+            print(f"❌ {user_id}: {e}")
+
+    print(f"Repaired {repaired} users")
+
+    if args.teams:
+        print(f"Rebuilt aggregates for {rebuild_team_aggregates(store)} teams")
+
+
+if __name__ == "__main__":
+    main()
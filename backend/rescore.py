@@ -0,0 +1,181 @@
+"""
+Recompute burnout_probability (and model_version) for every stored check-in
+with the manifest's current model, e.g. after deploying a new version.
+
+Users are streamed in pages. For each page, check-in histories are fetched
+concurrently and turned into feature rows on a process pool. The rows are
+scored in one vectorized call and written back in batches. Features are
+rebuilt the way /predict builds them: the check-in's own values plus the
+rolling means of the check-ins before it.
+
+Progress is checkpointed after every page; --resume continues after the
+last finished user. Trend rollups and team aggregates aren't touched: run
+repair_rollups.py --teams afterwards to rebuild them from the new scores.
+
+    python rescore.py                        # every user
+    python rescore.py --resume               # continue an interrupted run
+    python rescore.py --user UID --dry-run   # score one user, write nothing
+"""
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import time
+
+from model_registry import ARTIFACTS_DIR, ModelRegistry
+from rollups import push_entry, rolling_means
+from storage import open_storage
+
+CHECKPOINT_PATH = "rescore_checkpoint.json"
+
+
+def assemble_user(history):
+    """
+    (user_id, [(checkin_id, data)] newest first) -> (checkin ids, feature rows),
+    oldest first. Runs in the worker processes.
+    """
+    _, checkins = history
+    ids, rows = [], []
+    rolling = None
+    for checkin_id, checkin in reversed(checkins):
+        row = {
+            "mood": checkin.get("mood"),
+            "stress": checkin.get("stress"),
+            "sleep": checkin.get("sleep"),
+            # /predict saves "work_hours", /checkin saves "work_hours_today"
+            "work_hours": checkin.get("work_hours", checkin.get("work_hours_today")),
+            "had_meeting_today": checkin.get("had_meeting_today", 0),
+            "meeting_count_last_7d": checkin.get("meeting_count_last_7d", 0),
+            "screen_time_last_7d": checkin.get("screen_time_last_7d", 0),
+        }
+        means = rolling_means(rolling)
+        if means:
+            row.update(means)
+        else:
+            # No earlier check-ins: same fallback as /predict
+            row["mean_mood_last_7d"] = row["mood"]
+            row["mean_stress_last_7d"] = row["stress"]
+            row["mean_sleep_last_7d"] = row["sleep"]
+            row["mean_work_hours_last_7d"] = row["work_hours"]
+        ids.append(checkin_id)
+        rows.append(row)
+        rolling = push_entry(rolling, checkin)
+    return ids, rows
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    # Write-then-rename so an interrupted save never leaves a torn file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def pages(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        page = list(itertools.islice(iterator, size))
+        if not page:
+            return
+        yield page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", help="only rescore this user_id")
+    parser.add_argument("--page-size", type=int, default=200, help="users per page")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="feature assembly processes")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="concurrent history reads")
+    parser.add_argument("--write-batch", type=int, default=500, help="check-ins per write batch")
+    parser.add_argument("--artifacts", default=ARTIFACTS_DIR, help="directory with manifest.json")
+    parser.add_argument("--version", help="model version to score with (default: the manifest's current)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--resume", action="store_true", help="continue after the checkpointed user")
+    parser.add_argument("--dry-run", action="store_true", help="score but don't write results or checkpoints")
+    args = parser.parse_args()
+
+    checkpoint = load_checkpoint(args.checkpoint) if args.resume else {}
+    if checkpoint.get("done"):
+        print(f"Checkpoint {args.checkpoint} is already complete; nothing to do")
+        return
+    totals = checkpoint.get("totals") or {"users": 0, "rows": 0, "skipped": 0}
+    phases = {"fetch": 0.0, "assemble": 0.0, "score": 0.0, "write": 0.0}
+
+    store = open_storage()
+    engine = ModelRegistry(args.artifacts).build(args.version)
+    print(f"Scoring with model {engine.version}")
+    from inference import build_feature_matrix
+
+    if args.user:
+        user_ids = [args.user]
+    else:
+        user_ids = store.iter_user_ids(after=checkpoint.get("last_user_id"))
+        if checkpoint.get("last_user_id"):
+            print(f"Resuming after {checkpoint['last_user_id']} ({totals['rows']} rows already rescored)")
+
+    started = time.perf_counter()
+    run_rows = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as processes, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=args.fetch_workers) as threads:
+        for page in pages(user_ids, args.page_size):
+            t = time.perf_counter()
+            histories = list(threads.map(lambda uid: (uid, list(store.list_checkins(uid))), page))
+            phases["fetch"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            chunksize = max(1, len(histories) // (4 * (args.workers or 1)))
+            ids, rows = [], []
+            for user_ids_part, user_rows in processes.map(assemble_user, histories, chunksize=chunksize):
+                ids.extend(user_ids_part)
+                rows.extend(user_rows)
+            phases["assemble"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            X, index, errors = build_feature_matrix(rows, engine.feature_columns)
+            _, burnout_probs = engine.score_memoized(X)
+            phases["score"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            updates = [
+                (ids[i], {"burnout_probability": float(p), "model_version": engine.version})
+                for i, p in zip(index.tolist(), burnout_probs.tolist())
+            ]
+            if not args.dry_run:
+                for batch in pages(updates, args.write_batch):
+                    store.update_checkins(dict(batch))
+            phases["write"] += time.perf_counter() - t
+
+            for i, message in itertools.islice(errors.items(), 3):
+                print(f"⚠️ Skipped check-in {ids[i]}: {message}")
+
+            totals["users"] += len(page)
+            totals["rows"] += len(updates)
+            totals["skipped"] += len(errors)
+            run_rows += len(updates)
+            elapsed = time.perf_counter() - started
+            print(f"{totals['users']} users, {totals['rows']} rows, {totals['skipped']} skipped "
+                  f"({run_rows / elapsed:.0f} rows/s)", flush=True)
+
+            if not args.dry_run and not args.user:
+                save_checkpoint(args.checkpoint, {"last_user_id": page[-1], "totals": totals, "done": False})
+
+    elapsed = time.perf_counter() - started
+    if not args.dry_run and not args.user:
+        save_checkpoint(args.checkpoint, {"last_user_id": None, "totals": totals, "done": True})
+
+    print(f"\nRescored {run_rows} rows in {elapsed:.1f}s ({run_rows / elapsed if elapsed else 0:.0f} rows/s)")
+    for phase, seconds in phases.items():
+        rate = f"{run_rows / seconds:.0f} rows/s" if seconds else "-"
+        print(f"  {phase:<9} {seconds:8.2f}s  {rate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import datetime
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import TTLCache
+from metrics import OUTBOUND_ERRORS, outbound
+from outbound_scheduler import OutboundScheduler, retry_after_seconds
+
+RESCUETIME_API_URL = os.getenv("RESCUETIME_API_URL", "https://www.rescuetime.com/anapi/data")
+
+# Timeouts (seconds) for connecting and for reading a response
+RESCUETIME_CONNECT_TIMEOUT_S = float(os.getenv("RESCUETIME_CONNECT_TIMEOUT_S", "3"))
+RESCUETIME_TIMEOUT_S = float(os.getenv("RESCUETIME_TIMEOUT_S", "5"))
+
+# Retries on connection errors and 5xx, with exponential backoff (429s pause the scheduler instead)
+RESCUETIME_RETRIES = int(os.getenv("RESCUETIME_RETRIES", "3"))
+RESCUETIME_BACKOFF_S = float(os.getenv("RESCUETIME_BACKOFF_S", "0.5"))
+
+# Kept-alive connections to RescueTime
+RESCUETIME_POOL_SIZE = int(os.getenv("RESCUETIME_POOL_SIZE", "20"))
+
+# RescueTime admission: calls in flight, sustained calls/s and burst
+RESCUETIME_CONCURRENCY = int(os.getenv("RESCUETIME_CONCURRENCY", "8"))
+RESCUETIME_RATE_PER_S = float(os.getenv("RESCUETIME_RATE_PER_S", "5"))
+RESCUETIME_BURST = float(os.getenv("RESCUETIME_BURST", "10"))
+
+# Shared by the sync and async clients
+rescuetime_scheduler = OutboundScheduler(
+    "rescuetime", RESCUETIME_CONCURRENCY, RESCUETIME_RATE_PER_S, RESCUETIME_BURST
+)
+
+# Per-day totals for completed days; they don't change, so they live long
+RESCUETIME_DAY_TTL_S = float(os.getenv("RESCUETIME_DAY_TTL_S", str(8 * 24 * 3600)))
+RESCUETIME_DAY_CACHE_MAX_ENTRIES = int(os.getenv("RESCUETIME_DAY_CACHE_MAX_ENTRIES", "100000"))
+
+
+class RescueTimeClient:
+    """
+    RescueTime Analytic Data API over one pooled requests.Session, with
+    bounded retries, timeouts and a cache of per-day totals for each user.
+    Retries back off with the scheduler slot released, like the async client.
+    """
+
+    def __init__(self, url=RESCUETIME_API_URL):
+        self.url = url
+        self.session = requests.Session()
+        # No urllib3 retries: they would sleep while holding a scheduler slot
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=RESCUETIME_POOL_SIZE, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeout = (RESCUETIME_CONNECT_TIMEOUT_S, RESCUETIME_TIMEOUT_S)
+        self.day_cache = TTLCache("rescuetime_days", RESCUETIME_DAY_TTL_S, RESCUETIME_DAY_CACHE_MAX_ENTRIES)
+
+    def get(self, params):
+        """
+        Raw GET against the data API through the scheduler; returns the Response.
+        Identical requests already in flight share one call.
+        """
+        return rescuetime_scheduler.coalesce(tuple(sorted(params.items())), lambda: self._get(params))
+
+    def _get(self, params):
+        for attempt in range(RESCUETIME_RETRIES + 1):
+            last = attempt == RESCUETIME_RETRIES
+            try:
+                with rescuetime_scheduler.slot():
+                    with outbound("rescuetime", "data"):
+                        response = self.session.get(self.url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+            else:
+                if response.status_code < 400:
+                    rescuetime_scheduler.succeeded()
+                    return response
+                OUTBOUND_ERRORS.inc("rescuetime", "data")
+                if response.status_code == 429:
+                    rescuetime_scheduler.throttled(retry_after_seconds(response.headers.get("Retry-After")))
+                    if last:
+                        return response
+                    continue
+                if last or response.status_code not in (500, 502, 503, 504):
+                    return response
+            # Slot released: other callers go ahead while this one waits
+            time.sleep(RESCUETIME_BACKOFF_S * (2 ** attempt))
+
+    def daily_seconds(self, api_key, start_date, end_date):
+        """Productive seconds per day, {date: seconds}, for start_date..end_date inclusive."""
+        response = self.get(daily_params(api_key, start_date, end_date))
+        response.raise_for_status()
+        return daily_totals(response.json())
+
+    def screen_time_hours(self, user_id, api_key, days=7):
+        """
+        Productive hours from `days` days ago through today.
+        Completed days come from the cache; only the oldest missing day through
+        today is requested (usually just today).
+        """
+        plan = ScreenTimePlan(self.day_cache, user_id, api_key, days)
+        return plan.hours(self.daily_seconds(api_key, plan.fetch_from, plan.today))
+
+
+def daily_params(api_key, start_date, end_date):
+    return {
+        "key": api_key,
+        "format": "json",
+        "perspective": "interval",
+        "resolution_time": "day",
+        "restrict_kind": "productivity",
+        "restrict_begin": start_date.isoformat(),
+        "restrict_end": end_date.isoformat()
+    }
+
+
+def daily_totals(payload):
+    totals = {}
+    for row in payload["rows"]:
+        # Interval rows: [date, seconds, people, productivity level]
+        day = datetime.date.fromisoformat(row[0][:10])
+        totals[day] = totals.get(day, 0) + row[1]
+    return totals
+
+
+class ScreenTimePlan:
+    """Which days of a screen_time_hours window are cached and which must be fetched."""
+
+    def __init__(self, day_cache, user_id, api_key, days):
+        self.day_cache = day_cache
+        self.user_id = user_id
+        self.api_key = api_key
+        self.today = datetime.date.today()
+        self.dates = [self.today - datetime.timedelta(days=i) for i in range(days, -1, -1)]
+
+        self.totals, missing = {}, []
+        for day in self.dates[:-1]:
+            found, seconds = day_cache.get((user_id, api_key, day))
+            if found:
+                self.totals[day] = seconds
+            else:
+                missing.append(day)
+        self.fetch_from = missing[0] if missing else self.today
+
+    def hours(self, fetched):
+        """Total hours once `fetched` ({date: seconds} from fetch_from) is in; caches completed days."""
+        for day in self.dates:
+            if day >= self.fetch_from:
+                self.totals[day] = fetched.get(day, 0)
+                if day < self.today:
+                    self.day_cache.set((self.user_id, self.api_key, day), self.totals[day])
+        return sum(self.totals.values()) / 3600
+
+
+class AsyncRescueTimeClient:
+    """
+    The same API over an httpx.AsyncClient (ASGI mode), sharing the sync
+    client's day cache and scheduler. Retries connection errors and 5xx with
+    backoff; a 429 pauses the scheduler and the call queues again.
+    """
+
+    def __init__(self, day_cache, url=RESCUETIME_API_URL):
+        import httpx
+
+        self.url = url
+        self.day_cache = day_cache
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(RESCUETIME_TIMEOUT_S, connect=RESCUETIME_CONNECT_TIMEOUT_S),
+            limits=httpx.Limits(max_connections=RESCUETIME_POOL_SIZE, max_keepalive_connections=RESCUETIME_POOL_SIZE)
+        )
+
+    async def get(self, params):
+        return await rescuetime_scheduler.coalesce_async(tuple(sorted(params.items())), lambda: self._get(params))
+
+    async def _get(self, params):
+        import asyncio
+        import httpx
+
+        for attempt in range(RESCUETIME_RETRIES + 1):
+            last = attempt == RESCUETIME_RETRIES
+            try:
+                async with rescuetime_scheduler.aslot():
+                    with outbound("rescuetime", "data"):
+                        response = await self.client.get(self.url, params=params)
+            except httpx.TransportError:
+                if last:
+                    raise
+            else:
+                if response.status_code < 400:
+                    rescuetime_scheduler.succeeded()
+                    return response
+                OUTBOUND_ERRORS.inc("rescuetime", "data")
+                if response.status_code == 429:
+                    rescuetime_scheduler.throttled(retry_after_seconds(response.headers.get("Retry-After")))
+                    if last:
+                        return response
+                    continue
+                if last or response.status_code not in (500, 502, 503, 504):
+                    return response
+            await asyncio.sleep(RESCUETIME_BACKOFF_S * (2 ** attempt))
+
+    async def daily_seconds(self, api_key, start_date, end_date):
+        response = await self.get(daily_params(api_key, start_date, end_date))
+        response.raise_for_status()
+        return daily_totals(response.json())
+
+    async def screen_time_hours(self, user_id, api_key, days=7):
+        plan = ScreenTimePlan(self.day_cache, user_id, api_key, days)
+        return plan.hours(await self.daily_seconds(api_key, plan.fetch_from, plan.today))
+
+    async def aclose(self):
+        await self.client.aclose()
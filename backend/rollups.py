@@ -0,0 +1,267 @@
+import datetime
+import os
+
+# Rolling window used for the *_last_7d features: the user's last 7 check-ins
+ROLLING_WINDOW = 7
+
+# check-in field -> model feature it feeds
+ROLLING_FIELDS = {
+    "mood": "mean_mood_last_7d",
+    "stress": "mean_stress_last_7d",
+    "sleep": "mean_sleep_last_7d",
+    "work_hours_today": "mean_work_hours_last_7d",
+}
+
+# Team aggregates count burnout_probability at or above this as high risk
+HIGH_RISK_THRESHOLD = float(os.getenv("HIGH_RISK_THRESHOLD", "0.6"))
+
+# Equal-width burnout_probability histogram bins over [0, 1] in team aggregates
+HISTOGRAM_BINS = 10
+
+# Bucket sizes kept for /trends; weeks start on Monday
+TREND_GRANULARITIES = ("day", "week")
+
+# Trend series -> check-in fields it's read from, first one present wins
+# (/checkin saves "work_hours_today", /predict saves "work_hours")
+TREND_FIELDS = {
+    "burnout_probability": ("burnout_probability",),
+    "mood": ("mood",),
+    "stress": ("stress",),
+    "sleep": ("sleep",),
+    "work_hours": ("work_hours_today", "work_hours"),
+}
+
+
+def push_entry(rolling, checkin_data):
+    """
+    Append a check-in to a rolling aggregate (the `rolling_checkins` map on a
+    user document) and drop entries that fall out of the window.
+    """
+    window = list((rolling or {}).get("window", []))
+    entry = {field: checkin_data.get(field, 0) for field in ROLLING_FIELDS}
+    entry["timestamp"] = checkin_data.get("timestamp")
+    window = (window + [entry])[-ROLLING_WINDOW:]
+
+    # The window holds at most 7 entries, so sums are recomputed instead of
+    # adjusted in place (no float drift)
+    return {
+        "window": window,
+        "count": len(window),
+        "sums": {field: sum(e.get(field) or 0 for e in window) for field in ROLLING_FIELDS},
+    }
+
+
+def rolling_means(rolling):
+    """Model features from a rolling aggregate, or None if the user has no check-ins yet."""
+    if not rolling or not rolling.get("count"):
+        return None
+    count = rolling["count"]
+    return {feature: rolling["sums"][field] / count for field, feature in ROLLING_FIELDS.items()}
+
+
+def fetch_rolling_means(store, user_id):
+    """Rolling 7-check-in means from a single user document fetch."""
+    rolling = (store.get_user(user_id) or {}).get("rolling_checkins")
+    if rolling is None:
+        # User predates rolling aggregates: compute it from history but don't
+        # store it here, where it could overwrite a concurrent add_checkin's
+        # update; repair_rollups.py stores it
+        rolling = compute_rolling(store, user_id)
+    return rolling_means(rolling)
+
+
+def compute_rolling(store, user_id):
+    """A user's rolling aggregate from their latest check-ins."""
+    past_checkins = store.recent_checkins(user_id, ROLLING_WINDOW)
+
+    rolling = {"window": [], "count": 0, "sums": {field: 0 for field in ROLLING_FIELDS}}
+    for checkin_data in reversed(past_checkins):  # oldest first
+        rolling = push_entry(rolling, checkin_data)
+    return rolling
+
+
+def rebuild_rolling(store, user_id):
+    """Recompute and store a user's rolling aggregate (repair job; not safe against concurrent check-ins)."""
+    rolling = compute_rolling(store, user_id)
+    store.update_user(user_id, {"rolling_checkins": rolling})
+    return rolling
+
+
+# --- trend rollups ---
+
+def bucket_start(day, granularity):
+    """First day of the `granularity` bucket holding `day`."""
+    if granularity == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+
+def _local_date(timestamp):
+    # Check-ins are stamped with naive local time. Firestore stores a naive
+    # datetime as if it were UTC and returns it aware, so the UTC wall clock is
+    # the original stamp; converting to the server's zone would shift the day.
+    # Fresh and stored copies of a check-in then land in the same bucket.
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return timestamp.date()
+
+
+def _series_value(checkin_data, fields):
+    for field in fields:
+        value = checkin_data.get(field)
+        if value is not None:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def merge_aggregates(a, b):
+    """
+    Combine two bucket aggregates, {"count": n, "fields": {series: {"count",
+    "sum", "min", "max"}}}. Either may be None.
+    """
+    if not a:
+        return b
+    if not b:
+        return a
+    fields = dict(a["fields"])
+    for series, stats in b["fields"].items():
+        current = fields.get(series)
+        fields[series] = stats if current is None else {
+            "count": current["count"] + stats["count"],
+            "sum": current["sum"] + stats["sum"],
+            "min": min(current["min"], stats["min"]),
+            "max": max(current["max"], stats["max"]),
+        }
+    return {"count": a["count"] + b["count"], "fields": fields}
+
+
+def trend_deltas(checkins):
+    """
+    Fold check-ins into {(granularity, bucket): aggregate}, where bucket is the
+    ISO date the bucket starts on. Backends merge these into the stored
+    rollups in the same transaction that saves the check-ins.
+    """
+    deltas = {}
+    for checkin_data in checkins:
+        timestamp = checkin_data.get("timestamp")
+        if not isinstance(timestamp, datetime.datetime):
+            continue
+        fields = {}
+        for series, sources in TREND_FIELDS.items():
+            value = _series_value(checkin_data, sources)
+            if value is not None:
+                fields[series] = {"count": 1, "sum": value, "min": value, "max": value}
+        aggregate = {"count": 1, "fields": fields}
+
+        day = _local_date(timestamp)
+        for granularity in TREND_GRANULARITIES:
+            key = (granularity, bucket_start(day, granularity).isoformat())
+            deltas[key] = merge_aggregates(deltas.get(key), aggregate)
+    return deltas
+
+
+def summarize_bucket(bucket, aggregate):
+    """A stored aggregate as /trends reports it: mean, min, max and count per series."""
+    summary = {"bucket": bucket, "count": aggregate.get("count", 0)}
+    for series in TREND_FIELDS:
+        stats = (aggregate.get("fields") or {}).get(series)
+        if stats and stats.get("count"):
+            summary[series] = {
+                "mean": stats["sum"] / stats["count"],
+                "min": stats["min"],
+                "max": stats["max"],
+                "count": stats["count"],
+            }
+        else:
+            summary[series] = None
+    return summary
+
+
+def rebuild_trends(store, user_id):
+    """Recompute a user's trend rollups from their check-in history; returns the bucket count."""
+    aggregates = trend_deltas(data for _, data in store.list_checkins(user_id))
+    store.replace_trends(user_id, aggregates)
+    return len(aggregates)
+
+
+# --- team aggregates ---
+
+def _histogram_bin(probability):
+    return str(min(max(int(probability * HISTOGRAM_BINS), 0), HISTOGRAM_BINS - 1))
+
+
+def team_deltas(checkins, teams):
+    """
+    Fold one user's check-ins into {(team_id, day): aggregate} for each of
+    their `teams`. An aggregate is {"count", "sum", "high_risk", "histogram":
+    {bin: n}} over burnout_probability; bins are "0".."9".
+    """
+    deltas = {}
+    if not teams:
+        return deltas
+    for checkin_data in checkins:
+        timestamp = checkin_data.get("timestamp")
+        probability = _series_value(checkin_data, ("burnout_probability",))
+        if not isinstance(timestamp, datetime.datetime) or probability is None:
+            continue
+        aggregate = {
+            "count": 1,
+            "sum": probability,
+            "high_risk": 1 if probability >= HIGH_RISK_THRESHOLD else 0,
+            "histogram": {_histogram_bin(probability): 1},
+        }
+        day = _local_date(timestamp).isoformat()
+        for team_id in teams:
+            deltas[(team_id, day)] = merge_team_aggregates(deltas.get((team_id, day)), aggregate)
+    return deltas
+
+
+def merge_team_aggregates(a, b):
+    if not a:
+        return b
+    if not b:
+        return a
+    histogram = dict(a["histogram"])
+    for bin_key, n in b["histogram"].items():
+        histogram[bin_key] = histogram.get(bin_key, 0) + n
+    return {
+        "count": a["count"] + b["count"],
+        "sum": a["sum"] + b["sum"],
+        "high_risk": a["high_risk"] + b["high_risk"],
+        "histogram": histogram,
+    }
+
+
+def summarize_team(aggregate):
+    """Count, mean, high-risk share and the full histogram (low bin first)."""
+    count = aggregate.get("count", 0)
+    histogram = aggregate.get("histogram") or {}
+    return {
+        "count": count,
+        "mean_burnout_probability": aggregate["sum"] / count if count else None,
+        "high_risk_share": aggregate["high_risk"] / count if count else None,
+        "histogram": [histogram.get(str(i), 0) for i in range(HISTOGRAM_BINS)],
+    }
+
+
+def rebuild_team_aggregates(store):
+    """Recompute every team's aggregates from its current members' histories; returns the team count."""
+    aggregates = {}
+    for user_id in store.iter_user_ids():
+        teams = (store.get_user(user_id) or {}).get("teams")
+        if teams:
+            checkins = (data for _, data in store.list_checkins(user_id))
+            for key, delta in team_deltas(checkins, teams).items():
+                aggregates[key] = merge_team_aggregates(aggregates.get(key), delta)
+
+    by_team = {}
+    for (team_id, day), aggregate in aggregates.items():
+        by_team.setdefault(team_id, {})[day] = aggregate
+    for team_id in store.team_ids():
+        by_team.setdefault(team_id, {})
+    for team_id, days in by_team.items():
+        store.replace_team_days(team_id, days)
+    return len(by_team)
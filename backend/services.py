@@ -0,0 +1,73 @@
+import threading
+import time
+
+
+class LazyResource:
+    """
+    A subsystem (model, Firestore client, ...) initialized on first use,
+    exactly once, by calling `loader()`. Tracks how long loading took and the
+    last error so /readyz can report it.
+    """
+
+    def __init__(self, name, loader, required=True):
+        self.name = name
+        self.required = required  # must be loaded before the app reports ready
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self.load_seconds = None
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self._loaded = True
+        return self._value
+
+    def status(self):
+        return {
+            "loaded": self._loaded,
+            "required": self.required,
+            "load_seconds": round(self.load_seconds, 4) if self.load_seconds is not None else None,
+            "error": self.error
+        }
+
+
+class LazyProxy:
+    """Forwards attribute access to resource.get(), so callers keep writing `db.collection(...)`."""
+
+    def __init__(self, resource):
+        object.__setattr__(self, "_resource", resource)
+
+    def __getattr__(self, name):
+        return getattr(self._resource.get(), name)
+
+
+def warm_up(resources):
+    """Load every resource on a background thread; returns the thread."""
+    def run():
+        for resource in resources:
+            try:
+                resource.get()
+                print(f"✅ {resource.name} loaded in {resource.load_seconds:.2f}s")
+            except Exception as e:
+                print(f"⚠️ Warm-up failed for {resource.name}: {e}")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,97 @@
+import asyncio
+import concurrent.futures
+import os
+import time
+from collections import namedtuple
+
+from metrics import SOURCE_FALLBACKS
+
+# Shared pool used to fetch feature sources (calendar, RescueTime, history) in parallel
+SOURCE_POOL_WORKERS = int(os.getenv("SOURCE_POOL_WORKERS", "16"))
+_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=SOURCE_POOL_WORKERS,
+    thread_name_prefix="source"
+)
+
+# fetch: zero-arg callable, default: value used when it fails, deadline: seconds
+Source = namedtuple("Source", ["fetch", "default", "deadline"])
+
+
+def fetch_sources(sources):
+    """
+    Run every source in `sources` ({name: Source}) concurrently.
+    Each one gets its own deadline, measured from when the batch started.
+    Returns (values, status): a source that misses its deadline or raises
+    falls back to its default and is flagged "timeout" or "error".
+    """
+    start = time.monotonic()
+    futures = {name: _pool.submit(source.fetch) for name, source in sources.items()}
+
+    values, status = {}, {}
+    for name, source in sorted(sources.items(), key=lambda item: item[1].deadline):
+        remaining = max(0.0, start + source.deadline - time.monotonic())
+        try:
+            values[name] = futures[name].result(timeout=remaining)
+            status[name] = "ok"
+        except concurrent.futures.TimeoutError:
+            # The worker keeps running in the background; we just stop waiting for it
+            futures[name].cancel()
+            print(f"⚠️ {name} missed its {source.deadline}s deadline, using default")
+            values[name] = source.default
+            status[name] = "timeout"
+            SOURCE_FALLBACKS.inc(name, "timeout")
+        except Exception as e:
+            print(f"⚠️ Error fetching {name}: {e}")
+            values[name] = source.default
+            status[name] = "error"
+            SOURCE_FALLBACKS.inc(name, "error")
+
+    return values, status
+
+
+def fan_out(fn, keys):
+    """
+    fn(key) for every key, concurrently on the shared pool. Returns {key: result};
+    a key whose call raised maps to None.
+    """
+    futures = {key: _pool.submit(fn, key) for key in keys}
+    results = {}
+    for key, future in futures.items():
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            print(f"⚠️ Error in {getattr(fn, '__name__', fn)} for {key}: {e}")
+            results[key] = None
+    return results
+
+
+async def fetch_sources_async(sources):
+    """
+    fetch_sources for the ASGI routes: each Source.fetch returns an awaitable.
+    Same deadlines, defaults and statuses; a late source keeps running in the
+    background (so it can still fill its cache) while we answer without it.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = {name: asyncio.ensure_future(source.fetch()) for name, source in sources.items()}
+
+    values, status = {}, {}
+    for name, source in sorted(sources.items(), key=lambda item: item[1].deadline):
+        remaining = max(0.0, start + source.deadline - loop.time())
+        try:
+            values[name] = await asyncio.wait_for(asyncio.shield(tasks[name]), remaining)
+            status[name] = "ok"
+        except asyncio.TimeoutError:
+            # Nobody awaits it any more; retrieve its outcome so errors aren't logged as unhandled
+            tasks[name].add_done_callback(lambda task: task.cancelled() or task.exception())
+            print(f"⚠️ {name} missed its {source.deadline}s deadline, using default")
+            values[name] = source.default
+            status[name] = "timeout"
+            SOURCE_FALLBACKS.inc(name, "timeout")
+        except Exception as e:
+            print(f"⚠️ Error fetching {name}: {e}")
+            values[name] = source.default
+            status[name] = "error"
+            SOURCE_FALLBACKS.inc(name, "error")
+
+    return values, status
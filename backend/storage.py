@@ -0,0 +1,175 @@
+import datetime
+import json
+import os
+
+# Which backend the app persists to: "firestore" (default) or "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+
+# Firestore service account key
+FIREBASE_KEY_PATH = os.getenv("FIREBASE_KEY_PATH", "firebase_key.json")
+
+# Database file for the embedded SQLite backend
+SQLITE_PATH = os.getenv("SQLITE_PATH", "boz.sqlite3")
+
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj):
+    if len(obj) == 1 and "$datetime" in obj:
+        return datetime.datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+def dumps(data):
+    """JSON for a stored document; datetimes round-trip through {"$datetime": iso}."""
+    return json.dumps(data, default=_encode)
+
+
+def loads(text):
+    return json.loads(text, object_hook=_decode)
+
+
+class _Delete:
+    def __repr__(self):
+        return "DELETE"
+
+
+# Pass as a value to Storage.update_user to remove that field
+DELETE = _Delete()
+
+
+def with_team(teams, team_id, member):
+    """A user's "teams" list with team_id added (member=True, at the end) or removed."""
+    teams = list(teams or [])
+    if not member:
+        return [team for team in teams if team != team_id]
+    return teams if team_id in teams else teams + [team_id]
+
+
+class Storage:
+    """
+    Everything the service persists: check-ins (with their rolling aggregates,
+    trend rollups and team aggregates), user documents (credentials, sync state, ...) and synced calendar events.
+    Field paths passed to update_user may be dotted ("a.b") to reach into maps.
+    """
+
+    # --- check-ins ---
+
+    def add_checkin(self, checkin_data, checkin_id=None):
+        """
+        Save a check-in and fold it into the user's rolling aggregate, trend
+        rollups (rollups.trend_deltas) and the daily aggregates of the teams
+        listed in the user's "teams" (rollups.team_deltas) atomically; returns its id.
+        With an explicit `checkin_id` the write is idempotent: a check-in already
+        stored under that id is left alone and not folded in again.
+        """
+        raise NotImplementedError
+
+    def add_checkins(self, checkins):
+        """add_checkin for every (checkin_id, checkin_data) in order; backends batch where they can."""
+        for checkin_id, checkin_data in checkins:
+            self.add_checkin(checkin_data, checkin_id=checkin_id)
+
+    def recent_checkins(self, user_id, limit):
+        """The user's latest `limit` check-ins, newest first."""
+        raise NotImplementedError
+
+    def list_checkins(self, user_id):
+        """Iterate (id, data) over all of the user's check-ins, newest first."""
+        raise NotImplementedError
+
+    def page_checkins(self, user_id, limit=None, after=None, start=None, end=None, fields=None):
+        """
+        Iterate (id, data) over the user's check-ins ordered by (timestamp, id)
+        descending, as they are read: at most `limit`, only those past the
+        `after` (timestamp, id) cursor, with start <= timestamp < end. With
+        `fields`, data holds only those top-level fields (plus timestamp and user_id).
+        """
+        raise NotImplementedError
+
+    def update_checkins(self, updates):
+        """Merge fields into stored check-ins, {checkin_id: fields}, in batched writes."""
+        raise NotImplementedError
+
+    # --- trend rollups ---
+
+    def trend_buckets(self, user_id, granularity, start, end):
+        """{bucket: aggregate} for the stored buckets starting in [start, end] (ISO dates)."""
+        raise NotImplementedError
+
+    def replace_trends(self, user_id, aggregates):
+        """Overwrite the user's rollups with {(granularity, bucket): aggregate} (for repairs)."""
+        raise NotImplementedError
+
+    # --- team aggregates ---
+
+    def team_days(self, team_id, start, end):
+        """{day: aggregate} for the team's stored days in [start, end] (ISO dates)."""
+        raise NotImplementedError
+
+    def replace_team_days(self, team_id, days):
+        """Overwrite a team's aggregates with {day: aggregate} (for repairs)."""
+        raise NotImplementedError
+
+    def team_ids(self):
+        """Every team with stored aggregates."""
+        raise NotImplementedError
+
+    def set_team_member(self, user_id, team_id, member):
+        """
+        Add the user to (member=True) or remove them from a team's "teams"
+        entry on the user document, atomically with respect to concurrent
+        membership changes and check-ins; returns the new teams list.
+        """
+        raise NotImplementedError
+
+    # --- users ---
+
+    def get_user(self, user_id):
+        """The user document as a dict, or None."""
+        raise NotImplementedError
+
+    def update_user(self, user_id, fields):
+        """Merge `fields` into the user document, creating it if needed."""
+        raise NotImplementedError
+
+    def iter_user_ids(self, after=None):
+        """Every user id in ascending order, optionally only those after `after` (for resuming)."""
+        raise NotImplementedError
+
+    # --- calendar events ---
+
+    def event_versions(self, user_id, event_ids):
+        """{event_id: {"updated": ..., "start_ts": ...}} for the stored events among `event_ids`."""
+        raise NotImplementedError
+
+    def write_events(self, user_id, upserts, deletes):
+        """Upsert {event_id: fields} and delete `deletes` ids, in as few round trips as possible."""
+        raise NotImplementedError
+
+    def delete_events_except(self, user_id, keep_ids):
+        """Delete every stored event not in `keep_ids`; returns how many were deleted."""
+        raise NotImplementedError
+
+    def event_intervals(self, user_id, start, end):
+        """(start_ts, end_ts) of every stored event overlapping [start, end), as aware UTC datetimes."""
+        raise NotImplementedError
+
+    def upcoming_events(self, user_id, after, limit):
+        """Stored events still running after `after`, ordered by start (API shape, with "id")."""
+        raise NotImplementedError
+
+
+def open_storage(backend=STORAGE_BACKEND):
+    """Build the configured storage backend."""
+    if backend == "firestore":
+        from storage_firestore import FirestoreStorage
+        return FirestoreStorage.from_key_file(FIREBASE_KEY_PATH)
+    if backend == "sqlite":
+        from storage_sqlite import SQLiteStorage
+        return SQLiteStorage(SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
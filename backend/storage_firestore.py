@@ -0,0 +1,304 @@
+from rollups import TREND_GRANULARITIES, push_entry, team_deltas, trend_deltas
+from storage import DELETE, Storage, with_team
+
+# Firestore allows at most 500 writes in one batch
+BATCH_LIMIT = 500
+
+
+def _nest(fields):
+    """{"a.b": 1} -> {"a": {"b": 1}} (DELETE becomes firestore.DELETE_FIELD)."""
+    from firebase_admin import firestore
+
+    nested = {}
+    for path, value in fields.items():
+        *parents, leaf = path.split(".")
+        target = nested
+        for key in parents:
+            target = target.setdefault(key, {})
+        target[leaf] = firestore.DELETE_FIELD if value is DELETE else value
+    return nested
+
+
+def _add_checkins_in_transaction(transaction, user_ref, checkins, teams_collection):
+    """checkins: [(checkin_ref, checkin_data)] for one user, oldest first."""
+    snapshot = user_ref.get(transaction=transaction)
+    user = (snapshot.to_dict() or {}) if snapshot.exists else {}
+    rolling = user.get("rolling_checkins")
+    # Check-ins already stored under their id (replayed writes) are skipped
+    existing = {s.id for s in transaction.get_all([ref for ref, _ in checkins]) if s.exists}
+
+    new = [(ref, data) for ref, data in checkins if ref.id not in existing]
+    if not new:
+        return
+    for checkin_ref, checkin_data in new:
+        transaction.set(checkin_ref, checkin_data)
+        rolling = push_entry(rolling, checkin_data)
+    transaction.set(user_ref, {"rolling_checkins": rolling}, merge=["rolling_checkins"])
+
+    # Trend rollups are merged server-side with field transforms, one write per bucket
+    for (granularity, bucket), delta in trend_deltas(data for _, data in new).items():
+        transaction.set(
+            user_ref.collection(f"trends_{granularity}").document(bucket),
+            _trend_transforms(bucket, delta),
+            merge=True
+        )
+
+    # Same for the daily aggregates of every team the user belongs to
+    for (team_id, day), delta in team_deltas((data for _, data in new), user.get("teams")).items():
+        transaction.set(
+            teams_collection.document(team_id).collection("days").document(day),
+            _team_transforms(day, delta),
+            merge=True
+        )
+
+
+def _trend_transforms(bucket, delta):
+    from firebase_admin import firestore
+
+    return {
+        "bucket": bucket,
+        "count": firestore.Increment(delta["count"]),
+        "fields": {
+            series: {
+                "count": firestore.Increment(stats["count"]),
+                "sum": firestore.Increment(stats["sum"]),
+                "min": firestore.Minimum(stats["min"]),
+                "max": firestore.Maximum(stats["max"]),
+            }
+            for series, stats in delta["fields"].items()
+        },
+    }
+
+
+def _team_transforms(day, delta):
+    from firebase_admin import firestore
+
+    return {
+        "day": day,
+        "count": firestore.Increment(delta["count"]),
+        "sum": firestore.Increment(delta["sum"]),
+        "high_risk": firestore.Increment(delta["high_risk"]),
+        "histogram": {bin_key: firestore.Increment(n) for bin_key, n in delta["histogram"].items()},
+    }
+
+
+def _set_team_member_in_transaction(transaction, user_ref, team_id, member):
+    # Reads the user document like _add_checkins_in_transaction, so the two serialize
+    snapshot = user_ref.get(transaction=transaction)
+    teams = with_team(((snapshot.to_dict() or {}) if snapshot.exists else {}).get("teams"), team_id, member)
+    transaction.set(user_ref, {"teams": teams}, merge=["teams"])
+    return teams
+
+
+class FirestoreStorage(Storage):
+    """Storage on Cloud Firestore: checkins, users and users/{id}/calendar_events."""
+
+    def __init__(self, db):
+        self.db = db
+
+    @classmethod
+    def from_key_file(cls, key_path):
+        # Initialize Firebase
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        cred = credentials.Certificate(key_path)
+        firebase_admin.initialize_app(cred)
+        return cls(firestore.client())
+
+    # --- check-ins ---
+
+    def _add_for_user(self, user_id, checkins):
+        from firebase_admin import firestore
+
+        firestore.transactional(_add_checkins_in_transaction)(
+            self.db.transaction(), self.db.collection("users").document(user_id), checkins,
+            self.db.collection("teams")
+        )
+
+    def add_checkin(self, checkin_data, checkin_id=None):
+        checkin_ref = self.db.collection("checkins").document(checkin_id)
+        self._add_for_user(checkin_data["user_id"], [(checkin_ref, checkin_data)])
+        return checkin_ref.id
+
+    def add_checkins(self, checkins):
+        # One transaction per user (the rolling aggregate lives on the user document)
+        by_user = {}
+        for checkin_id, checkin_data in checkins:
+            by_user.setdefault(checkin_data["user_id"], []).append(
+                (self.db.collection("checkins").document(checkin_id), checkin_data)
+            )
+        for user_id, user_checkins in by_user.items():
+            self._add_for_user(user_id, user_checkins)
+
+    def _checkins_query(self, user_id):
+        from firebase_admin import firestore
+
+        # Uses the (user_id, timestamp desc, __name__ desc) index in firestore.indexes.json
+
+        return self.db.collection("checkins").where("user_id", "==", user_id).order_by(
+            "timestamp", direction=firestore.Query.DESCENDING
+        )
+
+    def recent_checkins(self, user_id, limit):
+        return [doc.to_dict() for doc in self._checkins_query(user_id).limit(limit).stream()]
+
+    def list_checkins(self, user_id):
+        for doc in self._checkins_query(user_id).stream():
+            yield doc.id, doc.to_dict()
+
+    def page_checkins(self, user_id, limit=None, after=None, start=None, end=None, fields=None):
+        from firebase_admin import firestore
+
+        checkins = self.db.collection("checkins")
+        # The document id breaks timestamp ties, so the cursor is exact
+        query = self._checkins_query(user_id).order_by(
+            firestore.FieldPath.document_id(), direction=firestore.Query.DESCENDING
+        )
+        if start is not None:
+            query = query.where("timestamp", ">=", start)
+        if end is not None:
+            query = query.where("timestamp", "<", end)
+        if fields is not None:
+            query = query.select(sorted({"timestamp", "user_id", *fields}))
+        if after is not None:
+            timestamp, checkin_id = after
+            query = query.start_after({
+                "timestamp": timestamp, firestore.FieldPath.document_id(): checkins.document(checkin_id)
+            })
+        if limit:
+            query = query.limit(limit)
+        for doc in query.stream():
+            yield doc.id, doc.to_dict()
+
+    def update_checkins(self, updates):
+        checkins = self.db.collection("checkins")
+        self._commit_in_batches([(checkins.document(checkin_id), fields) for checkin_id, fields in updates.items()])
+
+    # --- trend rollups ---
+
+    def _trends(self, user_id, granularity):
+        # users/{id}/trends_day and users/{id}/trends_week, keyed by bucket start date
+        return self.db.collection("users").document(user_id).collection(f"trends_{granularity}")
+
+    def trend_buckets(self, user_id, granularity, start, end):
+        query = self._trends(user_id, granularity).where("bucket", ">=", start).where("bucket", "<=", end)
+        return {doc.id: doc.to_dict() for doc in query.order_by("bucket").stream()}
+
+    def replace_trends(self, user_id, aggregates):
+        writes = []
+        for granularity in TREND_GRANULARITIES:
+            trends = self._trends(user_id, granularity)
+            keep = {bucket for g, bucket in aggregates if g == granularity}
+            writes += [(doc.reference, None) for doc in trends.select([]).stream() if doc.id not in keep]
+        writes += [
+            (self._trends(user_id, granularity).document(bucket), {"bucket": bucket, **aggregate})
+            for (granularity, bucket), aggregate in aggregates.items()
+        ]
+        self._commit_in_batches(writes)
+
+    # --- team aggregates ---
+
+    def _team_days(self, team_id):
+        # teams/{id}/days/{YYYY-MM-DD}
+        return self.db.collection("teams").document(team_id).collection("days")
+
+    def team_days(self, team_id, start, end):
+        query = self._team_days(team_id).where("day", ">=", start).where("day", "<=", end)
+        return {doc.id: doc.to_dict() for doc in query.order_by("day").stream()}
+
+    def replace_team_days(self, team_id, days):
+        team_days = self._team_days(team_id)
+        writes = [(doc.reference, None) for doc in team_days.select([]).stream() if doc.id not in days]
+        writes += [(team_days.document(day), {"day": day, **aggregate}) for day, aggregate in days.items()]
+        self._commit_in_batches(writes)
+
+    def team_ids(self):
+        # Team documents only exist as parents of their days subcollection
+        return [ref.id for ref in self.db.collection("teams").list_documents()]
+
+    def set_team_member(self, user_id, team_id, member):
+        from firebase_admin import firestore
+
+        return firestore.transactional(_set_team_member_in_transaction)(
+            self.db.transaction(), self.db.collection("users").document(user_id), team_id, member
+        )
+
+    # --- users ---
+
+    def get_user(self, user_id):
+        return self.db.collection("users").document(user_id).get().to_dict()
+
+    def update_user(self, user_id, fields):
+        # merge=<paths> replaces exactly the given (possibly dotted) fields
+        self.db.collection("users").document(user_id).set(_nest(fields), merge=list(fields))
+
+    def iter_user_ids(self, after=None):
+        from firebase_admin import firestore
+
+        users = self.db.collection("users")
+        # Document id order; keys only
+        query = users.order_by(firestore.FieldPath.document_id()).select([])
+        if after:
+            query = query.where(firestore.FieldPath.document_id(), ">", users.document(after))
+        for doc in query.stream():
+            yield doc.id
+
+    # --- calendar events ---
+
+    def _events(self, user_id):
+        return self.db.collection("users").document(user_id).collection("calendar_events")
+
+    def event_versions(self, user_id, event_ids):
+        events_collection = self._events(user_id)
+        refs = [events_collection.document(event_id) for event_id in event_ids]
+        if not refs:
+            return {}
+        # One round trip for every event
+        return {
+            snapshot.id: snapshot.to_dict() or {}
+            for snapshot in self.db.get_all(refs, field_paths=["updated", "start_ts"])
+            if snapshot.exists
+        }
+
+    def _commit_in_batches(self, writes):
+        """writes: [(ref, fields)], where fields=None means delete."""
+        for i in range(0, len(writes), BATCH_LIMIT):
+            batch = self.db.batch()
+            for ref, fields in writes[i:i + BATCH_LIMIT]:
+                if fields is None:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, fields, merge=True)
+            batch.commit()
+
+    def write_events(self, user_id, upserts, deletes):
+        events_collection = self._events(user_id)
+        writes = [(events_collection.document(event_id), fields) for event_id, fields in upserts.items()]
+        writes += [(events_collection.document(event_id), None) for event_id in deletes]
+        self._commit_in_batches(writes)
+
+    def delete_events_except(self, user_id, keep_ids):
+        stale = [doc.reference for doc in self._events(user_id).select([]).stream() if doc.id not in keep_ids]
+        self._commit_in_batches([(ref, None) for ref in stale])
+        return len(stale)
+
+    def event_intervals(self, user_id, start, end):
+        # Range filters on two fields: uses the (end_ts, start_ts) index in firestore.indexes.json
+        query = self._events(user_id).where("end_ts", ">", start).where("start_ts", "<", end)
+        return [
+            (data["start_ts"], data["end_ts"])
+            for data in (doc.to_dict() for doc in query.select(["start_ts", "end_ts"]).stream())
+        ]
+
+    def upcoming_events(self, user_id, after, limit):
+        # Ordered by start like the SQLite backend; uses the (start_ts, end_ts) index in firestore.indexes.json
+        query = self._events(user_id).where("end_ts", ">", after).order_by("start_ts").limit(limit)
+        events = []
+        for doc in query.stream():
+            data = doc.to_dict()
+            data["id"] = doc.id
+            data.pop("start_ts", None)
+            data.pop("end_ts", None)
+            events.append(data)
+        return events
@@ -0,0 +1,357 @@
+import datetime
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+from rollups import merge_aggregates, merge_team_aggregates, push_entry, team_deltas, trend_deltas
+from storage import DELETE, Storage, dumps as _dumps, loads as _loads, with_team
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS checkins (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checkins_user_timestamp ON checkins (user_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS trend_rollups (
+    user_id TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, granularity, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS team_rollups (
+    team_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (team_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS calendar_events (
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    start_ts TEXT,
+    end_ts TEXT,
+    updated TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS calendar_events_user_start ON calendar_events (user_id, start_ts);
+CREATE INDEX IF NOT EXISTS calendar_events_user_end ON calendar_events (user_id, end_ts);
+"""
+
+
+def _ts(value):
+    """Sortable text for a datetime column (aware values are stored as naive UTC)."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def _utc(text):
+    # Inverse of _ts
+    return datetime.datetime.fromisoformat(text).replace(tzinfo=datetime.timezone.utc)
+
+
+def _set_path(doc, path, value):
+    *parents, leaf = path.split(".")
+    for key in parents:
+        doc = doc.setdefault(key, {})
+    if value is DELETE:
+        doc.pop(leaf, None)
+    else:
+        doc[leaf] = value
+
+
+class SQLiteStorage(Storage):
+    """
+    Embedded storage in one SQLite file (WAL mode), for single-node
+    deployments, local development and load tests. Documents are stored as
+    JSON next to the indexed columns we query on.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections are per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write is atomic
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _get_user(self, conn, user_id):
+        row = conn.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+        return _loads(row[0]) if row else None
+
+    def _put_user(self, conn, user_id, doc):
+        conn.execute(
+            "INSERT INTO users (id, data) VALUES (?, ?) ON CONFLICT (id) DO UPDATE SET data = excluded.data",
+            (user_id, _dumps(doc))
+        )
+
+    # --- check-ins ---
+
+    def _insert_checkin(self, conn, checkin_id, checkin_data):
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO checkins (id, user_id, timestamp, data) VALUES (?, ?, ?, ?)",
+            (checkin_id, checkin_data["user_id"], _ts(checkin_data["timestamp"]), _dumps(checkin_data))
+        ).rowcount
+        # Already stored (replayed write): don't fold it into the window twice
+        if inserted:
+            user_id = checkin_data["user_id"]
+            user = self._get_user(conn, user_id) or {}
+            user["rolling_checkins"] = push_entry(user.get("rolling_checkins"), checkin_data)
+            self._put_user(conn, user_id, user)
+            self._fold_trends(conn, user_id, trend_deltas([checkin_data]))
+            self._fold_team_days(conn, team_deltas([checkin_data], user.get("teams")))
+
+    def _fold_trends(self, conn, user_id, deltas):
+        for (granularity, bucket), delta in deltas.items():
+            row = conn.execute(
+                "SELECT data FROM trend_rollups WHERE user_id = ? AND granularity = ? AND bucket = ?",
+                (user_id, granularity, bucket)
+            ).fetchone()
+            aggregate = merge_aggregates(_loads(row[0]) if row else None, delta)
+            conn.execute(
+                "INSERT INTO trend_rollups (user_id, granularity, bucket, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, granularity, bucket) DO UPDATE SET data = excluded.data",
+                (user_id, granularity, bucket, _dumps(aggregate))
+            )
+
+    def _fold_team_days(self, conn, deltas):
+        for (team_id, day), delta in deltas.items():
+            row = conn.execute(
+                "SELECT data FROM team_rollups WHERE team_id = ? AND day = ?", (team_id, day)
+            ).fetchone()
+            aggregate = merge_team_aggregates(_loads(row[0]) if row else None, delta)
+            conn.execute(
+                "INSERT INTO team_rollups (team_id, day, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (team_id, day) DO UPDATE SET data = excluded.data",
+                (team_id, day, _dumps(aggregate))
+            )
+
+    def add_checkin(self, checkin_data, checkin_id=None):
+        checkin_id = checkin_id or uuid.uuid4().hex
+        with self._transaction() as conn:
+            self._insert_checkin(conn, checkin_id, checkin_data)
+        return checkin_id
+
+    def add_checkins(self, checkins):
+        # One transaction (one fsync) for the whole batch
+        with self._transaction() as conn:
+            for checkin_id, checkin_data in checkins:
+                self._insert_checkin(conn, checkin_id, checkin_data)
+
+    def recent_checkins(self, user_id, limit):
+        rows = self._conn().execute(
+            "SELECT data FROM checkins WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+        return [_loads(data) for (data,) in rows]
+
+    def list_checkins(self, user_id):
+        cursor = self._conn().execute(
+            "SELECT id, data FROM checkins WHERE user_id = ? ORDER BY timestamp DESC",
+            (user_id,)
+        )
+        for checkin_id, data in cursor:
+            yield checkin_id, _loads(data)
+
+    def page_checkins(self, user_id, limit=None, after=None, start=None, end=None, fields=None):
+        where, params = ["user_id = ?"], [user_id]
+        if start is not None:
+            where.append("timestamp >= ?")
+            params.append(_ts(start))
+        if end is not None:
+            where.append("timestamp < ?")
+            params.append(_ts(end))
+        if after is not None:
+            timestamp, checkin_id = after
+            where.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params += [_ts(timestamp), _ts(timestamp), checkin_id]
+
+        column = "data"
+        if fields is not None:
+            # json_extract with several paths returns a JSON array of their values
+            fields = sorted({"timestamp", "user_id", *fields})
+            column = f"json_extract(data, {', '.join('?' for _ in fields)})"
+            params = [f"$.{field}" for field in fields] + params
+
+        sql = f"SELECT id, {column} FROM checkins WHERE {' AND '.join(where)} ORDER BY timestamp DESC, id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for checkin_id, data in self._conn().execute(sql, params):
+            data = _loads(data)
+            if fields is not None:
+                # Missing fields are left out, like a Firestore projection
+                data = {field: value for field, value in zip(fields, data) if value is not None}
+            yield checkin_id, data
+
+    def update_checkins(self, updates):
+        with self._transaction() as conn:
+            for checkin_id, fields in updates.items():
+                paths = ", ".join("?, json(?)" for _ in fields)
+                params = [item for key, value in fields.items() for item in (f"$.{key}", _dumps(value))]
+                conn.execute(f"UPDATE checkins SET data = json_set(data, {paths}) WHERE id = ?", [*params, checkin_id])
+
+    # --- trend rollups ---
+
+    def trend_buckets(self, user_id, granularity, start, end):
+        rows = self._conn().execute(
+            "SELECT bucket, data FROM trend_rollups "
+            "WHERE user_id = ? AND granularity = ? AND bucket >= ? AND bucket <= ? ORDER BY bucket",
+            (user_id, granularity, start, end)
+        ).fetchall()
+        return {bucket: _loads(data) for bucket, data in rows}
+
+    def replace_trends(self, user_id, aggregates):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM trend_rollups WHERE user_id = ?", (user_id,))
+            conn.executemany(
+                "INSERT INTO trend_rollups (user_id, granularity, bucket, data) VALUES (?, ?, ?, ?)",
+                [(user_id, granularity, bucket, _dumps(aggregate))
+                 for (granularity, bucket), aggregate in aggregates.items()]
+            )
+
+    # --- team aggregates ---
+
+    def team_days(self, team_id, start, end):
+        rows = self._conn().execute(
+            "SELECT day, data FROM team_rollups WHERE team_id = ? AND day >= ? AND day <= ? ORDER BY day",
+            (team_id, start, end)
+        ).fetchall()
+        return {day: _loads(data) for day, data in rows}
+
+    def replace_team_days(self, team_id, days):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM team_rollups WHERE team_id = ?", (team_id,))
+            conn.executemany(
+                "INSERT INTO team_rollups (team_id, day, data) VALUES (?, ?, ?)",
+                [(team_id, day, _dumps(aggregate)) for day, aggregate in days.items()]
+            )
+
+    def team_ids(self):
+        return [row[0] for row in self._conn().execute("SELECT DISTINCT team_id FROM team_rollups ORDER BY team_id")]
+
+    def set_team_member(self, user_id, team_id, member):
+        # Same write lock as _insert_checkin, so a check-in is folded with the membership before or after
+        with self._transaction() as conn:
+            user = self._get_user(conn, user_id) or {}
+            teams = with_team(user.get("teams"), team_id, member)
+            user["teams"] = teams
+            self._put_user(conn, user_id, user)
+        return teams
+
+    # --- users ---
+
+    def get_user(self, user_id):
+        return self._get_user(self._conn(), user_id)
+
+    def update_user(self, user_id, fields):
+        with self._transaction() as conn:
+            doc = self._get_user(conn, user_id) or {}
+            for path, value in fields.items():
+                _set_path(doc, path, value)
+            self._put_user(conn, user_id, doc)
+
+    def iter_user_ids(self, after=None):
+        rows = self._conn().execute(
+            "SELECT id FROM users WHERE id > ? ORDER BY id", (after or "",)
+        ).fetchall()
+        for (user_id,) in rows:
+            yield user_id
+
+    # --- calendar events ---
+
+    def event_versions(self, user_id, event_ids):
+        event_ids = list(event_ids)
+        versions = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(event_ids), 500):
+            chunk = event_ids[i:i + 500]
+            rows = self._conn().execute(
+                f"SELECT id, updated, start_ts FROM calendar_events "
+                f"WHERE user_id = ? AND id IN ({','.join('?' * len(chunk))})",
+                [user_id, *chunk]
+            ).fetchall()
+            for event_id, updated, start_ts in rows:
+                versions[event_id] = {"updated": updated}
+                if start_ts is not None:
+                    versions[event_id]["start_ts"] = start_ts
+        return versions
+
+    def write_events(self, user_id, upserts, deletes):
+        with self._transaction() as conn:
+            for event_id, fields in upserts.items():
+                fields = dict(fields)
+                start_ts, end_ts = fields.pop("start_ts", None), fields.pop("end_ts", None)
+                conn.execute(
+                    "INSERT INTO calendar_events (user_id, id, start_ts, end_ts, updated, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, id) DO UPDATE SET "
+                    "start_ts = excluded.start_ts, end_ts = excluded.end_ts, "
+                    "updated = excluded.updated, data = excluded.data",
+                    (user_id, event_id, _ts(start_ts), _ts(end_ts), fields.get("updated"), _dumps(fields))
+                )
+            conn.executemany(
+                "DELETE FROM calendar_events WHERE user_id = ? AND id = ?",
+                [(user_id, event_id) for event_id in deletes]
+            )
+
+    def delete_events_except(self, user_id, keep_ids):
+        with self._transaction() as conn:
+            stored = [row[0] for row in conn.execute("SELECT id FROM calendar_events WHERE user_id = ?", (user_id,))]
+            stale = [event_id for event_id in stored if event_id not in keep_ids]
+            conn.executemany(
+                "DELETE FROM calendar_events WHERE user_id = ? AND id = ?",
+                [(user_id, event_id) for event_id in stale]
+            )
+        return len(stale)
+
+    def event_intervals(self, user_id, start, end):
+        rows = self._conn().execute(
+            "SELECT start_ts, end_ts FROM calendar_events WHERE user_id = ? AND end_ts > ? AND start_ts < ?",
+            (user_id, _ts(start), _ts(end))
+        ).fetchall()
+        return [(_utc(start_ts), _utc(end_ts)) for start_ts, end_ts in rows]
+
+    def upcoming_events(self, user_id, after, limit):
+        rows = self._conn().execute(
+            "SELECT id, data FROM calendar_events WHERE user_id = ? AND end_ts > ? ORDER BY start_ts LIMIT ?",
+            (user_id, _ts(after), limit)
+        ).fetchall()
+        events = []
+        for event_id, data in rows:
+            event = _loads(data)
+            event["id"] = event_id
+            events.append(event)
+        return events
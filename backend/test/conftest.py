@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules under test live in backend/, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Manual script against a running server, not a pytest module
+collect_ignore = ["test_predict_multiclass.py"]
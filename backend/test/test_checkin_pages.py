@@ -0,0 +1,54 @@
+import datetime
+
+import pytest
+
+from storage_sqlite import SQLiteStorage
+
+BASE = datetime.datetime(2026, 10, 1, 9)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStorage(str(tmp_path / "boz.sqlite3"))
+    for i in range(25):
+        # Groups of three share a timestamp
+        store.add_checkin(
+            {"user_id": "u", "timestamp": BASE + datetime.timedelta(hours=7 * (i // 3)), "mood": i % 5 + 1, "sleep": 7},
+            checkin_id=f"c{i:02d}"
+        )
+    store.add_checkin({"user_id": "other", "timestamp": BASE, "mood": 1}, checkin_id="x")
+    return store
+
+
+def expected_order(store):
+    rows = list(store.list_checkins("u"))
+    return [checkin_id for checkin_id, data in sorted(rows, key=lambda row: (row[1]["timestamp"], row[0]), reverse=True)]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 7, 25, 30])
+def test_cursor_pages_cover_history_once_in_order(store, limit):
+    seen, after = [], None
+    while True:
+        page = list(store.page_checkins("u", limit, after=after))
+        seen += [checkin_id for checkin_id, _ in page]
+        if len(page) < limit:
+            break
+        last_id, last = page[-1]
+        after = (last["timestamp"], last_id)
+
+    assert seen == expected_order(store)
+
+
+def test_bounds_are_half_open(store):
+    start, end = BASE + datetime.timedelta(hours=7), BASE + datetime.timedelta(hours=21)
+    rows = list(store.page_checkins("u", start=start, end=end))
+
+    assert {data["timestamp"] for _, data in rows} == {start, BASE + datetime.timedelta(hours=14)}
+    assert len(rows) == 6
+
+
+def test_projection_keeps_timestamp_and_user_id(store):
+    rows = list(store.page_checkins("u", 2, fields=["mood", "missing"]))
+
+    assert [sorted(data) for _, data in rows] == [["mood", "timestamp", "user_id"]] * 2
+    assert isinstance(rows[0][1]["timestamp"], datetime.datetime)
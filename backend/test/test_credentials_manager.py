@@ -0,0 +1,140 @@
+import datetime
+import sys
+import threading
+import types
+
+import pytest
+
+import credentials_manager
+from credentials_manager import CredentialManager, CredentialsError
+
+
+class FakeCreds:
+    def __init__(self, token, fail=False, gate=None):
+        self.token = token
+        self.refresh_token = "refresh"
+        self.expiry = datetime.datetime.utcnow() - datetime.timedelta(minutes=1)
+        self.fail = fail
+        self.gate = gate
+        self.calls = 0
+
+    @property
+    def valid(self):
+        return self.expiry > datetime.datetime.utcnow()
+
+    @property
+    def expired(self):
+        return not self.valid
+
+    def refresh(self, request):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError("invalid_grant")
+        self.token += "+"
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+
+class FakeStore:
+    def __init__(self):
+        self.users = {}
+        self.writes = []
+
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    def update_user(self, user_id, fields):
+        self.writes.append(sorted(fields))
+        self.users.setdefault(user_id, {}).update(fields)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    requests_module = types.ModuleType("google.auth.transport.requests")
+    requests_module.Request = object
+    for name in ("google", "google.auth", "google.auth.transport"):
+        monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+    monkeypatch.setitem(sys.modules, "google.auth.transport.requests", requests_module)
+    # Refresh the cached object itself, so tests can see every attempt
+    monkeypatch.setattr(credentials_manager, "_copy", lambda creds: creds)
+
+    manager = CredentialManager(FakeStore())
+    manager._thread = object()  # no background refresher in tests
+    return manager
+
+
+def test_failed_refresh_backs_off(manager, monkeypatch):
+    monkeypatch.setattr(credentials_manager, "TOKEN_REFRESH_BACKOFF_S", 60)
+    creds = manager._creds["u"] = FakeCreds("old", fail=True)
+
+    with pytest.raises(CredentialsError) as first:
+        manager.get("u")
+    assert first.value.status == 500
+    for _ in range(5):
+        with pytest.raises(CredentialsError) as again:
+            manager.get("u")
+        assert again.value.status == 503
+
+    assert creds.calls == 1
+    assert manager.stats()["backing_off"] == 1
+
+
+def test_backoff_doubles_and_resets(manager, monkeypatch):
+    monkeypatch.setattr(credentials_manager, "TOKEN_REFRESH_BACKOFF_S", 0)
+    creds = manager._creds["u"] = FakeCreds("old", fail=True)
+    for _ in range(3):
+        with pytest.raises(CredentialsError):
+            manager.get("u")
+    assert manager._failures["u"][0] == 3
+
+    creds.fail = False
+    assert manager.get("u").token == "old+"
+    assert "u" not in manager._failures
+    assert manager._store.users["u"]["google_calendar_credentials.token"] == "old+"
+
+
+def test_refresh_finishing_after_reconnect_is_not_persisted(manager):
+    gate = threading.Event()
+    manager._creds["u"] = FakeCreds("old", gate=gate)
+    refresher = threading.Thread(target=lambda: manager.refresh("u"))
+    refresher.start()
+    while manager._creds["u"].calls == 0:
+        pass
+
+    # The user reconnects while the old token's refresh is in flight
+    manager.invalidate("u")
+    manager._store.update_user("u", {"google_calendar_credentials": {"token": "new"}})
+    gate.set()
+    refresher.join(5)
+
+    assert manager._store.users["u"] == {"google_calendar_credentials": {"token": "new"}}
+
+
+def test_replace_waits_for_refresh_in_flight(manager):
+    gate = threading.Event()
+    manager._creds["u"] = FakeCreds("old", gate=gate)
+    refresher = threading.Thread(target=lambda: manager.refresh("u"))
+    refresher.start()
+    while manager._creds["u"].calls == 0:
+        pass
+
+    replacer = threading.Thread(target=lambda: manager.replace("u", {"google_calendar_credentials": {"token": "new"}}))
+    replacer.start()
+    gate.set()
+    refresher.join(5)
+    replacer.join(5)
+
+    # The refreshed token is written first, then the new credentials over it
+    assert manager._store.writes == [
+        ["google_calendar_credentials.expiry", "google_calendar_credentials.token"],
+        ["google_calendar_credentials"],
+    ]
+    assert "u" not in manager._creds
+
+
+def test_invalidate_prunes_idle_user_locks(manager):
+    for i in range(100):
+        manager._user_lock(f"u{i}")
+        manager.invalidate(f"u{i}")
+    assert manager._user_locks == {}
@@ -0,0 +1,87 @@
+import datetime
+import random
+
+import pytest
+
+from meeting_index import MeetingIndex, meeting_features
+
+HOUR = 3600
+
+
+def brute_busy(meetings, lo, hi):
+    # Sample every minute
+    return sum(60 for t in range(int(lo), int(hi), 60) if any(s <= t < e for s, e in meetings))
+
+
+def brute_chains(meetings, gap, lo, hi):
+    chains = []
+    for start, end in sorted(meetings):
+        if chains and start - chains[-1]["end"] <= gap:
+            chains[-1]["end"] = max(chains[-1]["end"], end)
+            chains[-1]["size"] += 1
+        else:
+            chains.append({"start": start, "end": end, "size": 1})
+    touching = [c for c in chains if c["end"] > lo and c["start"] < hi]
+    sizes = [c["size"] for c in touching if c["size"] > 1]
+    return len(sizes), max(sizes, default=0)
+
+
+def random_meetings(rng, count, span):
+    # Whole minutes so busy time can be checked by sampling
+    meetings = []
+    for _ in range(count):
+        start = rng.randrange(0, span, 60)
+        meetings.append((start, start + rng.choice([15, 30, 45, 60, 90]) * 60))
+    return meetings
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_queries_match_brute_force(seed):
+    rng = random.Random(seed)
+    span = 3 * 24 * HOUR
+    meetings = random_meetings(rng, rng.randrange(0, 40), span)
+    index = MeetingIndex(meetings, chain_gap_s=600, max_meeting_s=12 * HOUR)
+
+    for _ in range(10):
+        lo = rng.randrange(0, span, 60)
+        hi = lo + rng.randrange(60, span, 60)
+        assert index.count_starting(lo, hi) == sum(lo <= s < hi for s, _ in meetings)
+        assert index.busy_seconds(lo, hi) == brute_busy(meetings, lo, hi)
+        assert index.chains(lo, hi) == brute_chains(meetings, 600, lo, hi)
+
+        free = [t for t in range(lo, hi, 60) if not any(s <= t < e for s, e in meetings)]
+        runs, run = [0], 0
+        for a, b in zip([None] + free, free):
+            run = run + 60 if a is not None and b - a == 60 else 60
+            runs.append(run)
+        assert index.longest_free_seconds(lo, hi) == max(runs)
+
+
+def test_long_events_are_counted_but_not_busy():
+    index = MeetingIndex([(0, 24 * HOUR), (HOUR, 2 * HOUR)], max_meeting_s=12 * HOUR)
+    assert index.count_starting(0, 24 * HOUR) == 2
+    assert index.busy_seconds(0, 24 * HOUR) == HOUR
+
+
+def test_back_to_back_chain_uses_gap():
+    index = MeetingIndex([(0, HOUR), (HOUR + 300, 2 * HOUR), (3 * HOUR, 4 * HOUR)], chain_gap_s=600)
+    assert index.chains(0, 5 * HOUR) == (1, 2)
+
+
+def test_meeting_features_today_and_week():
+    now = datetime.datetime(2026, 10, 14, 15, 0).astimezone()
+    today_9 = now.replace(hour=9)
+    events = [
+        (today_9, today_9 + datetime.timedelta(hours=1)),
+        (today_9 + datetime.timedelta(hours=1, minutes=5), today_9 + datetime.timedelta(hours=2)),
+        (today_9 - datetime.timedelta(days=3), today_9 - datetime.timedelta(days=3, minutes=-30)),
+        (today_9 - datetime.timedelta(days=10), today_9 - datetime.timedelta(days=10, minutes=-30)),
+    ]
+    features = meeting_features(MeetingIndex.from_events(events), now)
+
+    assert features["meeting_count_last_7d"] == 3
+    assert features["had_meeting_today"] == 1
+    assert features["meeting_hours_today"] == pytest.approx(1 + 55 / 60)
+    assert features["back_to_back_chains_last_7d"] == 1
+    assert features["longest_chain_last_7d"] == 2
+    assert features["longest_free_block_today_h"] == pytest.approx(6)
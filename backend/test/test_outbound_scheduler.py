@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import outbound_scheduler
+from outbound_scheduler import BACKGROUND, INTERACTIVE, OutboundScheduler, QueueTimeout, priority, retry_after_seconds
+
+
+def run_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+
+def test_concurrency_cap():
+    scheduler = OutboundScheduler("test_cap", concurrency=3, rate=0)
+    lock = threading.Lock()
+    in_flight, peak = 0, 0
+
+    def call():
+        nonlocal in_flight, peak
+        with scheduler.slot():
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+
+    run_threads([call] * 12)
+    assert peak == 3
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_rate_limit():
+    scheduler = OutboundScheduler("test_rate", concurrency=100, rate=50, burst=1)
+    started = time.monotonic()
+    for _ in range(11):
+        with scheduler.slot():
+            pass
+    # One token up front, then one every 20 ms
+    assert time.monotonic() - started >= 0.18
+
+
+def test_interactive_calls_go_first():
+    scheduler = OutboundScheduler("test_priority", concurrency=1, rate=0)
+    order = []
+    release = threading.Event()
+
+    def blocker():
+        with scheduler.slot():
+            release.wait(5)
+
+    def call(level, name):
+        def run():
+            with priority(level), scheduler.slot():
+                order.append(name)
+        return run
+
+    holder = threading.Thread(target=blocker)
+    holder.start()
+    while scheduler.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    waiters = [threading.Thread(target=call(BACKGROUND, f"bg{i}")) for i in range(3)]
+    waiters += [threading.Thread(target=call(INTERACTIVE, f"ui{i}")) for i in range(3)]
+    for thread in waiters:
+        thread.start()
+        time.sleep(0.01)  # queue them in this order
+    release.set()
+    for thread in [holder, *waiters]:
+        thread.join(5)
+
+    assert order == ["ui0", "ui1", "ui2", "bg0", "bg1", "bg2"]
+
+
+def test_coalesces_identical_calls():
+    scheduler = OutboundScheduler("test_coalesce", concurrency=10, rate=0)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return "payload"
+
+    results = []
+    run_threads([lambda: results.append(scheduler.coalesce("key", fetch))] * 5)
+    assert results == ["payload"] * 5
+    assert len(calls) == 1
+
+
+def test_coalesced_error_reaches_every_caller():
+    scheduler = OutboundScheduler("test_coalesce_error", concurrency=10, rate=0)
+
+    def fail():
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            scheduler.coalesce("key", fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    run_threads([call] * 3)
+    assert errors == ["boom"] * 3
+
+
+def test_throttled_pauses_admission(monkeypatch):
+    monkeypatch.setattr(outbound_scheduler, "OUTBOUND_BACKOFF_S", 0.05)
+    scheduler = OutboundScheduler("test_throttle", concurrency=10, rate=0)
+
+    scheduler.throttled()
+    started = time.monotonic()
+    with scheduler.slot():
+        pass
+    assert time.monotonic() - started >= 0.04
+
+    # Consecutive 429s double the pause; a success resets it
+    scheduler.throttled()
+    scheduler.throttled()
+    assert scheduler.stats()["paused_s"] > 0.06
+    scheduler.succeeded()
+    assert scheduler._throttle_streak == 0
+
+
+def test_queue_timeout_then_recovers(monkeypatch):
+    monkeypatch.setitem(outbound_scheduler.MAX_QUEUE_S, INTERACTIVE, 0.05)
+    scheduler = OutboundScheduler("test_timeout", concurrency=1, rate=0)
+    release = threading.Event()
+
+    def blocker():
+        with scheduler.slot():
+            release.wait(5)
+
+    holder = threading.Thread(target=blocker)
+    holder.start()
+    while scheduler.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    with pytest.raises(QueueTimeout):
+        with scheduler.slot():
+            pass
+    release.set()
+    holder.join(5)
+
+    with scheduler.slot():
+        pass
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_async_slot_and_coalesce():
+    scheduler = OutboundScheduler("test_async", concurrency=2, rate=0)
+    calls = []
+
+    async def fetch():
+        async with scheduler.aslot():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "payload"
+
+    async def main():
+        return await asyncio.gather(*(scheduler.coalesce_async("key", fetch) for _ in range(4)))
+
+    assert asyncio.run(main()) == ["payload"] * 4
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), ("3", 3.0), ("-1", 0.0), ("soon", None)])
+def test_retry_after_seconds(value, expected):
+    assert retry_after_seconds(value) == expected
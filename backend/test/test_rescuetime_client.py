@@ -0,0 +1,41 @@
+import types
+
+import pytest
+
+pytest.importorskip("requests")
+
+import rescuetime_client  # noqa: E402
+from rescuetime_client import RescueTimeClient, rescuetime_scheduler  # noqa: E402
+
+
+class FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.in_flight_during_call = []
+
+    def get(self, url, params=None, timeout=None):
+        self.in_flight_during_call.append(rescuetime_scheduler.stats()["in_flight"])
+        return types.SimpleNamespace(status_code=self.statuses.pop(0), headers={})
+
+
+def test_retries_5xx_with_slot_released(monkeypatch):
+    in_flight_while_sleeping = []
+    monkeypatch.setattr(
+        rescuetime_client.time, "sleep",
+        lambda seconds: in_flight_while_sleeping.append(rescuetime_scheduler.stats()["in_flight"])
+    )
+    client = RescueTimeClient()
+    client.session = FakeSession([503, 502, 200])
+
+    assert client.get({"key": "k"}).status_code == 200
+    assert client.session.in_flight_during_call == [1, 1, 1]
+    assert in_flight_while_sleeping == [0, 0]
+
+
+def test_gives_up_after_retries(monkeypatch):
+    monkeypatch.setattr(rescuetime_client.time, "sleep", lambda seconds: None)
+    client = RescueTimeClient()
+    client.session = FakeSession([500] * (rescuetime_client.RESCUETIME_RETRIES + 1))
+
+    assert client.get({"key": "k2"}).status_code == 500
+    assert client.session.statuses == []
@@ -0,0 +1,108 @@
+import datetime
+import time
+
+import pytest
+
+from rollups import (
+    fetch_rolling_means, merge_team_aggregates, push_entry, rebuild_team_aggregates, rebuild_trends, team_deltas,
+    trend_deltas
+)
+from storage_sqlite import SQLiteStorage
+
+
+def checkin(user_id, day, mood, hour=9):
+    return {
+        "user_id": user_id, "timestamp": datetime.datetime(2026, 10, day, hour),
+        "mood": mood, "stress": 2, "sleep": 7, "work_hours_today": 8,
+    }
+
+
+class FirestoreStyleStore:
+    """Hands check-ins back the way Firestore does: naive stamps come back as aware UTC."""
+
+    def __init__(self, checkins, users=None):
+        self.checkins = checkins
+        self.users = users or {}
+        self.trends = {}
+        self.team_days = {}
+
+    def list_checkins(self, user_id):
+        for i, data in enumerate(self.checkins):
+            if data["user_id"] == user_id:
+                yield f"c{i}", {**data, "timestamp": data["timestamp"].replace(tzinfo=datetime.timezone.utc)}
+
+    def replace_trends(self, user_id, aggregates):
+        self.trends[user_id] = aggregates
+
+    def iter_user_ids(self):
+        return iter(sorted(self.users))
+
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    def team_ids(self):
+        return []
+
+    def replace_team_days(self, team_id, days):
+        self.team_days[team_id] = days
+
+
+@pytest.fixture
+def pacific_time(monkeypatch):
+    # Server clock west of UTC, where reading the stamps as UTC would move early check-ins a day back
+    monkeypatch.setenv("TZ", "America/Los_Angeles")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_push_entry_keeps_last_seven():
+    rolling = None
+    for day in range(1, 11):
+        rolling = push_entry(rolling, checkin("u", day, day))
+    assert rolling["count"] == 7
+    assert rolling["sums"]["mood"] == sum(range(4, 11))
+
+
+def test_fetch_rolling_means_falls_back_without_writing(tmp_path):
+    store = SQLiteStorage(str(tmp_path / "boz.sqlite3"))
+    for day in range(1, 4):
+        store.add_checkin(checkin("u", day, day))
+    # A user document from before rolling aggregates existed
+    with store._transaction() as conn:
+        store._put_user(conn, "u", {"name": "legacy"})
+
+    means = fetch_rolling_means(store, "u")
+
+    assert means["mean_mood_last_7d"] == 2
+    assert "rolling_checkins" not in store.get_user("u")
+
+
+def test_rebuilt_trends_match_incremental_buckets(pacific_time):
+    checkins = [checkin("u", day, day, hour=1) for day in (4, 5, 6)]
+    store = FirestoreStyleStore(checkins)
+
+    rebuild_trends(store, "u")
+
+    assert store.trends["u"] == trend_deltas(checkins)
+    assert sorted(bucket for granularity, bucket in store.trends["u"] if granularity == "day") == [
+        "2026-10-04", "2026-10-05", "2026-10-06"
+    ]
+
+
+def test_rebuilt_team_days_match_incremental_days(pacific_time):
+    checkins = [
+        {**checkin(user_id, day, 3, hour=1), "burnout_probability": probability}
+        for user_id, day, probability in [("a", 4, 0.7), ("a", 5, 0.2), ("b", 5, 0.9)]
+    ]
+    store = FirestoreStyleStore(checkins, users={"a": {"teams": ["t"]}, "b": {"teams": ["t"]}})
+
+    rebuild_team_aggregates(store)
+
+    incremental = {}
+    for data in checkins:
+        for (team_id, day), delta in team_deltas([data], ["t"]).items():
+            incremental[day] = merge_team_aggregates(incremental.get(day), delta)
+    assert store.team_days == {"t": incremental}
+    assert sorted(incremental) == ["2026-10-04", "2026-10-05"]
@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+pytest.importorskip("dotenv")
+
+from app import scenario_request  # noqa: E402
+
+BODY = {"user_id": "u", "grid": {"sleep": [6, 8]}, "mood": "3", "stress": 2, "work_hours_today": 8}
+
+
+def test_coerces_self_reported_values():
+    user_id, axes, inputs = scenario_request(BODY)
+
+    assert (user_id, axes) == ("u", {"sleep": [6.0, 8.0]})
+    assert (inputs["mood"], inputs["stress"], inputs["work_hours_today"]) == (3.0, 2.0, 8.0)
+    assert BODY["mood"] == "3"
+
+
+@pytest.mark.parametrize("key, value", [("mood", "happy"), ("stress", [2]), ("work_hours_today", "nan")])
+def test_rejects_non_numeric_values_by_field(key, value):
+    with pytest.raises(ValueError, match=key):
+        scenario_request({**BODY, key: value})
@@ -0,0 +1,15 @@
+import threading
+
+from sources import fan_out
+
+
+def test_fan_out_runs_concurrently_and_maps_errors_to_none():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def load(key):
+        barrier.wait()  # only passes if all three calls are in flight at once
+        if key == "bad":
+            raise ValueError("no events")
+        return key.upper()
+
+    assert fan_out(load, ["a", "b", "bad"]) == {"a": "A", "b": "B", "bad": None}
@@ -0,0 +1,160 @@
+import datetime
+import os
+import urllib.request
+
+import pytest
+
+from storage import DELETE
+from storage_sqlite import SQLiteStorage
+
+UTC = datetime.timezone.utc
+BASE = datetime.datetime(2026, 10, 5, 9)
+
+# Project the Firestore emulator runs the tests under
+EMULATOR_PROJECT = os.getenv("GCLOUD_PROJECT", "boz-test")
+
+
+def firestore_store():
+    host = os.getenv("FIRESTORE_EMULATOR_HOST")
+    if not host:
+        pytest.skip("FIRESTORE_EMULATOR_HOST is not set")
+    cloud_firestore = pytest.importorskip("google.cloud.firestore")
+    pytest.importorskip("firebase_admin")
+    from storage_firestore import FirestoreStorage
+
+    # Start from an empty database
+    request = urllib.request.Request(
+        f"http://{host}/emulator/v1/projects/{EMULATOR_PROJECT}/databases/(default)/documents", method="DELETE"
+    )
+    urllib.request.urlopen(request).close()
+    return FirestoreStorage(cloud_firestore.Client(project=EMULATOR_PROJECT))
+
+
+@pytest.fixture(params=["sqlite", "firestore"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStorage(str(tmp_path / "boz.sqlite3"))
+    return firestore_store()
+
+
+def checkin(user_id, hours, mood, **fields):
+    return {"user_id": user_id, "timestamp": BASE + datetime.timedelta(hours=hours), "mood": mood, **fields}
+
+
+def event(start_hours, end_hours, updated="1"):
+    return {
+        "summary": "Standup",
+        "updated": updated,
+        "start_ts": (BASE + datetime.timedelta(hours=start_hours)).replace(tzinfo=UTC),
+        "end_ts": (BASE + datetime.timedelta(hours=end_hours)).replace(tzinfo=UTC),
+    }
+
+
+# --- users ---
+
+def test_update_user_merges_dotted_paths_and_deletes(store):
+    assert store.get_user("u") is None
+
+    store.update_user("u", {"name": "Ada", "calendar_sync": {"token": "t", "calendar": "primary"}})
+    store.update_user("u", {"calendar_sync.token": "t2", "name": DELETE})
+
+    assert store.get_user("u") == {"calendar_sync": {"token": "t2", "calendar": "primary"}}
+
+
+def test_iter_user_ids_in_id_order_after_cursor(store):
+    for user_id in ["c", "a", "b"]:
+        store.update_user(user_id, {"name": user_id})
+
+    assert list(store.iter_user_ids()) == ["a", "b", "c"]
+    assert list(store.iter_user_ids(after="a")) == ["b", "c"]
+
+
+def test_set_team_member_keeps_team_order(store):
+    store.set_team_member("u", "t1", True)
+    store.set_team_member("u", "t2", True)
+    store.set_team_member("u", "t1", True)
+    assert store.get_user("u")["teams"] == ["t1", "t2"]
+
+    store.set_team_member("u", "t1", False)
+    assert store.get_user("u")["teams"] == ["t2"]
+
+
+# --- check-ins ---
+
+def test_checkins_newest_first_per_user(store):
+    store.add_checkins([(f"c{i}", checkin("u", i, i + 1)) for i in range(4)])
+    store.add_checkin(checkin("other", 10, 5), checkin_id="x")
+
+    assert [data["mood"] for data in store.recent_checkins("u", 2)] == [4, 3]
+    assert [checkin_id for checkin_id, _ in store.list_checkins("u")] == ["c3", "c2", "c1", "c0"]
+
+
+def test_add_checkin_with_id_is_idempotent(store):
+    store.add_checkin(checkin("u", 0, 2), checkin_id="c0")
+    store.add_checkin(checkin("u", 0, 2), checkin_id="c0")
+    store.add_checkins([("c0", checkin("u", 0, 2)), ("c1", checkin("u", 1, 4))])
+
+    assert len(list(store.list_checkins("u"))) == 2
+    assert store.get_user("u")["rolling_checkins"]["count"] == 2
+    day = store.trend_buckets("u", "day", BASE.date().isoformat(), BASE.date().isoformat())
+    assert day[BASE.date().isoformat()]["fields"]["mood"]["sum"] == 6
+
+
+def test_add_checkin_folds_into_team_days(store):
+    store.set_team_member("u", "t", True)
+    store.add_checkin(checkin("u", 0, 3, burnout_probability=0.7))
+    store.add_checkin(checkin("u", 1, 3, burnout_probability=0.2))
+
+    day = BASE.date().isoformat()
+    aggregate = store.team_days("t", day, day)[day]
+    assert (aggregate["count"], aggregate["high_risk"]) == (2, 1)
+    assert store.team_ids() == ["t"]
+
+
+def test_update_checkins_merges_fields(store):
+    store.add_checkin(checkin("u", 0, 3), checkin_id="c0")
+    store.update_checkins({"c0": {"burnout_probability": 0.4}})
+
+    (_, data), = store.list_checkins("u")
+    assert (data["mood"], data["burnout_probability"]) == (3, 0.4)
+
+
+# --- calendar events ---
+
+def test_write_events_upserts_and_deletes(store):
+    store.write_events("u", upserts={"e1": event(0, 1), "e2": event(2, 3)}, deletes=[])
+    store.write_events("u", upserts={"e1": event(0, 1, updated="2")}, deletes=["e2"])
+
+    versions = store.event_versions("u", ["e1", "e2", "missing"])
+    assert list(versions) == ["e1"]
+    assert versions["e1"]["updated"] == "2"
+
+
+def test_delete_events_except_keeps_listed(store):
+    store.write_events("u", upserts={f"e{i}": event(i, i + 1) for i in range(3)}, deletes=[])
+    store.write_events("other", upserts={"e0": event(0, 1)}, deletes=[])
+
+    assert store.delete_events_except("u", {"e1"}) == 2
+    assert list(store.event_versions("u", ["e0", "e1", "e2"])) == ["e1"]
+    assert list(store.event_versions("other", ["e0"])) == ["e0"]
+
+
+def test_event_intervals_overlap_window(store):
+    store.write_events("u", upserts={
+        "before": event(0, 1), "overlaps_start": event(1, 3), "inside": event(3, 4), "after": event(5, 6)
+    }, deletes=[])
+
+    start, end = [(BASE + datetime.timedelta(hours=h)).replace(tzinfo=UTC) for h in (2, 5)]
+    intervals = sorted(store.event_intervals("u", start, end))
+    assert [(s.hour, e.hour) for s, e in intervals] == [(10, 12), (12, 13)]
+
+
+def test_upcoming_events_ordered_by_start(store):
+    store.write_events("u", upserts={
+        "late": event(6, 7), "ended": event(0, 1), "long": event(1, 9), "soon": event(3, 4)
+    }, deletes=[])
+
+    after = (BASE + datetime.timedelta(hours=2)).replace(tzinfo=UTC)
+    events = store.upcoming_events("u", after, limit=2)
+    assert [e["id"] for e in events] == ["long", "soon"]
+    assert all("start_ts" not in e and e["summary"] == "Standup" for e in events)
@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+import write_behind
+from storage import loads
+from write_behind import CheckinWriter, WriterFull
+
+
+class RecordingStore:
+    def __init__(self, fail=False, poison=None):
+        self.fail = fail
+        self.poison = poison
+        self.written = {}
+        self.flushed = threading.Event()
+
+    def add_checkins(self, checkins):
+        if self.fail:
+            raise ConnectionError("store unavailable")
+        if any(data.get("mood") == self.poison for _, data in checkins):
+            raise ValueError("rejected check-in")
+        self.written.update(checkins)
+        self.flushed.set()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_RETRY_S", 0.01)
+
+
+def make_writer(store, tmp_path, **kwargs):
+    return CheckinWriter(
+        store, journal_path=str(tmp_path / "journal.jsonl"), flush_interval=0.01, fsync=False, **kwargs
+    )
+
+
+def crashed_writer(journal_path, submitted, done):
+    # Journals check-ins it can never flush, then dies without closing
+    writer = CheckinWriter(RecordingStore(fail=True), journal_path=journal_path, flush_interval=0.01, fsync=False)
+    writer.start()
+    submitted.put([writer.submit({"user_id": "u", "mood": i}) for i in range(3)])
+    done.wait(10)
+    os._exit(0)
+
+
+def run_crashed_writer(tmp_path, keep_alive):
+    ctx = multiprocessing.get_context("fork")
+    submitted, done = ctx.Queue(), ctx.Event()
+    process = ctx.Process(target=crashed_writer, args=(str(tmp_path / "journal.jsonl"), submitted, done))
+    process.start()
+    ids = submitted.get(timeout=10)
+    if not keep_alive:
+        done.set()
+        process.join(10)
+    return process, done, ids
+
+
+def test_flushes_in_batches_and_removes_journal_on_close(tmp_path):
+    store = RecordingStore()
+    writer = make_writer(store, tmp_path).start()
+    ids = [writer.submit({"user_id": "u", "mood": i}) for i in range(5)]
+    writer.close()
+
+    assert set(store.written) == set(ids)
+    assert not os.listdir(tmp_path)
+
+
+def test_replays_journal_of_dead_process(tmp_path):
+    _, _, ids = run_crashed_writer(tmp_path, keep_alive=False)
+
+    store = RecordingStore()
+    writer = make_writer(store, tmp_path).start()
+    assert store.flushed.wait(5)
+    writer.close()
+
+    assert sorted(store.written) == sorted(ids)
+    assert not os.listdir(tmp_path)
+
+
+def test_leaves_live_writers_journal_alone(tmp_path):
+    process, done, ids = run_crashed_writer(tmp_path, keep_alive=True)
+    try:
+        other = f"{tmp_path / 'journal.jsonl'}.{process.pid}"
+        store = RecordingStore()
+        writer = make_writer(store, tmp_path).start()
+        writer.close()
+
+        # Nothing taken over, and the live writer's journal still holds its check-ins
+        assert store.written == {}
+        with open(other) as f:
+            pending = CheckinWriter._read(f, other)
+        assert sorted(pending) == sorted(ids)
+    finally:
+        done.set()
+        process.join(10)
+
+
+def test_refuses_journal_locked_by_another_writer(tmp_path):
+    first = make_writer(RecordingStore(fail=True), tmp_path).start()
+    first.submit({"user_id": "u", "mood": 1})
+    try:
+        with pytest.raises(RuntimeError):
+            make_writer(RecordingStore(), tmp_path).start()
+    finally:
+        first.close(timeout=0.1)
+
+
+def test_compaction_keeps_unflushed_checkins(tmp_path):
+    store = RecordingStore(fail=True)
+    writer = make_writer(store, tmp_path).start()
+    ids = [writer.submit({"user_id": "u", "mood": i}) for i in range(3)]
+    with writer._cond:
+        writer._compact()
+    writer.close(timeout=0.1)
+
+    with open(writer.journal_path) as f:
+        assert sorted(CheckinWriter._read(f, writer.journal_path)) == sorted(ids)
+
+
+def test_dead_letters_checkin_that_keeps_failing(tmp_path):
+    store = RecordingStore(poison=-1)
+    writer = make_writer(store, tmp_path, max_attempts=3)
+    writer.flush_interval = 0.2  # one batch holds the poisoned check-in and the good ones
+    writer.start()
+    ids = [writer.submit({"user_id": "u", "mood": mood}) for mood in (1, -1, 2)]
+    deadline = time.monotonic() + 5
+    while writer.stats()["unflushed"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.close()
+
+    assert sorted(store.written) == sorted([ids[0], ids[2]])
+    with open(writer.dead_letter_path) as f:
+        dead = [loads(line) for line in f]
+    assert [(record["id"], record["data"]["mood"]) for record in dead] == [(ids[1], -1)]
+    # Nothing left to replay
+    assert os.listdir(tmp_path) == ["journal.jsonl.dead"]
+
+
+def test_submit_pushes_back_when_full(tmp_path):
+    writer = make_writer(RecordingStore(fail=True), tmp_path, max_pending=2, submit_timeout=0.05).start()
+    try:
+        writer.submit({"user_id": "u", "mood": 1})
+        writer.submit({"user_id": "u", "mood": 2})
+        with pytest.raises(WriterFull):
+            writer.submit({"user_id": "u", "mood": 3})
+        assert writer.stats()["unflushed"] == 2
+    finally:
+        writer.close(timeout=0.1)
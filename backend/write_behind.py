@@ -0,0 +1,323 @@
+import collections
+import os
+import re
+import threading
+import time
+import uuid
+
+from metrics import Counter, Histogram
+from storage import dumps, loads
+
+try:
+    import fcntl
+except ImportError:  # not POSIX; the write-behind queue can't run here
+    fcntl = None
+
+# Store check-ins through the write-behind queue instead of inline
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0") == "1"
+
+# Local append-only journal; each process writes <path>.<pid> and holds it locked.
+# On start, journals no live process holds are replayed and removed
+WRITE_BEHIND_JOURNAL = os.getenv("WRITE_BEHIND_JOURNAL", "checkin_journal.jsonl")
+
+# A flush writes at most this many check-ins, and waits at most this long to fill up
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))
+WRITE_BEHIND_FLUSH_INTERVAL_S = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_S", "0.5"))
+
+# fsync every journal append (a power loss can't drop an acknowledged check-in)
+WRITE_BEHIND_FSYNC = os.getenv("WRITE_BEHIND_FSYNC", "1") == "1"
+
+# Wait between retries after a failed flush; doubles with each failed attempt, up to the max
+WRITE_BEHIND_RETRY_S = float(os.getenv("WRITE_BEHIND_RETRY_S", "2"))
+WRITE_BEHIND_RETRY_MAX_S = float(os.getenv("WRITE_BEHIND_RETRY_MAX_S", "60"))
+
+# A check-in that fails this many flushes is moved to the dead-letter file
+# <journal>.dead (journal format; rename it to <journal> to replay it on the next start)
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "10"))
+
+# At most this many check-ins wait unflushed; submit() waits up to the timeout
+# for room, then raises WriterFull
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_SUBMIT_TIMEOUT_S = float(os.getenv("WRITE_BEHIND_SUBMIT_TIMEOUT_S", "5"))
+
+FLUSH_SECONDS = Histogram(
+    "boz_write_behind_flush_seconds",
+    "Time to write one batch of queued check-ins to storage."
+)
+FLUSH_BATCH_SIZE = Histogram(
+    "boz_write_behind_batch_size",
+    "Check-ins written per flush.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+FLUSHED = Counter("boz_write_behind_flushed_total", "Check-ins written to storage by the write-behind worker.")
+FLUSH_ERRORS = Counter("boz_write_behind_flush_errors_total", "Flushes that failed and were retried.")
+DEAD_LETTERED = Counter(
+    "boz_write_behind_dead_lettered_total", "Check-ins moved to the dead-letter file after too many failed flushes."
+)
+
+
+class WriterFull(Exception):
+    """The write-behind queue stayed full for the whole submit timeout."""
+
+
+class CheckinWriter:
+    """
+    Write-behind queue for check-ins. submit() appends the check-in to a local
+    journal and returns; a background thread writes queued check-ins to the
+    store in batches and records which ids were flushed. On start, unflushed
+    check-ins from journals left behind by dead processes are queued again.
+    Every check-in carries its id, so replaying one that did reach the store is
+    a no-op.
+
+    Each process journals to its own file under an exclusive flock, so workers
+    sharing `journal_path` never replay or rewrite each other's live journals.
+
+    After a failed flush its check-ins are retried one at a time, so a single
+    bad check-in can't hold up the rest; one that fails `max_attempts` times
+    is moved to the dead-letter file.
+    """
+
+    def __init__(self, store, journal_path=WRITE_BEHIND_JOURNAL, batch_size=WRITE_BEHIND_BATCH_SIZE,
+                 flush_interval=WRITE_BEHIND_FLUSH_INTERVAL_S, fsync=WRITE_BEHIND_FSYNC,
+                 max_attempts=WRITE_BEHIND_MAX_ATTEMPTS, max_pending=WRITE_BEHIND_MAX_PENDING,
+                 submit_timeout=WRITE_BEHIND_SUBMIT_TIMEOUT_S):
+        self.store = store
+        self.base_path = journal_path
+        self.dead_letter_path = journal_path + ".dead"
+        self.journal_path = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.submit_timeout = submit_timeout
+        self._queue = collections.deque()  # (checkin_id, checkin_data) waiting to be written
+        self._pending = {}                 # checkin_id -> checkin_data, queued or being written
+        self._attempts = {}                # checkin_id -> failed flushes so far
+        self._journal = None
+        self._journal_lines = 0
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread = None
+        self.last_flush_at = None
+
+    # --- journal ---
+
+    def _append(self, record):
+        self._journal.write(dumps(record) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_lines += 1
+
+    @staticmethod
+    def _read(f, path):
+        pending = {}
+        for line in f:
+            try:
+                record = loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-append was never acknowledged
+                print(f"⚠️ Skipping unreadable journal line in {path}")
+                continue
+            if "flushed" in record:
+                for checkin_id in record["flushed"]:
+                    pending.pop(checkin_id, None)
+            else:
+                pending[record["id"]] = record["data"]
+        return pending
+
+    def _journal_paths(self):
+        """This process's journal, other processes' (<base>.<pid>) and a pre-per-process <base>."""
+        directory = os.path.dirname(self.base_path) or "."
+        name = re.compile(re.escape(os.path.basename(self.base_path)) + r"(\.\d+)?")
+        return [
+            os.path.join(directory, entry) for entry in sorted(os.listdir(directory))
+            if name.fullmatch(entry)
+        ]
+
+    def _adopt_orphans(self):
+        """
+        Lock and read every journal no live process holds. Returns (pending
+        check-ins, [(path, locked file)]); the files are removed once their
+        check-ins are in this process's journal.
+        """
+        pending, adopted = {}, []
+        for path in self._journal_paths():
+            try:
+                f = open(path)
+            except FileNotFoundError:
+                continue  # adopted and removed by another process meanwhile
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                if path == self.journal_path:
+                    raise RuntimeError(f"Check-in journal {path} is already in use by another writer")
+                continue  # a live writer's journal
+            if os.fstat(f.fileno()).st_nlink == 0:
+                f.close()  # another process adopted it between our open and flock
+                continue
+            pending.update(self._read(f, path))
+            adopted.append((path, f))
+        return pending, adopted
+
+    def _compact(self):
+        # Rewrite the journal with just the unflushed check-ins. The new file is
+        # locked before it takes the journal's name, so it's never seen unlocked
+        tmp_path = self.journal_path + ".tmp"
+        journal = open(tmp_path, "w")
+        fcntl.flock(journal.fileno(), fcntl.LOCK_EX)
+        for checkin_id, checkin_data in self._pending.items():
+            journal.write(dumps({"id": checkin_id, "data": checkin_data}) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+        os.replace(tmp_path, self.journal_path)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = journal
+        self._journal_lines = len(self._pending)
+
+    # --- lifecycle ---
+
+    def start(self):
+        """Replay orphaned journals and start the flusher thread (idempotent)."""
+        if fcntl is None:
+            raise RuntimeError("The write-behind journal needs POSIX file locks (fcntl)")
+        with self._cond:
+            if self._thread is not None:
+                return self
+            self.journal_path = f"{self.base_path}.{os.getpid()}"
+            self._pending, adopted = self._adopt_orphans()
+            self._queue.extend(self._pending.items())
+            if self._pending:
+                print(f"♻️ Replaying {len(self._pending)} journaled check-ins")
+            self._compact()
+            # Their check-ins are now in our journal (fsynced)
+            for path, f in adopted:
+                if path != self.journal_path:
+                    os.unlink(path)
+                f.close()
+            self._thread = threading.Thread(target=self._run, name="checkin-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout=10):
+        """Flush what's queued (up to `timeout` seconds) and stop the worker."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._cond:
+            stopped = self._thread is None or not self._thread.is_alive()
+            if stopped and self._journal is not None and not self._pending:
+                # Everything reached the store; nothing to replay
+                os.unlink(self.journal_path)
+                self._journal.close()
+                self._journal = None
+
+    # --- queue ---
+
+    def submit(self, checkin_data):
+        """Journal a check-in and queue it for storage; returns its id. Raises WriterFull if there's no room."""
+        checkin_id = uuid.uuid4().hex
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closing or len(self._pending) < self.max_pending,
+                                       self.submit_timeout):
+                raise WriterFull(f"{len(self._pending)} check-ins are waiting to be written")
+            if self._closing:
+                raise RuntimeError("Check-in writer is closed")
+            self._append({"id": checkin_id, "data": checkin_data})
+            self._pending[checkin_id] = checkin_data
+            self._queue.append((checkin_id, checkin_data))
+            self._cond.notify()
+        return checkin_id
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._closing:
+                self._cond.wait()
+            if self._queue and self._queue[0][0] in self._attempts:
+                # Retry check-ins from a failed flush on their own
+                return [self._queue.popleft()]
+            # Give the batch a moment to fill up
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._queue) < self.batch_size and not self._closing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return  # closing and drained
+
+            try:
+                with FLUSH_SECONDS.time():
+                    self.store.add_checkins(batch)
+            except Exception as e:
+                FLUSH_ERRORS.inc()
+                with self._cond:
+                    retry, dead = [], []
+                    for checkin_id, checkin_data in batch:
+                        self._attempts[checkin_id] = self._attempts.get(checkin_id, 0) + 1
+                        failed_out = self._attempts[checkin_id] >= self.max_attempts
+                        (dead if failed_out else retry).append((checkin_id, checkin_data))
+                    print(f"⚠️ Error flushing {len(batch)} check-ins, retrying {len(retry)}: {e}")
+                    if dead:
+                        self._dead_letter(dead, e)
+                    # Back to the front, in order
+                    self._queue.extendleft(reversed(retry))
+                    if self._closing:
+                        return  # still journaled; replayed on next start
+                    attempts = max((self._attempts[checkin_id] for checkin_id, _ in retry), default=0)
+                if attempts:
+                    time.sleep(min(WRITE_BEHIND_RETRY_S * 2 ** (attempts - 1), WRITE_BEHIND_RETRY_MAX_S))
+                continue
+
+            FLUSH_BATCH_SIZE.observe(len(batch))
+            FLUSHED.inc(amount=len(batch))
+            with self._cond:
+                self._done(batch)
+                self.last_flush_at = time.time()
+
+    def _done(self, batch):
+        # Journal the batch as flushed and make room for submit()
+        for checkin_id, _ in batch:
+            self._pending.pop(checkin_id, None)
+            self._attempts.pop(checkin_id, None)
+        self._append({"flushed": [checkin_id for checkin_id, _ in batch]})
+        self._cond.notify_all()
+        # Keep the journal from growing without bound
+        if self._journal_lines > max(1000, 4 * len(self._pending)):
+            self._compact()
+
+    def _dead_letter(self, entries, error):
+        # Appended under a lock: every process shares the dead-letter file
+        with open(self.dead_letter_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            for checkin_id, checkin_data in entries:
+                f.write(dumps({"id": checkin_id, "data": checkin_data, "error": str(error)}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        DEAD_LETTERED.inc(amount=len(entries))
+        print(f"☠️ Moved {len(entries)} check-ins to {self.dead_letter_path} after {self.max_attempts} failed flushes")
+        self._done(entries)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "unflushed": len(self._pending),
+                "journal": self.journal_path,
+                "journal_lines": self._journal_lines,
+                "flushed": FLUSHED.value(),
+                "flush_errors": FLUSH_ERRORS.value(),
+                "dead_lettered": DEAD_LETTERED.value(),
+                "last_flush_at": self.last_flush_at
+            }
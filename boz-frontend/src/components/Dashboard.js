@@ -35,9 +35,21 @@ const Dashboard = () => {
   useEffect(() => {
     if (!user) return;
 
-    fetch(`http://127.0.0.1:5000/checkins?user_id=${user.uid}`)
-      .then((res) => res.json())
-      .then((data) => setCheckins(data))
+    // The chart shows the latest check-ins: one page, no need to walk the whole history
+    const fetchCheckins = async () => {
+      const params = new URLSearchParams({
+        user_id: user.uid,
+        limit: "100",
+        fields: "mood,stress,sleep,burnout_probability",
+      });
+      const res = await fetch(`http://127.0.0.1:5000/checkins?${params}`);
+      const data = await res.json();
+      if (!data.success) throw new Error(data.message);
+      return data.checkins;
+    };
+
+    fetchCheckins()
+      .then((latest) => setCheckins(latest))
       .catch((err) => console.error(err));
   }, [user]);
 